@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,8 +73,17 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
+ASGI_APPLICATION = 'config.asgi.application'
+
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# DB_CONN_MAX_AGE: segundos que se reutiliza una conexión (0 = una por request).
+# Bajo ASGI cada request corre su código síncrono en un hilo propio, así que
+# conviene DB_CONN_MAX_AGE=0 y un pooler (PgBouncer, el servicio pgbouncer del
+# docker-compose) en POSTGRES_HOST; con pooling por transacción hay que
+# desactivar los cursores del lado del servidor (DB_DISABLE_SERVER_SIDE_CURSORS=1),
+# que usa .iterator().
 
 DATABASES = {
     'default': {
@@ -83,10 +93,59 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'portfolio'),
         'HOST': os.environ.get('POSTGRES_HOST', 'db'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', '0') == '1',
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# "evolution" guarda los resultados de w_{i,t} y V_t por rango de fechas.
+# EVOLUTION_CACHE_BACKEND=locmem (LRU en memoria por proceso) o file (compartida en disco)
+
+EVOLUTION_CACHE_BACKEND = os.environ.get('EVOLUTION_CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'evolution': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache'
+            if EVOLUTION_CACHE_BACKEND == 'file'
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': (
+            os.environ.get('EVOLUTION_CACHE_DIR', str(BASE_DIR / 'var' / 'cache' / 'evolution'))
+            if EVOLUTION_CACHE_BACKEND == 'file'
+            else 'portfolio-evolution'
+        ),
+        'TIMEOUT': int(os.environ.get('EVOLUTION_CACHE_TIMEOUT', '86400')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('EVOLUTION_CACHE_MAX_ENTRIES', '1000')),
+        },
+    },
+}
+
+
+# Matriz de precios compartida (memory-mapped) que escribe el ETL
+PRICE_STORE_DIR = os.environ.get('PRICE_STORE_DIR', str(BASE_DIR / 'var' / 'price_store'))
+
+
+# Aritmética de los cálculos de posiciones: decimal (exacta) o float (float64 de NumPy)
+POSITION_COMPUTE_MODE = os.environ.get('POSITION_COMPUTE_MODE', 'decimal')
+
+
+# Procesos para los escenarios Monte Carlo (0 = uno por CPU)
+SCENARIO_WORKERS = int(os.environ.get('SCENARIO_WORKERS', '0'))
+
+
+# Métricas por request (Server-Timing) y endpoint /metrics para Prometheus
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '1') == '1'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -123,6 +182,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos subidos (cargas ETL en cola)
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'media'))
+MEDIA_URL = 'media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
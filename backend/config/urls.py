@@ -17,10 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-from core.views import portfolio_charts
+from core.views import metrics, portfolio_charts
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/", include("core.api.urls")),
+    path("metrics", metrics, name="metrics"),
     path("", portfolio_charts, name="portfolio_charts"),
 ]
@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from core.engine import forward_fill
+from core.metrics import timed
+from core.price_store import get_price_history
+from core.selectors import get_portfolio_value_matrix
+
+# Métricas de riesgo y retorno sobre V_t y los precios
+# Todo se calcula con operaciones de NumPy sobre la serie completa;
+# retornos diarios r_t = V_t / V_{t-1} - 1.
+
+TRADING_DAYS = 252  # para anualizar volatilidad y Sharpe
+DEFAULT_VOLATILITY_WINDOW = 21  # ~1 mes hábil
+
+
+def simple_returns(values: np.ndarray) -> np.ndarray:
+    """
+    r_t = V_t / V_{t-1} - 1 (un elemento menos que values).
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return values[1:] / values[:-1] - 1
+
+
+def max_drawdown(values: np.ndarray):
+    """
+    Retorna (caída máxima, índice del máximo previo, índice del mínimo).
+    La caída es negativa: -0.2 significa 20% bajo el máximo anterior.
+    """
+    running_max = np.maximum.accumulate(values)
+    drawdowns = values / running_max - 1
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(values[:trough + 1]))
+    return float(drawdowns[trough]), peak, trough
+
+
+def rolling_volatility(returns: np.ndarray, window: int) -> np.ndarray:
+    """
+    Desviación estándar anualizada de los últimos window retornos
+    (len(returns) - window + 1 elementos).
+    """
+    if len(returns) < window:
+        return np.empty(0)
+    windows = sliding_window_view(returns, window)
+    return windows.std(axis=1, ddof=1) * math.sqrt(TRADING_DAYS)
+
+
+def sharpe_ratio(returns: np.ndarray, risk_free_rate=0.0):
+    """
+    Sharpe anualizado con una tasa libre de riesgo anual constante.
+    """
+    if len(returns) < 2:
+        return None
+    excess = returns - risk_free_rate / TRADING_DAYS
+    std = excess.std(ddof=1)
+    if not std > 0:
+        return None
+    return float(excess.mean() / std * math.sqrt(TRADING_DAYS))
+
+
+def asset_contributions(weights: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """
+    Aporte de cada activo al retorno: sum_t w_{i,t-1} * r_{i,t}.
+    La suma de los aportes es la suma de los retornos diarios del portafolio.
+    """
+    asset_returns = simple_returns(prices)
+    return np.nansum(weights[:-1] * asset_returns, axis=0)
+
+
+def _number(value):
+    # NaN/inf no son JSON válido
+    if value is None or not math.isfinite(value):
+        return None
+    return float(value)
+
+
+@timed
+def compute_portfolio_analytics(
+    portfolio,
+    start_date,
+    end_date,
+    risk_free_rate=0.0,
+    volatility_window=DEFAULT_VOLATILITY_WINDOW,
+) -> dict:
+    """
+    Retorno acumulado y anualizado, volatilidad (total y móvil), caída
+    máxima, Sharpe y aporte por activo del portafolio en el rango.
+    V_t y w_{i,t} salen de PortfolioValue; los precios, de la matriz compartida.
+    """
+    dates, values, symbols, asset_ids, weights = get_portfolio_value_matrix(
+        portfolio, start_date, end_date
+    )
+    result = {
+        "observations": len(dates),
+        "start_date": str(dates[0]) if len(dates) else None,
+        "end_date": str(dates[-1]) if len(dates) else None,
+        "risk_free_rate": risk_free_rate,
+        "cumulative_return": None,
+        "annualized_return": None,
+        "volatility": None,
+        "sharpe_ratio": None,
+        "max_drawdown": None,
+        "rolling_volatility": {"window": volatility_window, "data": []},
+        "contributions": [],
+    }
+    if len(dates) < 2:
+        return result
+
+    returns = simple_returns(values)
+
+    cumulative = values[-1] / values[0] - 1
+    days = int((dates[-1] - dates[0]).astype(np.int64))
+    annualized = (1 + cumulative) ** (365.25 / days) - 1 if days > 0 else np.nan
+
+    drawdown, peak, trough = max_drawdown(values)
+    rolling = rolling_volatility(returns, volatility_window)
+    rolling_dates = dates[volatility_window:]  # fecha del último retorno de cada ventana
+
+    result.update({
+        "cumulative_return": _number(cumulative),
+        "annualized_return": _number(annualized),
+        "volatility": _number(returns.std(ddof=1) * math.sqrt(TRADING_DAYS)) if len(returns) > 1 else None,
+        "sharpe_ratio": sharpe_ratio(returns, risk_free_rate),
+        "max_drawdown": {
+            "value": _number(drawdown),
+            "peak_date": str(dates[peak]),
+            "trough_date": str(dates[trough]),
+        },
+    })
+    result["rolling_volatility"]["data"] = [
+        {"date": str(date), "volatility": _number(vol)}
+        for date, vol in zip(rolling_dates, rolling)
+    ]
+
+    # Precios de cada activo en las fechas de V_t (último precio conocido)
+    ids = [asset_id if asset_id is not None else -1 for asset_id in asset_ids]
+    price_dates, prices = get_price_history(ids, dates[0].item(), dates[-1].item())
+    if len(price_dates):
+        prices = forward_fill(np.asarray(prices, dtype=np.float64))
+        rows = np.clip(np.searchsorted(price_dates, dates, side="right") - 1, 0, None)
+        contributions = asset_contributions(weights, prices[rows])
+        result["contributions"] = [
+            {"asset": symbol, "contribution": _number(value)}
+            for symbol, value in zip(symbols, contributions)
+        ]
+
+    return result
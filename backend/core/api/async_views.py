@@ -0,0 +1,117 @@
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from rest_framework.authentication import CSRFCheck
+
+from core.api.serializers import DateRangeSerializer
+from core.cache import aget_cached_portfolio_weights_and_value
+from core.models import Portfolio
+from core.selectors import aget_portfolio_weights_and_value, downsample_evolution
+
+# Vistas async de la API para el stack ASGI (uvicorn)
+# DRF 3.14 no soporta vistas async, así que son vistas de Django que usan
+# el ORM asíncrono y responden el mismo JSON que PortfolioListView y
+# PortfolioEvolutionView. Bajo WSGI también funcionan, pero sin ventaja.
+
+
+def _session_csrf_failure(request):
+    """
+    Motivo del rechazo CSRF o None. Como SessionAuthentication de DRF: solo
+    se exige el token si el request viene autenticado por la cookie de sesión.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return None
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)  # lee el token de la cookie
+    return check.process_view(request, None, (), {})
+
+
+def api_csrf(view):
+    """
+    Protección CSRF de las vistas async igual a la de sus pares DRF.
+    Los clientes de la API no mandan cookie de sesión, así que un sitio
+    ajeno no tiene credenciales que aprovechar y no se les pide token; un
+    navegador con sesión iniciada sí debe mandarlo. No se usa @csrf_exempt
+    porque en Django 4.2 envuelve la vista en una función síncrona.
+    """
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        reason = await sync_to_async(_session_csrf_failure)(request)
+        if reason:
+            return JsonResponse({"detail": f"CSRF Failed: {reason}"}, status=403)
+        return await view(request, *args, **kwargs)
+
+    wrapped.csrf_exempt = True  # CsrfViewMiddleware lo deja pasar; el chequeo es el de arriba
+    return wrapped
+
+
+def _method_not_allowed(method):
+    return JsonResponse(
+        {"detail": f'Método "{method}" no permitido.'},
+        status=405
+    )
+
+
+async def portfolio_list(request):
+    """
+    Lista de portafolios con sus IDs (igual que /api/portfolios/).
+    Método: GET
+    """
+    if request.method != "GET":
+        return _method_not_allowed(request.method)
+
+    portfolios = [
+        portfolio
+        async for portfolio in Portfolio.objects.values("id", "name")
+    ]
+    return JsonResponse(portfolios, safe=False)
+
+
+@api_csrf
+async def portfolio_evolution(request, pk):
+    """
+    Evolución del portafolio (igual que /api/portfolios/<pk>/evolution/).
+    Acepta max_points y values_only; stream y los formatos columnares
+    quedan en la vista síncrona.
+    Método: POST
+    """
+    if request.method != "POST":
+        return _method_not_allowed(request.method)
+
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"detail": "JSON inválido."}, status=400)
+
+    serializer = DateRangeSerializer(data=payload)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        portfolio = await Portfolio.objects.aget(pk=pk)
+    except Portfolio.DoesNotExist:
+        raise Http404("No Portfolio matches the given query.")
+
+    start_date = serializer.validated_data["start_date"]
+    end_date = serializer.validated_data["end_date"]
+    max_points = serializer.validated_data.get("max_points")
+
+    if serializer.validated_data["values_only"]:
+        data = await aget_portfolio_weights_and_value(
+            portfolio, start_date, end_date, values_only=True
+        )
+    else:
+        data = await aget_cached_portfolio_weights_and_value(portfolio, start_date, end_date)
+    if max_points:
+        data = list(downsample_evolution(data, len(data), max_points))
+
+    return JsonResponse({
+        "portfolio": portfolio.name,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "data": data,
+    })
+
@@ -0,0 +1,107 @@
+import importlib.util
+import io
+import json
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer
+
+# Formatos columnares para la evolución del portafolio
+# En vez de una lista de fechas con {asset, weight} repetidos en cada fila,
+# la respuesta es una columna de fechas, una de V_t y una matriz de pesos
+# (fechas × activos) con los símbolos una sola vez.
+# Arrow y Parquet necesitan pyarrow (opcional, igual que en el ETL).
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def columns_to_json(data) -> dict:
+    """
+    Pasa los arreglos de NumPy de la respuesta columnar a listas.
+    """
+    weights = data.get("weights")
+    return {
+        "portfolio": data["portfolio"],
+        "start_date": data["start_date"],
+        "end_date": data["end_date"],
+        "dates": np.datetime_as_string(data["dates"], unit="D").tolist(),
+        "total_value": data["total_value"].tolist(),
+        "assets": data["assets"],
+        "weights": weights.tolist() if weights is not None else None,
+    }
+
+
+def columns_to_table(data):
+    """
+    Tabla de pyarrow: date, total_value y una columna de pesos por activo.
+    Portafolio y rango van en los metadatos del schema.
+    """
+    import pyarrow as pa
+
+    columns = {
+        "date": pa.array(data["dates"].astype("datetime64[D]")),
+        "total_value": pa.array(data["total_value"], type=pa.float64()),
+    }
+    if data.get("weights") is not None:
+        for i, symbol in enumerate(data["assets"]):
+            columns[symbol] = pa.array(data["weights"][:, i], type=pa.float64())
+
+    return pa.table(columns).replace_schema_metadata({
+        "portfolio": data["portfolio"],
+        "start_date": data["start_date"],
+        "end_date": data["end_date"],
+    })
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    """
+    JSON orientado a columnas: dates, total_value, assets y weights[t][i].
+    """
+    media_type = "application/vnd.portfolio.columnar+json"
+    format = "columnar"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(columns_to_json(data)).encode("utf-8")
+
+
+class ArrowRenderer(BaseRenderer):
+    """
+    Apache Arrow IPC (stream).
+    """
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import pyarrow as pa
+
+        table = columns_to_table(data)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+
+
+class ParquetRenderer(BaseRenderer):
+    """
+    Archivo Parquet (compresión zstd).
+    """
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import pyarrow.parquet as pq
+
+        sink = io.BytesIO()
+        pq.write_table(columns_to_table(data), sink, compression="zstd")
+        return sink.getvalue()
+
+
+COLUMNAR_RENDERERS = [ColumnarJSONRenderer]
+if HAS_PYARROW:
+    COLUMNAR_RENDERERS += [ArrowRenderer, ParquetRenderer]
+
+COLUMNAR_FORMATS = tuple(renderer.format for renderer in COLUMNAR_RENDERERS)
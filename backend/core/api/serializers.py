@@ -1,5 +1,31 @@
+import base64
+from datetime import date
+
 from rest_framework import serializers
-from core.models import Portfolio
+from core.analytics import DEFAULT_VOLATILITY_WINDOW
+from core.engine import SCENARIO_BOOTSTRAP, SCENARIO_METHODS
+from core.models import ETLJob, Portfolio, PortfolioRollup
+from core.simulation import SIMULATION_FREQUENCIES
+
+class DateCursorField(serializers.Field):
+    """
+    Cursor opaco de la paginación: la última fecha entregada, en base64.
+    """
+    PREFIX = "d:"
+    default_error_messages = {"invalid": "Cursor inválido."}
+
+    def to_internal_value(self, data):
+        try:
+            text = base64.urlsafe_b64decode(str(data).encode("ascii")).decode("ascii")
+            if not text.startswith(self.PREFIX):
+                raise ValueError
+            return date.fromisoformat(text[len(self.PREFIX):])
+        except ValueError:
+            self.fail("invalid")
+
+    def to_representation(self, value):
+        return base64.urlsafe_b64encode(f"{self.PREFIX}{value.isoformat()}".encode("ascii")).decode("ascii")
+
 
 class DateRangeSerializer(serializers.Serializer):
     """
@@ -9,9 +35,139 @@ class DateRangeSerializer(serializers.Serializer):
     """
     start_date = serializers.DateField()
     end_date = serializers.DateField()
+    # Opcionales: respuesta NDJSON por streaming y reducción de puntos en el servidor
+    stream = serializers.BooleanField(required=False, default=False)
+    max_points = serializers.IntegerField(required=False, min_value=2)
+    # Solo V_t (sin pesos), lee una fila por fecha
+    values_only = serializers.BooleanField(required=False, default=False)
+    # Paginación: fechas por página y el cursor "next" de la página anterior
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=5000)
+    cursor = DateCursorField(required=False)
+    # Un punto por día, semana o mes (los dos últimos leen PortfolioRollup)
+    resolution = serializers.ChoiceField(
+        choices=[PortfolioRollup.RESOLUTION_DAILY] + [
+            value for value, _ in PortfolioRollup.RESOLUTION_CHOICES
+        ],
+        required=False,
+        default=PortfolioRollup.RESOLUTION_DAILY,
+    )
+
+    def validate(self, attrs):
+        if "cursor" in attrs and "page_size" not in attrs:
+            raise serializers.ValidationError({"cursor": ["Requiere page_size."]})
+        if "page_size" in attrs and (attrs["stream"] or "max_points" in attrs):
+            raise serializers.ValidationError(
+                {"page_size": ["No se combina con stream ni max_points."]}
+            )
+        if attrs["resolution"] != PortfolioRollup.RESOLUTION_DAILY and (
+            attrs["stream"] or "max_points" in attrs or "page_size" in attrs
+        ):
+            raise serializers.ValidationError(
+                {"resolution": ["No se combina con stream, max_points ni page_size."]}
+            )
+        return attrs
+
+
+class BatchEvolutionSerializer(serializers.Serializer):
+    """
+    Validador para el payload de la evolución de varios portafolios.
+    """
+    MAX_PORTFOLIOS = 100
+
+    portfolios = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_PORTFOLIOS,
+    )
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    max_points = serializers.IntegerField(required=False, min_value=2)
+    values_only = serializers.BooleanField(required=False, default=False)
+
+
+class SimulationSerializer(serializers.Serializer):
+    """
+    Validador para el payload de la simulación (no se guarda nada).
+    """
+    WEIGHTS_TOLERANCE = 1e-4
+
+    weights = serializers.DictField(
+        child=serializers.FloatField(min_value=0), allow_empty=False
+    )  # {símbolo: w_{i,0}}
+    initial_value = serializers.FloatField(min_value=0.01)  # V_0
+    start_date = serializers.DateField()  # t=0: fecha de compra
+    end_date = serializers.DateField()
+    rebalance_frequency = serializers.ChoiceField(
+        choices=SIMULATION_FREQUENCIES, required=False, default=Portfolio.REBALANCE_NONE
+    )
+    max_points = serializers.IntegerField(required=False, min_value=2)
+    values_only = serializers.BooleanField(required=False, default=False)
+
+    def validate_weights(self, value):
+        if abs(sum(value.values()) - 1) > self.WEIGHTS_TOLERANCE:
+            raise serializers.ValidationError("Los pesos deben sumar 1.")
+        return value
+
+    def validate(self, attrs):
+        if attrs["end_date"] < attrs["start_date"]:
+            raise serializers.ValidationError({"end_date": ["Debe ser posterior a start_date."]})
+        return attrs
+
+
+class AnalyticsSerializer(serializers.Serializer):
+    """
+    Validador para el payload del endpoint de análisis.
+    """
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    # Tasa libre de riesgo anual para el Sharpe (0.03 = 3%)
+    risk_free_rate = serializers.FloatField(required=False, default=0.0)
+    # Retornos diarios por ventana de la volatilidad móvil
+    volatility_window = serializers.IntegerField(
+        required=False, default=DEFAULT_VOLATILITY_WINDOW, min_value=2
+    )
     
+class ScenarioSerializer(serializers.Serializer):
+    """
+    Validador para el payload de los escenarios Monte Carlo / bootstrap.
+    """
+    MAX_PATHS = 100_000
+    MAX_HORIZON = 2520  # ~10 años hábiles
+    # Tope de caminos × días por request (10.000 caminos a un año, ~1 s por
+    # proceso); corridas más grandes van por el comando run_scenarios
+    MAX_PATH_DAYS = 2_520_000
+
+    method = serializers.ChoiceField(choices=SCENARIO_METHODS, required=False, default=SCENARIO_BOOTSTRAP)
+    paths = serializers.IntegerField(required=False, default=10_000, min_value=1, max_value=MAX_PATHS)
+    horizon = serializers.IntegerField(required=False, default=252, min_value=1, max_value=MAX_HORIZON)
+    block_size = serializers.IntegerField(required=False, default=5, min_value=1, max_value=252)
+    # Sin semilla se usa una nueva; la respuesta trae la usada para repetir la corrida
+    seed = serializers.IntegerField(required=False, min_value=0)
+    history_start = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs["paths"] * attrs["horizon"] > self.MAX_PATH_DAYS:
+            raise serializers.ValidationError({"paths": [
+                f"paths × horizon no puede superar {self.MAX_PATH_DAYS}; "
+                "para corridas más grandes usar el comando run_scenarios."
+            ]})
+        return attrs
+
+
 #Serializador para listar portafolios    
 class PortfolioListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Portfolio
-        fields = ['id', 'name']  
\ No newline at end of file
+        fields = ['id', 'name']  
+
+
+# Serializador del estado/progreso de una carga ETL en segundo plano
+class ETLJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ETLJob
+        fields = [
+            'id', 'status', 'input_format', 'rows_parsed', 'prices_written',
+            'positions_computed', 'error', 'created_at', 'started_at', 'updated_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
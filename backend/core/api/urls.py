@@ -1,7 +1,28 @@
 from django.urls import path
-from core.api.views import PortfolioEvolutionView,PortfolioListView
+from core.api import async_views
+from core.api.views import (
+    CacheStatsView,
+    ETLJobDetailView,
+    ETLJobUploadView,
+    PortfolioAnalyticsView,
+    PortfolioBatchEvolutionView,
+    PortfolioEvolutionView,
+    PortfolioListView,
+    PortfolioScenarioView,
+    SimulationView,
+)
 
 urlpatterns = [
     path("portfolios/<int:pk>/evolution/", PortfolioEvolutionView.as_view()),
+    path("portfolios/evolution/", PortfolioBatchEvolutionView.as_view(), name="portfolio-batch-evolution"),
+    path("portfolios/<int:pk>/analytics/", PortfolioAnalyticsView.as_view(), name="portfolio-analytics"),
+    path("portfolios/<int:pk>/scenarios/", PortfolioScenarioView.as_view(), name="portfolio-scenarios"),
     path("portfolios/", PortfolioListView.as_view(), name="portfolio-list"), #Para listar GET
+    # Versiones async (ASGI) de la evolución y la lista de portafolios
+    path("async/portfolios/", async_views.portfolio_list, name="async-portfolio-list"),
+    path("async/portfolios/<int:pk>/evolution/", async_views.portfolio_evolution, name="async-portfolio-evolution"),
+    path("simulate/", SimulationView.as_view(), name="simulate"),
+    path("cache/stats/", CacheStatsView.as_view(), name="cache-stats"),
+    path("etl-jobs/", ETLJobUploadView.as_view(), name="etl-job-upload"),
+    path("etl-jobs/<int:pk>/", ETLJobDetailView.as_view(), name="etl-job-detail"),
 ]
@@ -1,17 +1,72 @@
+import json
+
+import numpy as np
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from rest_framework.generics import ListAPIView
-from core.models import Portfolio
-from core.api.serializers import DateRangeSerializer, PortfolioListSerializer
-from core.selectors import get_portfolio_weights_and_value
+from rest_framework import status
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from core.models import ETLJob, Portfolio, PortfolioRollup
+from core.api.renderers import COLUMNAR_FORMATS, COLUMNAR_RENDERERS
+from core.api.serializers import (
+    AnalyticsSerializer,
+    BatchEvolutionSerializer,
+    DateCursorField,
+    DateRangeSerializer,
+    ETLJobSerializer,
+    PortfolioListSerializer,
+    ScenarioSerializer,
+    SimulationSerializer,
+)
+from core.cache import (
+    get_cache_stats,
+    get_cached_portfolio_analytics,
+    get_cached_portfolio_weights_and_value,
+)
+from core.ingestion import detect_input_format
+from core.scenarios import compute_portfolio_scenarios
+from core.simulation import simulate_portfolio
+from core.jobs import enqueue_etl_job
+from core.selectors import (
+    count_portfolio_dates,
+    downsample_columns,
+    downsample_evolution,
+    get_portfolio_page,
+    get_portfolio_rollups,
+    get_portfolio_value_matrix,
+    get_portfolio_values,
+    get_portfolios_weights_and_value,
+    iter_portfolio_weights_and_value,
+)
+
+class ColumnarErrorsMixin:
+    """
+    Los errores se responden en JSON aunque se haya pedido un formato columnar.
+    """
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + COLUMNAR_RENDERERS
+
+    def handle_exception(self, exc):
+        renderer = getattr(self.request, "accepted_renderer", None)
+        if renderer is not None and renderer.format in COLUMNAR_FORMATS:
+            self.request.accepted_renderer = JSONRenderer()
+            self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
 
 # Requisito 4: Endpoint API REST
 # Recibe fecha_inicio y fecha_fin, retorna w_{i,t} y V_t
-class PortfolioEvolutionView(APIView):
+class PortfolioEvolutionView(ColumnarErrorsMixin, APIView):
     """
     Endpoint principal de la prueba.
     Recibe un rango de fechas y retorna la evolución del portafolio.
+    Con Accept (o ?format=) columnar, arrow o parquet responde en columnas.
+    Con page_size responde por páginas y el cursor de la siguiente en "next".
+    Con resolution weekly o monthly responde un punto por período.
     """
     def post(self, request, pk):
         # Validar que vengan las fechas correctamente
@@ -20,13 +75,58 @@ class PortfolioEvolutionView(APIView):
 
         # Obtener el portafolio
         portfolio = get_object_or_404(Portfolio, pk=pk)
+        start_date = serializer.validated_data["start_date"]
+        end_date = serializer.validated_data["end_date"]
+        max_points = serializer.validated_data.get("max_points")
 
-        # Usar el selector que hace los cálculos con el ORM
-        data = get_portfolio_weights_and_value(
-            portfolio,
-            serializer.validated_data["start_date"],
-            serializer.validated_data["end_date"],
-        )
+        resolution = serializer.validated_data["resolution"]
+        if resolution != PortfolioRollup.RESOLUTION_DAILY:
+            if request.accepted_renderer.format in COLUMNAR_FORMATS:
+                raise ValidationError({"resolution": ["Solo para la respuesta JSON."]})
+            return Response({
+                "portfolio": portfolio.name,
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "resolution": resolution,
+                "data": get_portfolio_rollups(
+                    portfolio, start_date, end_date, resolution,
+                    serializer.validated_data["values_only"],
+                ),
+            })
+
+        if "page_size" in serializer.validated_data:
+            if request.accepted_renderer.format in COLUMNAR_FORMATS:
+                raise ValidationError({"page_size": ["Solo para la respuesta JSON."]})
+            return self.page(
+                portfolio, start_date, end_date,
+                serializer.validated_data["page_size"],
+                serializer.validated_data.get("cursor"),
+                serializer.validated_data["values_only"],
+            )
+
+        if request.accepted_renderer.format in COLUMNAR_FORMATS:
+            return self.columnar(
+                portfolio, start_date, end_date, max_points,
+                serializer.validated_data["values_only"],
+            )
+
+        if serializer.validated_data["stream"]:
+            return self.stream(
+                portfolio, start_date, end_date, max_points,
+                serializer.validated_data["values_only"],
+            )
+
+        if serializer.validated_data["values_only"]:
+            data = get_portfolio_values(portfolio, start_date, end_date)
+        else:
+            # Usar el selector que hace los cálculos con el ORM (cacheado por versión de datos)
+            data = get_cached_portfolio_weights_and_value(
+                portfolio,
+                start_date,
+                end_date,
+            )
+        if max_points:
+            data = list(downsample_evolution(data, len(data), max_points))
 
         # Retornar los datos en formato JSON
         return Response({
@@ -36,6 +136,214 @@ class PortfolioEvolutionView(APIView):
             "data": data,  # Contiene w_{i,t} y V_t para cada fecha
         })
 
+    def page(self, portfolio, start_date, end_date, page_size, after=None, values_only=False):
+        """
+        Una página de la evolución, leída por keyset sobre la fecha (sin
+        OFFSET). "next" es null en la última página.
+        """
+        data, last_date = get_portfolio_page(
+            portfolio, start_date, end_date, page_size, after, values_only
+        )
+        return Response({
+            "portfolio": portfolio.name,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "data": data,
+            "next": DateCursorField().to_representation(last_date) if last_date else None,
+        })
+
+    def columnar(self, portfolio, start_date, end_date, max_points=None, values_only=False):
+        """
+        Arreglos de NumPy leídos de PortfolioValue; el renderer negociado
+        los escribe como JSON columnar, Arrow o Parquet.
+        """
+        dates, values, symbols, _, weights = get_portfolio_value_matrix(
+            portfolio, start_date, end_date
+        )
+        if values_only:
+            weights = None
+        if max_points:
+            dates, values, weights = downsample_columns(dates, values, weights, max_points)
+
+        return Response({
+            "portfolio": portfolio.name,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "dates": dates,
+            "total_value": values,
+            "assets": symbols,
+            "weights": weights,  # weights[t, i] = w_{i,t}
+        })
+
+    def stream(self, portfolio, start_date, end_date, max_points=None, values_only=False):
+        """
+        Respuesta NDJSON: una línea JSON por fecha, generada a medida que
+        se leen las posiciones (la memoria no depende del largo del rango).
+        """
+        items = iter_portfolio_weights_and_value(portfolio, start_date, end_date, values_only)
+        if max_points:
+            total = count_portfolio_dates(portfolio, start_date, end_date)
+            items = downsample_evolution(items, total, max_points)
+
+        return StreamingHttpResponse(
+            (json.dumps(item) + "\n" for item in items),
+            content_type="application/x-ndjson",
+        )
+
+
+class PortfolioBatchEvolutionView(APIView):
+    """
+    Evolución de varios portafolios en un mismo rango de fechas.
+    Lee los valores de todos con una sola query, así pedir 50 portafolios
+    cuesta casi lo mismo que pedir uno.
+    Método: POST
+    """
+    def post(self, request):
+        serializer = BatchEvolutionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        ids = list(dict.fromkeys(serializer.validated_data["portfolios"]))  # sin repetidos, en orden
+        portfolios = Portfolio.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in portfolios]
+        if missing:
+            return Response(
+                {"detail": "Portafolios no encontrados.", "missing": missing},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        start_date = serializer.validated_data["start_date"]
+        end_date = serializer.validated_data["end_date"]
+        max_points = serializer.validated_data.get("max_points")
+        series = get_portfolios_weights_and_value(
+            portfolios.values(), start_date, end_date,
+            values_only=serializer.validated_data["values_only"],
+        )
+
+        results = []
+        for pk in ids:
+            data = series[pk]
+            if max_points:
+                data = list(downsample_evolution(data, len(data), max_points))
+            results.append({"id": pk, "portfolio": portfolios[pk].name, "data": data})
+
+        return Response({
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "portfolios": results,
+        })
+
+
+class SimulationView(ColumnarErrorsMixin, APIView):
+    """
+    Simulación "qué pasaría si": evolución de un portafolio con pesos y V_0
+    a elección, calculada en memoria sobre la matriz de precios compartida.
+    No guarda nada. Acepta los mismos formatos columnares que la evolución.
+    Método: POST
+    """
+    def post(self, request):
+        serializer = SimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        try:
+            dates, values, symbols, weights = simulate_portfolio(
+                params["weights"],
+                params["initial_value"],
+                params["start_date"],
+                params["end_date"],
+                params["rebalance_frequency"],
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = {
+            "portfolio": "simulation",
+            "start_date": params["start_date"].isoformat(),
+            "end_date": params["end_date"].isoformat(),
+            "initial_value": params["initial_value"],
+            "rebalance_frequency": params["rebalance_frequency"],
+        }
+        max_points = params.get("max_points")
+
+        if request.accepted_renderer.format in COLUMNAR_FORMATS:
+            weights = None if params["values_only"] else np.nan_to_num(weights)
+            if max_points:
+                dates, values, weights = downsample_columns(dates, values, weights, max_points)
+            return Response({**result, "dates": dates, "total_value": values,
+                             "assets": symbols, "weights": weights})
+
+        days = np.datetime_as_string(dates, unit="D").tolist()
+        if params["values_only"]:
+            data = [
+                {"date": day, "total_value": value}
+                for day, value in zip(days, values.tolist())
+            ]
+        else:
+            data = [
+                {
+                    "date": day,
+                    "total_value": value,  # V_t
+                    "weights": [
+                        {"asset": symbol, "weight": weight}
+                        for symbol, weight in zip(symbols, row)
+                        if weight == weight  # sin NaN: activo sin precio ese día
+                    ],
+                }
+                for day, value, row in zip(days, values.tolist(), weights.tolist())
+            ]
+        if max_points:
+            data = list(downsample_evolution(data, len(data), max_points))
+        return Response({**result, "data": data})
+
+
+class PortfolioAnalyticsView(APIView):
+    """
+    Retorno acumulado y anualizado, volatilidad móvil, caída máxima, Sharpe
+    y aporte por activo para un rango de fechas (cacheado por versión de datos).
+    Método: POST
+    """
+    def post(self, request, pk):
+        serializer = AnalyticsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        portfolio = get_object_or_404(Portfolio, pk=pk)
+        data = get_cached_portfolio_analytics(
+            portfolio,
+            serializer.validated_data["start_date"],
+            serializer.validated_data["end_date"],
+            serializer.validated_data["risk_free_rate"],
+            serializer.validated_data["volatility_window"],
+        )
+        return Response({"portfolio": portfolio.name, **data})
+
+
+class PortfolioScenarioView(APIView):
+    """
+    Escenarios de estrés desde los pesos actuales: distribución de V_T,
+    VaR/CVaR y caídas máximas de caminos simulados con block bootstrap
+    de los retornos históricos o una normal multivariada.
+    Método: POST
+    """
+    def post(self, request, pk):
+        serializer = ScenarioSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        portfolio = get_object_or_404(Portfolio, pk=pk)
+        params = serializer.validated_data
+        try:
+            data = compute_portfolio_scenarios(
+                portfolio,
+                n_paths=params["paths"],
+                horizon=params["horizon"],
+                method=params["method"],
+                block_size=params["block_size"],
+                seed=params.get("seed"),
+                history_start=params.get("history_start"),
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
 
 class PortfolioListView(ListAPIView):
     """
@@ -43,4 +351,54 @@ class PortfolioListView(ListAPIView):
     Método: GET
     """
     queryset = Portfolio.objects.all()
-    serializer_class = PortfolioListSerializer
\ No newline at end of file
+    serializer_class = PortfolioListSerializer
+
+
+class CacheStatsView(APIView):
+    """
+    Retorna los aciertos/fallos de la caché de evolución de este proceso.
+    Método: GET
+    """
+    def get(self, request):
+        return Response(get_cache_stats())
+
+
+class ETLJobUploadView(APIView):
+    """
+    Recibe el archivo (campo "file") y encola la carga ETL.
+    Para CSV/Parquet los pesos van en el campo "weights", en el mismo formato.
+    Responde de inmediato con el id del trabajo.
+    Método: POST (multipart)
+    """
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        uploaded = request.FILES.get("file")
+        if uploaded is None:
+            return Response(
+                {"file": ["Este campo es requerido."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        input_format = detect_input_format(uploaded.name)
+        weights = request.FILES.get("weights")
+        if input_format != "xlsx" and weights is None:
+            return Response(
+                {"weights": ["Este campo es requerido para archivos CSV o Parquet."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if weights is not None and detect_input_format(weights.name) != input_format:
+            return Response(
+                {"weights": [f"Debe tener el mismo formato que el archivo ({input_format})."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        job = enqueue_etl_job(uploaded, input_format, weights)
+        return Response(ETLJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ETLJobDetailView(RetrieveAPIView):
+    """
+    Retorna el estado y el progreso de una carga ETL.
+    Método: GET
+    """
+    queryset = ETLJob.objects.all()
+    serializer_class = ETLJobSerializer
@@ -0,0 +1,183 @@
+import contextlib
+import io
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.selectors import get_portfolio_weights_and_value
+from core.services import (
+    calculate_all_positions,
+    calculate_historical_positions,
+    calculate_initial_positions,
+    load_excel_data,
+)
+from core.synthetic import build_synthetic_workbook, create_synthetic_dataset
+
+# Mediciones de rendimiento del ETL, los cálculos de posiciones y el selector
+# Cada paso corre dentro de una transacción que se revierte, así se puede
+# repetir sobre los mismos datos y la base queda como estaba.
+
+BENCHMARK_STEPS = (
+    "load_excel_data",
+    "calculate_historical_positions",
+    "calculate_all_positions",
+    "get_portfolio_weights_and_value",
+)
+
+
+def parse_size(value: str) -> dict:
+    """
+    "activos x fechas x portafolios", por ejemplo "17x2500x2".
+    """
+    n_assets, n_dates, n_portfolios = (int(part) for part in value.lower().split("x"))
+    return {"assets": n_assets, "dates": n_dates, "portfolios": n_portfolios}
+
+
+@contextlib.contextmanager
+def _rolled_back():
+    # Los servicios imprimen su avance; aquí solo interesa el resultado
+    with transaction.atomic(), contextlib.redirect_stdout(io.StringIO()):
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(step, repeat=3) -> dict:
+    """
+    Corre step() repeat veces y retorna el mejor tiempo, la mediana, la
+    cantidad de queries y el pico de memoria de Python (tracemalloc, en una
+    corrida aparte porque hace más lento el código medido).
+    """
+    times = []
+    queries = 0
+    for _ in range(max(repeat, 1)):
+        with _rolled_back(), CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            step()
+            times.append(time.perf_counter() - started)
+        queries = len(captured)
+
+    with _rolled_back():
+        tracemalloc.start()
+        try:
+            step()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "wall_s": min(times),
+        "wall_s_median": statistics.median(times),
+        "queries": queries,
+        "peak_mb": peak / 2 ** 20,
+    }
+
+
+def _load_excel_step(size, seed):
+    workbook = build_synthetic_workbook(size["assets"], size["dates"], seed=seed)
+
+    def step():
+        workbook.seek(0)
+        load_excel_data(workbook)
+    return step
+
+
+def _historical_step(portfolios):
+    def step():
+        for portfolio in portfolios:
+            calculate_initial_positions(portfolio)
+            calculate_historical_positions(portfolio)
+    return step
+
+
+def _all_positions_step(portfolios):
+    def step():
+        calculate_all_positions(portfolios)
+    return step
+
+
+def _evolution_step(portfolio, end_date):
+    def step():
+        get_portfolio_weights_and_value(portfolio, portfolio.start_date, end_date)
+    return step
+
+
+def run_benchmark(sizes, steps=BENCHMARK_STEPS, repeat=3, seed=0, log=None):
+    """
+    Mide cada paso para cada tamaño y retorna una lista de resultados
+    {"size", "step", "wall_s", "wall_s_median", "queries", "peak_mb"}.
+    """
+    results = []
+
+    def record(size, step_name, step):
+        if step_name not in steps:
+            return
+        if log is not None:
+            log(f"{size['assets']}x{size['dates']}x{size['portfolios']} {step_name}")
+        results.append({"size": size, "step": step_name, **measure(step, repeat)})
+
+    for size in sizes:
+        record(size, "load_excel_data", _load_excel_step(size, seed))
+
+        with _rolled_back():
+            portfolios = create_synthetic_dataset(
+                n_assets=size["assets"],
+                n_dates=size["dates"],
+                n_portfolios=size["portfolios"],
+                seed=seed,
+            )
+            end_date = max(p.computed_until for p in portfolios)
+            record(size, "calculate_historical_positions", _historical_step(portfolios))
+            record(size, "calculate_all_positions", _all_positions_step(portfolios))
+            record(size, "get_portfolio_weights_and_value", _evolution_step(portfolios[0], end_date))
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info() -> dict:
+    """
+    Datos para saber contra qué se comparan dos corridas.
+    """
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def compare_results(baseline, current):
+    """
+    Retorna (tamaño, paso, métrica, antes, ahora) para los pasos presentes
+    en ambas corridas.
+    """
+    def key(result):
+        size = result["size"]
+        return (f"{size['assets']}x{size['dates']}x{size['portfolios']}", result["step"])
+
+    before = {key(result): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        for metric in ("wall_s", "queries", "peak_mb"):
+            rows.append((*key(result), metric, old[metric], result[metric]))
+    return rows
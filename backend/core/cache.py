@@ -0,0 +1,131 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+from core.analytics import compute_portfolio_analytics
+from core.models import DatasetVersion
+from core.selectors import aget_portfolio_weights_and_value, get_portfolio_weights_and_value
+
+# Caché de resultados de get_portfolio_weights_and_value
+# Las claves usan la versión de datos como "version" de la caché de Django:
+# cuando el ETL o un recálculo la incrementan, las entradas viejas dejan de
+# encontrarse sin tener que borrar nada a mano.
+
+EVOLUTION_CACHE = "evolution"
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def get_dataset_version() -> int:
+    """
+    Retorna la versión actual de los datos (0 si nunca se cargó nada).
+    """
+    version = DatasetVersion.objects.values_list("version", flat=True).first()
+    return version or 0
+
+
+async def aget_dataset_version() -> int:
+    version = await DatasetVersion.objects.values_list("version", flat=True).afirst()
+    return version or 0
+
+
+def bump_dataset_version(prices=False) -> None:
+    """
+    Incrementa la versión de los datos. Se llama dentro de la transacción
+    del ETL/recálculo, así la versión nueva se ve junto con los datos nuevos.
+    Con prices=True se marca además que cambiaron los precios.
+    """
+    changes = {"version": F("version") + 1}
+    if prices:
+        changes["prices_version"] = F("version") + 1
+    updated = DatasetVersion.objects.update(**changes)
+    if not updated:
+        DatasetVersion.objects.create(version=1, prices_version=1 if prices else 0)
+
+
+def _record(hit: bool) -> None:
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def get_cache_stats() -> dict:
+    """
+    Contadores de aciertos/fallos de este proceso y configuración de la caché.
+    """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    config = settings.CACHES[EVOLUTION_CACHE]
+    total = hits + misses
+    return {
+        "backend": config["BACKEND"],
+        "max_entries": config.get("OPTIONS", {}).get("MAX_ENTRIES"),
+        "dataset_version": get_dataset_version(),
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def _get_or_compute(key, compute):
+    cache = caches[EVOLUTION_CACHE]
+    version = get_dataset_version()
+
+    data = cache.get(key, version=version)
+    _record(hit=data is not None)
+    if data is None:
+        data = compute()
+        cache.set(key, data, version=version)
+    return data
+
+
+def get_cached_portfolio_weights_and_value(portfolio, start_date, end_date):
+    """
+    Igual que get_portfolio_weights_and_value, pero guarda el resultado
+    por (portafolio, fecha inicio, fecha fin, versión de datos).
+    """
+    return _get_or_compute(
+        _evolution_key(portfolio, start_date, end_date),
+        lambda: get_portfolio_weights_and_value(portfolio, start_date, end_date),
+    )
+
+
+async def aget_cached_portfolio_weights_and_value(portfolio, start_date, end_date):
+    """
+    Versión async de get_cached_portfolio_weights_and_value (misma clave y
+    versión, así las vistas síncronas y async comparten la caché).
+    """
+    cache = caches[EVOLUTION_CACHE]
+    key = _evolution_key(portfolio, start_date, end_date)
+    version = await aget_dataset_version()
+
+    data = await cache.aget(key, version=version)
+    _record(hit=data is not None)
+    if data is None:
+        data = await aget_portfolio_weights_and_value(portfolio, start_date, end_date)
+        await cache.aset(key, data, version=version)
+    return data
+
+
+def _evolution_key(portfolio, start_date, end_date) -> str:
+    return f"evolution:{portfolio.pk}:{start_date.isoformat()}:{end_date.isoformat()}"
+
+
+def get_cached_portfolio_analytics(
+    portfolio, start_date, end_date, risk_free_rate, volatility_window
+):
+    """
+    Igual que compute_portfolio_analytics, cacheado por parámetros y versión de datos.
+    """
+    key = (
+        f"analytics:{portfolio.pk}:{start_date.isoformat()}:{end_date.isoformat()}"
+        f":{risk_free_rate}:{volatility_window}"
+    )
+    return _get_or_compute(
+        key,
+        lambda: compute_portfolio_analytics(
+            portfolio, start_date, end_date, risk_free_rate, volatility_window
+        ),
+    )
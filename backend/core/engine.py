@@ -0,0 +1,160 @@
+import numpy as np
+
+# Cálculos vectorizados sobre la matriz de precios (fechas × activos)
+# Funciones puras de NumPy: no tocan la base, las usan services.py y los
+# análisis que trabajan sobre la matriz compartida de precios.
+
+
+def forward_fill(prices: np.ndarray) -> np.ndarray:
+    """
+    Rellena cada NaN con el último precio conocido del mismo activo.
+    Los NaN anteriores al primer precio de un activo se mantienen.
+    """
+    n_dates = prices.shape[0]
+    last_valid = np.where(
+        np.isnan(prices), 0, np.arange(n_dates)[:, None]
+    )
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    return prices[last_valid, np.arange(prices.shape[1])]
+
+
+def rebalance_mask(dates, frequency: str, target_rows=None) -> np.ndarray:
+    """
+    Retorna un booleano por fecha: True si ese día se rebalancea.
+    La primera fecha siempre es True (compra inicial).
+    frequency: "none", "daily", "monthly", "quarterly" o "weights"
+    (en "weights", target_rows indica qué fila de pesos rige cada fecha y se
+    rebalancea cuando cambia).
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    n_dates = len(dates)
+    mask = np.zeros(n_dates, dtype=bool)
+    if n_dates == 0:
+        return mask
+
+    if frequency == "daily":
+        mask[:] = True
+    elif frequency in ("monthly", "quarterly"):
+        months = dates.astype("datetime64[M]").astype(np.int64)
+        periods = months // 3 if frequency == "quarterly" else months
+        mask[1:] = periods[1:] != periods[:-1]
+    elif frequency == "weights":
+        target_rows = np.asarray(target_rows)
+        mask[1:] = target_rows[1:] != target_rows[:-1]
+    elif frequency != "none":
+        raise ValueError(f"Frecuencia de rebalanceo no soportada: {frequency}")
+
+    mask[0] = True
+    return mask
+
+
+def simulate_rebalancing(
+    prices: np.ndarray,
+    targets: np.ndarray,
+    rebalance: np.ndarray,
+    initial_value: float,
+) -> np.ndarray:
+    """
+    Retorna las cantidades c_{i,t} (fechas × activos) de un portafolio que
+    vuelve a los pesos objetivo en cada fecha marcada en rebalance.
+
+    prices: p_{i,t} sin huecos (ver forward_fill)
+    targets: pesos objetivo vigentes en cada fecha (fechas × activos)
+    rebalance: booleano por fecha, rebalance[0] debe ser True
+
+    Entre rebalanceos el valor crece como sum_i w_{i,k} * p_{i,r_{k+1}} / p_{i,r_k},
+    así V en cada rebalanceo sale de un producto acumulado y no hace falta
+    recorrer las fechas una por una.
+    """
+    rows = np.flatnonzero(rebalance)
+    prices_at = prices[rows]  # p_{i,r_k}
+    weights_at = targets[rows]  # w_{i,r_k}
+
+    # Crecimiento del portafolio entre un rebalanceo y el siguiente
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = prices[rows[1:]] / prices_at[:-1]
+    growth = np.nansum(weights_at[:-1] * ratio, axis=1)
+    values_at = initial_value * np.concatenate(([1.0], np.cumprod(growth)))  # V_{r_k}
+
+    # c_{i,r_k} = w_{i,r_k} * V_{r_k} / p_{i,r_k}; sin precio no se compra
+    with np.errstate(invalid="ignore", divide="ignore"):
+        quantities_at = weights_at * values_at[:, None] / prices_at
+    quantities_at = np.where(np.isfinite(quantities_at), quantities_at, 0.0)
+
+    # Cada fecha mantiene las cantidades del último rebalanceo
+    segment = np.cumsum(rebalance) - 1
+    return quantities_at[segment]
+
+
+# Escenarios Monte Carlo / bootstrap sobre los retornos diarios históricos
+# Cada bloque de caminos recibe su propia semilla (SeedSequence.spawn), así el
+# resultado solo depende de la semilla y no de cuántos procesos lo calculen.
+# Este módulo no importa Django: los procesos del pool lo cargan solo.
+
+SCENARIO_BOOTSTRAP = "bootstrap"
+SCENARIO_PARAMETRIC = "parametric"
+SCENARIO_METHODS = (SCENARIO_BOOTSTRAP, SCENARIO_PARAMETRIC)
+
+
+def bootstrap_returns(rng, returns: np.ndarray, n_paths: int, horizon: int, block_size: int) -> np.ndarray:
+    """
+    Block bootstrap: cada camino concatena bloques de block_size días
+    consecutivos de returns (días × activos) elegidos al azar, así se
+    mantiene la correlación entre activos y la autocorrelación corta.
+    Retorna (caminos × horizonte × activos).
+    """
+    n_blocks = -(-horizon // block_size)
+    starts = rng.integers(0, len(returns) - block_size + 1, size=(n_paths, n_blocks))
+    rows = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :horizon]
+    return returns[rows]
+
+
+def parametric_returns(rng, returns: np.ndarray, n_paths: int, horizon: int) -> np.ndarray:
+    """
+    Normal multivariada ajustada a los log-retornos diarios (media y
+    covarianza entre activos). Retorna retornos simples (caminos × horizonte × activos).
+    """
+    log_returns = np.log1p(returns)
+    mean = log_returns.mean(axis=0)
+    cov = np.atleast_2d(np.cov(log_returns, rowvar=False))
+    try:
+        # Cholesky es más rápido que la SVD de multivariate_normal; si la
+        # covarianza no es definida positiva (activos colineales) se usa esa
+        factor = np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        return np.expm1(rng.multivariate_normal(mean, cov, size=(n_paths, horizon)))
+    samples = rng.standard_normal((n_paths, horizon, len(mean))) @ factor.T
+    samples += mean
+    return np.expm1(samples, out=samples)
+
+
+def simulate_scenarios(
+    returns: np.ndarray,
+    weights: np.ndarray,
+    n_paths: int,
+    horizon: int,
+    method=SCENARIO_BOOTSTRAP,
+    block_size=5,
+    seed=None,
+):
+    """
+    Simula n_paths caminos de horizon días de un buy and hold con los pesos
+    iniciales weights y V_0 = 1. Retorna (V_T por camino, caída máxima por
+    camino, negativa como en core.analytics). seed: entero o np.random.SeedSequence.
+    """
+    rng = np.random.default_rng(seed)
+    if method == SCENARIO_BOOTSTRAP:
+        paths = bootstrap_returns(rng, returns, n_paths, horizon, block_size)
+    elif method == SCENARIO_PARAMETRIC:
+        paths = parametric_returns(rng, returns, n_paths, horizon)
+    else:
+        raise ValueError(f"Método de escenarios no soportado: {method}")
+
+    # Crecimiento acumulado de cada activo y V_t / V_0 = sum_i w_i * prod(1 + r_{i,s})
+    paths += 1.0
+    np.cumprod(paths, axis=1, out=paths)
+    values = paths @ weights  # caminos × horizonte
+
+    peaks = np.maximum.accumulate(np.maximum(values, 1.0), axis=1)  # incluye V_0
+    drawdowns = (values / peaks - 1.0).min(axis=1)
+    return values[:, -1], drawdowns
@@ -0,0 +1,263 @@
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+from django.db import connection
+
+from core.models import Price
+
+# Requisito 2: Lectura por lotes de los archivos de entrada del ETL
+# Los precios se leen fila por fila y se escriben en lotes, así la memoria
+# no crece con el tamaño de la hoja "Precios".
+
+INPUT_FORMATS = ("xlsx", "csv", "parquet")
+DEFAULT_BATCH_SIZE = 5000  # cantidad de precios p_{i,t} por INSERT/COPY
+
+WEIGHTS_SHEET = "weights"
+PRICES_SHEET = "Precios"
+DATE_COLUMN = "Dates"
+PRICE_QUANTUM = Decimal("0.000001")  # Price.price tiene 6 decimales
+
+
+def detect_input_format(filename) -> str:
+    """
+    Deduce el formato a partir de la extensión del archivo.
+    Si no se reconoce se asume Excel, que es el formato original del ETL.
+    """
+    name = str(filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".parquet", ".pq")):
+        return "parquet"
+    return "xlsx"
+
+
+def _open_workbook(source):
+    # read_only evita cargar la hoja completa en memoria
+    from openpyxl import load_workbook
+
+    return load_workbook(source, read_only=True, data_only=True)
+
+
+def _sheet_rows(workbook, sheet_name):
+    """
+    Recorre una hoja como diccionarios {columna: valor}.
+    """
+    rows = workbook[sheet_name].iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [str(c).strip() if c is not None else None for c in header]
+    for values in rows:
+        yield {
+            column: value
+            for column, value in zip(columns, values)
+            if column is not None
+        }
+
+
+def read_weights(source, input_format="xlsx") -> pd.DataFrame:
+    """
+    Lee la tabla de pesos (columnas: activos, portafolio 1, portafolio 2).
+    Es pequeña (un activo por fila), así que se devuelve como DataFrame.
+    """
+    if input_format == "xlsx":
+        workbook = _open_workbook(source)
+        try:
+            return pd.DataFrame(list(_sheet_rows(workbook, WEIGHTS_SHEET)))
+        finally:
+            workbook.close()
+    if input_format == "csv":
+        return pd.read_csv(source)
+    if input_format == "parquet":
+        return pd.read_parquet(source)
+    raise ValueError(f"Formato no soportado: {input_format}")
+
+
+def iter_price_rows(source, input_format="xlsx", chunk_size=DEFAULT_BATCH_SIZE):
+    """
+    Genera una fila {columna: valor} por fecha de la hoja de precios.
+    Excel se lee con openpyxl en modo read-only, CSV con pandas por chunks
+    y Parquet por record batches de pyarrow.
+    """
+    if input_format == "xlsx":
+        workbook = _open_workbook(source)
+        try:
+            yield from _sheet_rows(workbook, PRICES_SHEET)
+        finally:
+            workbook.close()
+
+    elif input_format == "csv":
+        for chunk in pd.read_csv(source, chunksize=chunk_size):
+            chunk.columns = [str(c).strip() for c in chunk.columns]
+            yield from chunk.to_dict("records")
+
+    elif input_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ValueError("Leer Parquet requiere instalar pyarrow") from exc
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield from batch.to_pylist()
+
+    else:
+        raise ValueError(f"Formato no soportado: {input_format}")
+
+
+def parse_date(value):
+    """
+    Convierte el valor de la columna Dates a date, o None si no es una fecha.
+    """
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.date()
+    try:
+        return pd.to_datetime(value).date()
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_price(value):
+    """
+    Convierte una celda de precio a Decimal, o None si está vacía.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and pd.isna(value):
+        return None
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+class PriceWriter:
+    """
+    Sincroniza la tabla Price con el archivo, por lotes de fechas.
+    Solo escribe lo que cambió: inserta celdas nuevas (COPY en PostgreSQL),
+    actualiza precios distintos con un INSERT ... ON CONFLICT y borra celdas
+    que ya no vienen en el archivo.
+    Guarda en changed_cells las celdas (asset_id, fecha) insertadas,
+    actualizadas o borradas, para que el recálculo de posiciones se limite
+    a ellas.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.rows = {}  # fecha -> {asset_id: precio}
+        self.pending = 0
+        self.seen_dates = set()
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.changed_cells = set()
+
+    @property
+    def written(self):
+        return self.inserted + self.updated
+
+    def add_row(self, date, prices):
+        """
+        Agrega todos los precios {asset_id: precio} de una fecha.
+        """
+        self.rows.setdefault(date, {}).update(
+            (asset_id, price.quantize(PRICE_QUANTUM))
+            for asset_id, price in prices.items()
+        )
+        self.seen_dates.add(date)
+        self.pending += len(prices)
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        # Precios que ya existen para las fechas del lote (una query por lote)
+        current = {
+            (asset_id, date): (pk, price)
+            for pk, asset_id, date, price in Price.objects
+            .filter(date__in=list(self.rows))
+            .order_by()
+            .values_list("id", "asset_id", "date", "price")
+        }
+
+        to_insert, to_update = [], []
+        for date, prices in self.rows.items():
+            for asset_id, price in prices.items():
+                existing = current.pop((asset_id, date), None)
+                if existing is None:
+                    to_insert.append(Price(asset_id=asset_id, date=date, price=price))
+                elif existing[1] != price:
+                    to_update.append(Price(asset_id=asset_id, date=date, price=price))
+
+        # Lo que queda en current no vino en el archivo para esas fechas
+        to_delete = [pk for pk, _ in current.values()]
+
+        if to_insert and self._copy(to_insert):
+            upserts = to_update
+        else:
+            upserts = to_insert + to_update
+        if upserts:
+            # Un solo INSERT ... ON CONFLICT (asset, date) DO UPDATE por lote
+            Price.objects.bulk_create(
+                upserts,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=["asset", "date"],
+                update_fields=["price"],
+            )
+        if to_delete:
+            Price.objects.filter(id__in=to_delete).delete()
+
+        self.changed_cells.update((p.asset_id, p.date) for p in to_insert + to_update)
+        self.changed_cells.update(current)
+        self.inserted += len(to_insert)
+        self.updated += len(to_update)
+        self.deleted += len(to_delete)
+        self.rows = {}
+        self.pending = 0
+
+    def finish(self):
+        """
+        Escribe el último lote y borra las fechas que ya no están en el archivo.
+        """
+        self.flush()
+        stale_dates = [
+            date
+            for date in Price.objects.values_list("date", flat=True).distinct().order_by()
+            if date not in self.seen_dates
+        ]
+        if stale_dates:
+            stale = Price.objects.filter(date__in=stale_dates)
+            self.changed_cells.update(stale.values_list("asset_id", "date"))
+            deleted, _ = stale.delete()
+            self.deleted += deleted
+
+    def _copy(self, rows) -> bool:
+        if connection.vendor != "postgresql":
+            return False
+        with connection.cursor() as cursor:
+            copy_expert = getattr(cursor.cursor, "copy_expert", None)
+            if copy_expert is None:
+                return False
+
+            data = io.StringIO()
+            csv.writer(data).writerows(
+                (price.asset_id, price.date.isoformat(), price.price)
+                for price in rows
+            )
+            data.seek(0)
+
+            opts = Price._meta
+            columns = ", ".join(
+                opts.get_field(name).column
+                for name in ("asset", "date", "price")
+            )
+            copy_expert(
+                f"COPY {opts.db_table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                data,
+            )
+        return True
@@ -0,0 +1,126 @@
+import threading
+from contextlib import ExitStack
+
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import ETLJob
+from core.services import load_excel_data
+
+# Cargas ETL fuera del request web
+# La vista solo guarda el archivo y crea un ETLJob pendiente; el comando
+# run_etl_worker los procesa uno por uno y va guardando el progreso.
+
+PROGRESS_INTERVAL = 1.0  # segundos entre escrituras del progreso
+# Sin latido (updated_at) en este tiempo, el worker se da por muerto y el
+# trabajo en proceso vuelve a tomarse. Debe ser bastante mayor que PROGRESS_INTERVAL.
+JOB_LEASE = timedelta(seconds=60)
+
+
+def enqueue_etl_job(uploaded_file, input_format="xlsx", weights_file=None) -> ETLJob:
+    """
+    Guarda el archivo subido (y el de pesos de CSV/Parquet) y deja el
+    trabajo pendiente en la cola.
+    """
+    return ETLJob.objects.create(
+        file=uploaded_file,
+        weights_file=weights_file,
+        input_format=input_format,
+    )
+
+
+def claim_next_job(lease=JOB_LEASE):
+    """
+    Toma el trabajo pendiente más antiguo y lo marca en proceso.
+    También retoma los trabajos en proceso cuyo worker dejó de latir hace
+    más de lease (murió a mitad de la carga; el ETL corre en una transacción,
+    así que no dejó nada a medias).
+    SKIP LOCKED permite correr varios workers sin que tomen el mismo trabajo.
+    """
+    now = timezone.now()
+    abandoned = Q(status=ETLJob.STATUS_RUNNING) & (
+        Q(updated_at__lt=now - lease)
+        | Q(updated_at__isnull=True, started_at__lt=now - lease)
+    )
+    with transaction.atomic():
+        job = (
+            ETLJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(status=ETLJob.STATUS_PENDING) | abandoned)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ETLJob.STATUS_RUNNING
+        job.started_at = job.updated_at = now
+        job.save(update_fields=["status", "started_at", "updated_at"])
+    return job
+
+
+class ProgressReporter:
+    """
+    Recibe los contadores del ETL y los escribe en el ETLJob cada
+    PROGRESS_INTERVAL segundos desde otro hilo, junto con el latido
+    (updated_at) que mantiene el trabajo tomado. Ese hilo usa su propia
+    conexión, así el progreso se ve aunque el ETL siga dentro de su transacción.
+    """
+
+    def __init__(self, job: ETLJob, interval=PROGRESS_INTERVAL):
+        self.job_id = job.pk
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def update(self, **counts):
+        self.counts.update(counts)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                ETLJob.objects.filter(pk=self.job_id).update(
+                    updated_at=timezone.now(), **dict(self.counts)
+                )
+        finally:
+            connections.close_all()
+
+
+def run_etl_job(job: ETLJob) -> ETLJob:
+    """
+    Ejecuta el ETL del trabajo y guarda el resultado (terminado o fallido).
+    """
+    reporter = ProgressReporter(job)
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(reporter)
+            f = stack.enter_context(job.file.open("rb"))
+            weights = stack.enter_context(job.weights_file.open("rb")) if job.weights_file else None
+            load_excel_data(
+                f,
+                input_format=job.input_format,
+                weights_file=weights,
+                progress=reporter.update,
+            )
+    except Exception as e:
+        job.status = ETLJob.STATUS_FAILED
+        job.error = str(e)
+    else:
+        job.status = ETLJob.STATUS_DONE
+
+    for field, value in reporter.counts.items():
+        setattr(job, field, value)
+    job.updated_at = job.finished_at = timezone.now()
+    job.save()
+    return job
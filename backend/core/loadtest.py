@@ -0,0 +1,103 @@
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Prueba de carga HTTP contra un servidor local (runserver, gunicorn o uvicorn)
+# Cada cliente mantiene su propia conexión keep-alive y hace requests hasta
+# completar el total; se mide el throughput y los percentiles de latencia.
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _connect(parts, timeout):
+    connection_class = (
+        http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    )
+    return connection_class(parts.hostname, parts.port, timeout=timeout)
+
+
+def run_load_test(url, method="GET", body=None, concurrency=32, total_requests=1000, timeout=30.0) -> dict:
+    """
+    Hace total_requests requests a url con concurrency clientes en paralelo.
+    Retorna requests, errores, segundos, requests/s y latencias (ms).
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    headers = {"Accept": "application/json"}
+    if body is not None:
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        headers["Content-Type"] = "application/json"
+
+    remaining = [total_requests]
+    lock = threading.Lock()
+    latencies, errors, statuses = [], [], {}
+
+    def take() -> bool:
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def client():
+        conn = _connect(parts, timeout)
+        local_latencies = []
+        try:
+            while take():
+                started = time.perf_counter()
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    if response.will_close:
+                        conn.close()
+                        conn = _connect(parts, timeout)
+                except (OSError, http.client.HTTPException) as exc:
+                    conn.close()
+                    conn = _connect(parts, timeout)
+                    with lock:
+                        errors.append(repr(exc))
+                    continue
+                local_latencies.append(time.perf_counter() - started)
+                with lock:
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+        finally:
+            conn.close()
+            with lock:
+                latencies.extend(local_latencies)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(client) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    ms = [value * 1000 for value in latencies]
+    return {
+        "url": url,
+        "method": method,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ms), 2) if ms else None,
+            "p50": round(_percentile(ms, 0.50), 2) if ms else None,
+            "p95": round(_percentile(ms, 0.95), 2) if ms else None,
+            "p99": round(_percentile(ms, 0.99), 2) if ms else None,
+            "max": round(max(ms), 2) if ms else None,
+        },
+    }
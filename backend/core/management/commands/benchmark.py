@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import (
+    BENCHMARK_STEPS,
+    compare_results,
+    environment_info,
+    parse_size,
+    run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = "Mide tiempo, queries y memoria del ETL, los cálculos de posiciones y la evolución (JSON)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            default=["17x250x2", "17x2500x2", "50x2500x10"],
+            help='Tamaños activos x fechas x portafolios, por ejemplo 17x2500x2'
+        )
+        parser.add_argument(
+            '--steps',
+            nargs='+',
+            choices=BENCHMARK_STEPS,
+            default=list(BENCHMARK_STEPS),
+            help='Pasos a medir'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Corridas por paso')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos sintéticos')
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Archivo JSON de resultados (por defecto se escribe en stdout)'
+        )
+        parser.add_argument(
+            '--compare',
+            default=None,
+            help='JSON de una corrida anterior para comparar'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_size(value) for value in options['sizes']]
+        except ValueError:
+            raise CommandError("Los tamaños deben tener la forma activos x fechas x portafolios (17x2500x2)")
+
+        # El avance y la comparación van a stderr; stdout queda solo con el JSON
+        report = {
+            "environment": environment_info(),
+            "repeat": options['repeat'],
+            "results": run_benchmark(
+                sizes,
+                steps=options['steps'],
+                repeat=options['repeat'],
+                seed=options['seed'],
+                log=self.stderr.write,
+            ),
+        }
+
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(data)
+        else:
+            self.stdout.write(data)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            self.stderr.write(f"Comparación contra {baseline['environment'].get('commit')}")
+            for size, step, metric, before, after in compare_results(baseline, report):
+                change = (after / before - 1) * 100 if before else 0.0
+                self.stderr.write(
+                    f"{size:<12} {step:<32} {metric:<8} {before:>12.4f} {after:>12.4f} {change:>+7.1f}%"
+                )
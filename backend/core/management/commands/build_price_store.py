@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import get_dataset_version
+from core.price_store import get_price_store, write_price_store
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la matriz de precios compartida (memory-mapped) desde la base"
+
+    def handle(self, *args, **options):
+        path = write_price_store(get_dataset_version())
+        store = get_price_store()
+
+        self.stdout.write(
+            f"{len(store.dates)} fechas × {len(store.asset_ids)} activos en {path}"
+        )
+        self.stdout.write(self.style.SUCCESS("Matriz de precios publicada"))
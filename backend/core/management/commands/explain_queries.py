@@ -0,0 +1,126 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Portfolio, Position, Price
+from core.synthetic import create_synthetic_dataset
+
+# Planes y tiempos de las consultas más usadas, sin y con los índices de
+# Price y Position, sobre datos sintéticos. Todo corre dentro de una
+# transacción que se revierte al final: la base queda como estaba.
+# Borrar índices bloquea las tablas hasta el rollback (ACCESS EXCLUSIVE en
+# PostgreSQL), por eso solo corre sobre una base vacía, nunca la de la API.
+
+INDEXED_MODELS = (Price, Position)
+
+
+class Command(BaseCommand):
+    help = "Muestra EXPLAIN y tiempos de las consultas de precios/posiciones sin y con índices"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=17, help='Cantidad de activos')
+        parser.add_argument('--dates', type=int, default=2500, help='Cantidad de fechas')
+        parser.add_argument('--portfolios', type=int, default=2, help='Cantidad de portafolios')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos sintéticos')
+        parser.add_argument('--repeat', type=int, default=5, help='Corridas por consulta (se toma la mejor)')
+        parser.add_argument('--no-plans', action='store_true', help='Solo tiempos, sin EXPLAIN')
+
+    def handle(self, *args, **options):
+        if any(model.objects.exists() for model in (Portfolio, *INDEXED_MODELS)):
+            raise CommandError(
+                f"La base {connection.settings_dict['NAME']} tiene datos: explain_queries borra "
+                "los índices de Price y Position y bloquea esas tablas mientras corre. "
+                "Usar una base vacía, por ejemplo POSTGRES_DB=portfolio_bench después de migrate."
+            )
+
+        with transaction.atomic():
+            self.stdout.write("Creando datos sintéticos...")
+            portfolios = create_synthetic_dataset(
+                n_assets=options['assets'],
+                n_dates=options['dates'],
+                n_portfolios=options['portfolios'],
+                seed=options['seed'],
+            )
+            self.analyze()
+
+            timings = {}
+            for phase, with_indexes in (("sin índices", False), ("con índices", True)):
+                self.stdout.write(self.style.MIGRATE_HEADING(f"== {phase}"))
+                self.set_indexes(with_indexes)
+                for label, queryset in self.queries(portfolios[0]):
+                    if not options['no_plans']:
+                        self.stdout.write(self.style.MIGRATE_LABEL(label))
+                        self.stdout.write(self.explain(queryset))
+                    timings.setdefault(label, []).append(
+                        self.best_time(queryset, options['repeat'])
+                    )
+
+            self.stdout.write(self.style.MIGRATE_HEADING("== tiempos (ms, mejor corrida)"))
+            self.stdout.write(f"{'consulta':<32} {'sin':>9} {'con':>9}")
+            for label, (before, after) in timings.items():
+                speedup = before / after if after else float("inf")
+                self.stdout.write(f"{label:<32} {before:>9.2f} {after:>9.2f}  x{speedup:.1f}")
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def queries(portfolio: Portfolio):
+        """
+        Consultas del ETL, los selectors y el recálculo incremental.
+        """
+        dates = list(
+            Price.objects.values_list("date", flat=True).distinct().order_by("date")
+        )
+        middle = dates[len(dates) // 2]
+        return [
+            # PriceWriter.flush: precios de un lote de fechas
+            ("Price por lote de fechas", Price.objects.filter(
+                date__in=dates[-300:]
+            ).order_by().values_list("id", "asset_id", "date", "price")),
+            # PriceWriter.finish: fechas distintas cargadas
+            ("Price fechas distintas", Price.objects.values_list(
+                "date", flat=True
+            ).distinct().order_by()),
+            # iter_position_weights_and_value / evolución de un año
+            ("Position rango de un portafolio", Position.objects.filter(
+                portfolio=portfolio, date__range=[middle, dates[-1]]
+            ).order_by("date", "asset_id").values_list("date", "asset_id", "value_at_date")),
+            # calculate_historical_positions(incremental=True)
+            ("Position desde una fecha", Position.objects.filter(
+                portfolio=portfolio, date__gte=dates[-30]
+            ).values_list("id", flat=True)),
+        ]
+
+    @staticmethod
+    def analyze():
+        # Estadísticas frescas para que el planner vea los datos nuevos
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                for model in INDEXED_MODELS:
+                    cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+    @staticmethod
+    def set_indexes(enabled: bool):
+        # Sin context manager: en SQLite el schema editor no se puede abrir
+        # dentro de una transacción, y aquí solo se ejecuta CREATE/DROP INDEX
+        editor = connection.schema_editor()
+        for model in INDEXED_MODELS:
+            for index in model._meta.indexes:
+                sql = index.create_sql(model, editor) if enabled else index.remove_sql(model, editor)
+                editor.execute(sql)
+
+    @staticmethod
+    def explain(queryset) -> str:
+        if connection.vendor == "postgresql":
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    @staticmethod
+    def best_time(queryset, repeat: int) -> float:
+        best = float("inf")
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            list(queryset.all())
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
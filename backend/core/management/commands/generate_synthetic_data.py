@@ -0,0 +1,70 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.synthetic import (
+    SYNTHETIC_PREFIX,
+    SYNTHETIC_START,
+    build_synthetic_workbook,
+    create_synthetic_dataset,
+    delete_synthetic_dataset,
+)
+
+
+class Command(BaseCommand):
+    help = "Crea activos, precios (caminata aleatoria), pesos y portafolios sintéticos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=17, help='Cantidad de activos')
+        parser.add_argument('--dates', type=int, default=2500, help='Cantidad de fechas')
+        parser.add_argument('--portfolios', type=int, default=2, help='Cantidad de portafolios')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla del generador aleatorio')
+        parser.add_argument(
+            '--start-date',
+            type=date.fromisoformat,
+            default=SYNTHETIC_START,
+            help='Fecha inicial (AAAA-MM-DD)'
+        )
+        parser.add_argument(
+            '--prefix',
+            default=SYNTHETIC_PREFIX,
+            help='Prefijo de los nombres de activos y portafolios'
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Borra antes los datos sintéticos con el mismo prefijo'
+        )
+        parser.add_argument(
+            '--xlsx',
+            dest='xlsx_path',
+            default=None,
+            help='En vez de escribir en la base, genera un datos.xlsx para load_excel'
+        )
+
+    def handle(self, *args, **options):
+        if options['xlsx_path']:
+            workbook = build_synthetic_workbook(
+                options['assets'], options['dates'], seed=options['seed']
+            )
+            with open(options['xlsx_path'], 'wb') as f:
+                f.write(workbook.getvalue())
+            self.stdout.write(self.style.SUCCESS(f"Archivo escrito en {options['xlsx_path']}"))
+            return
+
+        if options['replace']:
+            deleted = delete_synthetic_dataset(options['prefix'])
+            self.stdout.write(f"{deleted} filas sintéticas borradas")
+
+        portfolios = create_synthetic_dataset(
+            n_assets=options['assets'],
+            n_dates=options['dates'],
+            n_portfolios=options['portfolios'],
+            seed=options['seed'],
+            start_date=options['start_date'],
+            prefix=options['prefix'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(portfolios)} portafolios, {options['assets']} activos y "
+            f"{options['dates']} fechas creados"
+        ))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 
+from core.ingestion import DEFAULT_BATCH_SIZE, INPUT_FORMATS, detect_input_format
 from core.services import load_excel_data
 
 
@@ -10,15 +11,53 @@ class Command(BaseCommand):
         parser.add_argument(
             'excel_path',
             type=str,
-            help='Ruta al archivo datos.xlsx'
+            help='Ruta al archivo datos.xlsx (o CSV/Parquet con los precios)'
+        )
+        parser.add_argument(
+            '--format',
+            dest='input_format',
+            choices=INPUT_FORMATS,
+            default=None,
+            help='Formato de entrada (por defecto se deduce de la extensión)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Cantidad de precios por lote de escritura'
+        )
+        parser.add_argument(
+            '--weights',
+            dest='weights_path',
+            type=str,
+            default=None,
+            help='Archivo de pesos (obligatorio para CSV/Parquet)'
         )
 
     def handle(self, *args, **options):
         excel_path = options['excel_path']
-        
-        self.stdout.write("Leyendo archivo Excel...")
-        
-        with open(excel_path, 'rb') as f:
-            load_excel_data(f)
-        
+        input_format = options['input_format'] or detect_input_format(excel_path)
+        weights_path = options['weights_path']
+
+        self.stdout.write(f"Leyendo archivo {input_format}...")
+
+        weights_file = open(weights_path, 'rb') if weights_path else None
+        try:
+            with open(excel_path, 'rb') as f:
+                report = load_excel_data(
+                    f,
+                    input_format=input_format,
+                    batch_size=options['batch_size'],
+                    weights_file=weights_file,
+                )
+        finally:
+            if weights_file is not None:
+                weights_file.close()
+
+        self.stdout.write(
+            f"{len(report['changed_cells'])} celdas de precio afectadas "
+            f"({report['prices_inserted']} nuevas, {report['prices_updated']} actualizadas, "
+            f"{report['prices_deleted']} borradas), "
+            f"{report['positions_computed']} posiciones recalculadas"
+        )
         self.stdout.write(self.style.SUCCESS("ETL completado exitosamente"))
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import run_load_test
+
+
+class Command(BaseCommand):
+    help = "Prueba de carga HTTP contra un servidor levantado (WSGI o ASGI); resultado en JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url',
+            help='URL completa, por ejemplo http://127.0.0.1:8000/api/async/portfolios/1/evolution/'
+        )
+        parser.add_argument('--method', default=None, help='GET por defecto, POST si hay --body')
+        parser.add_argument('--body', default=None, help='Body JSON del request')
+        parser.add_argument('--concurrency', type=int, default=32, help='Clientes en paralelo')
+        parser.add_argument('--requests', type=int, default=1000, help='Cantidad total de requests')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Timeout por request (segundos)')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError("--concurrency y --requests deben ser mayores a 0")
+        if options['body'] is not None:
+            try:
+                json.loads(options['body'])
+            except ValueError:
+                raise CommandError("--body debe ser JSON válido")
+
+        result = run_load_test(
+            options['url'],
+            method=options['method'] or ("POST" if options['body'] is not None else "GET"),
+            body=options['body'],
+            concurrency=options['concurrency'],
+            total_requests=options['requests'],
+            timeout=options['timeout'],
+        )
+        self.stderr.write(
+            f"{result['requests']} requests, {result['errors']} errores, "
+            f"{result['requests_per_second']} req/s, p50 {result['latency_ms']['p50']} ms, "
+            f"p99 {result['latency_ms']['p99']} ms"
+        )
+        self.stdout.write(json.dumps(result, indent=2))
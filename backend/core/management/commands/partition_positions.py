@@ -0,0 +1,158 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Position
+
+# Particionado opcional de Position por rango de fechas (solo PostgreSQL)
+# Una partición por año más una DEFAULT para fechas fuera de rango. Las
+# consultas por (portafolio, rango de fechas) solo leen las particiones del
+# rango y el recálculo incremental escribe en las últimas.
+# PostgreSQL exige que la clave primaria incluya la columna de partición,
+# así que la PK pasa a ser (id, date); id sigue saliendo de una secuencia.
+
+
+class Command(BaseCommand):
+    help = "Particiona la tabla de posiciones por año (PostgreSQL) o agrega años nuevos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until-year',
+            type=int,
+            default=None,
+            help='Último año con partición propia (por defecto el año de la última posición + 1)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra el SQL, sin ejecutarlo'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("El particionado solo está disponible en PostgreSQL")
+
+        table = Position._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT min(date), max(date) FROM {}".format(connection.ops.quote_name(table))
+            )
+            first, last = cursor.fetchone()
+            first_year = first.year if first else None
+            until_year = options['until_year'] or (last.year + 1 if last else None)
+
+            if self.is_partitioned(cursor, table):
+                statements = self.add_years_sql(cursor, table, until_year)
+            else:
+                statements = self.convert_sql(cursor, table, first_year, until_year)
+
+            for sql in statements:
+                if options['dry_run']:
+                    self.stdout.write(sql + ";")
+                else:
+                    cursor.execute(sql)
+
+            if options['dry_run']:
+                transaction.set_rollback(True)
+                return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{table}: {len(statements)} sentencias ejecutadas"
+        ))
+
+    @staticmethod
+    def is_partitioned(cursor, table) -> bool:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def partition_sql(table, year) -> str:
+        return (
+            f'CREATE TABLE "{table}_y{year}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        )
+
+    def convert_sql(self, cursor, table, first_year, until_year):
+        """
+        SQL para pasar de la tabla normal a una particionada por año.
+        Las restricciones e índices se copian de la tabla actual (mismos
+        nombres que creó Django), salvo la PK que pasa a (id, date).
+        """
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) "
+            "FROM pg_constraint WHERE conrelid = %s::regclass ORDER BY contype",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [table, table],
+        )
+        indexes = cursor.fetchall()
+
+        old = f"{table}_unpartitioned"
+        statements = [
+            f'ALTER TABLE "{table}" RENAME TO "{old}"',
+            f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS) PARTITION BY RANGE (date)',
+        ]
+        if first_year is not None:
+            statements += [
+                self.partition_sql(table, year)
+                for year in range(first_year, until_year + 1)
+            ]
+        statements += [
+            f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT',
+            f'INSERT INTO "{table}" SELECT * FROM "{old}"',
+            f'DROP TABLE "{old}"',
+        ]
+
+        for name, kind, definition in constraints:
+            if kind == "p":
+                definition = "PRIMARY KEY (id, date)"
+            statements.append(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+        statements += [definition for _, definition in indexes]
+
+        # La columna identity de Django no se puede copiar a una tabla
+        # particionada: se reemplaza por una secuencia con el mismo nombre
+        sequence = f"{table}_id_seq"
+        statements += [
+            f'CREATE SEQUENCE "{sequence}" OWNED BY "{table}".id',
+            f"SELECT setval('\"{sequence}\"', COALESCE(max(id), 0) + 1, false) FROM \"{table}\"",
+            f"ALTER TABLE \"{table}\" ALTER COLUMN id SET DEFAULT nextval('\"{sequence}\"')",
+        ]
+        return statements
+
+    def add_years_sql(self, cursor, table, until_year):
+        """
+        SQL para agregar las particiones anuales que falten hasta until_year.
+        Las filas de esos años que cayeron en DEFAULT se mueven a su partición.
+        """
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [table],
+        )
+        existing = {name for (name,) in cursor.fetchall()}
+        years = sorted(
+            int(name.rsplit("_y", 1)[1])
+            for name in existing
+            if name.startswith(f"{table}_y")
+        )
+        if not years or until_year is None:
+            return []
+
+        default = f"{table}_default"
+        statements = []
+        for year in range(years[-1] + 1, until_year + 1):
+            date_filter = f"date >= '{year}-01-01' AND date < '{year + 1}-01-01'"
+            statements += [
+                f'ALTER TABLE "{table}" DETACH PARTITION "{default}"',
+                self.partition_sql(table, year),
+                f'INSERT INTO "{table}" SELECT * FROM "{default}" WHERE {date_filter}',
+                f'DELETE FROM "{default}" WHERE {date_filter}',
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT',
+            ]
+        return statements
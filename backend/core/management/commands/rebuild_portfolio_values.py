@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.cache import bump_dataset_version
+from core.models import Portfolio, PortfolioValue
+from core.selectors import iter_position_weights_and_value
+from core.services import refresh_portfolio_values
+
+VALUE_TOLERANCE = Decimal("0.0001")
+WEIGHT_TOLERANCE = 1e-9
+
+
+class Command(BaseCommand):
+    help = "Reconstruye o verifica la tabla PortfolioValue (V_t y w_{i,t}) contra Position"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Solo compara PortfolioValue con Position y reporta diferencias'
+        )
+        parser.add_argument(
+            '--portfolio',
+            type=int,
+            nargs='*',
+            dest='portfolio_ids',
+            help='IDs de portafolios (por defecto todos)'
+        )
+
+    def handle(self, *args, **options):
+        portfolios = Portfolio.objects.all()
+        if options['portfolio_ids']:
+            portfolios = portfolios.filter(pk__in=options['portfolio_ids'])
+        # Los portafolios con posiciones virtuales no tienen filas materializadas
+        portfolios = [portfolio for portfolio in portfolios if not portfolio.virtual_positions]
+
+        if options['verify']:
+            self.verify(portfolios)
+            return
+
+        with transaction.atomic():
+            created = refresh_portfolio_values(portfolios)
+            bump_dataset_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} filas de PortfolioValue para {len(portfolios)} portafolios"
+        ))
+
+    def verify(self, portfolios):
+        stored = {
+            (portfolio_id, date): (total_value, weights)
+            for portfolio_id, date, total_value, weights in PortfolioValue.objects
+            .filter(portfolio__in=portfolios)
+            .values_list("portfolio_id", "date", "total_value", "weights")
+        }
+
+        checked = 0
+        mismatches = []
+        for portfolio_id, date, total_value, weights in iter_position_weights_and_value(portfolios):
+            checked += 1
+            row = stored.pop((portfolio_id, date), None)
+            if row is None:
+                mismatches.append((portfolio_id, date, "falta en PortfolioValue"))
+            elif abs(row[0] - total_value) > VALUE_TOLERANCE:
+                mismatches.append((portfolio_id, date, f"V_t {row[0]} != {total_value}"))
+            elif not self.same_weights(row[1], weights):
+                mismatches.append((portfolio_id, date, "pesos distintos"))
+
+        for portfolio_id, date in stored:
+            mismatches.append((portfolio_id, date, "sobra en PortfolioValue"))
+
+        for portfolio_id, date, reason in mismatches[:20]:
+            self.stdout.write(f"  portafolio {portfolio_id} @ {date}: {reason}")
+
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} diferencias en {checked} fechas")
+        self.stdout.write(self.style.SUCCESS(f"PortfolioValue coincide con Position ({checked} fechas)"))
+
+    @staticmethod
+    def same_weights(stored, computed):
+        stored = {w["asset"]: w["weight"] for w in stored}
+        computed = {w["asset"]: w["weight"] for w in computed}
+        return stored.keys() == computed.keys() and all(
+            abs(stored[asset] - computed[asset]) <= WEIGHT_TOLERANCE
+            for asset in stored
+        )
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import claim_next_job, run_etl_job
+
+
+class Command(BaseCommand):
+    help = "Procesa las cargas ETL encoladas fuera del servidor web"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesa los trabajos pendientes y termina'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando no hay trabajos pendientes'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Esperando cargas ETL...")
+
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f"Procesando ETL #{job.pk} ({job.file.name})")
+            job = run_etl_job(job)
+
+            if job.status == job.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(
+                    f"ETL #{job.pk} terminado: {job.prices_written} precios, "
+                    f"{job.positions_computed} posiciones"
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f"ETL #{job.pk} falló: {job.error}"))
@@ -0,0 +1,82 @@
+import json
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.engine import SCENARIO_BOOTSTRAP, SCENARIO_METHODS
+from core.models import Portfolio
+from core.scenarios import compute_portfolio_scenarios, scenario_workers
+
+
+class Command(BaseCommand):
+    help = "Escenarios Monte Carlo / bootstrap de un portafolio: V_T, VaR/CVaR y caídas máximas (JSON)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('portfolio_id', type=int, help='ID del portafolio')
+        parser.add_argument('--method', choices=SCENARIO_METHODS, default=SCENARIO_BOOTSTRAP)
+        parser.add_argument('--paths', type=int, default=10_000, help='Cantidad de caminos')
+        parser.add_argument('--horizon', type=int, default=252, help='Días hábiles simulados')
+        parser.add_argument('--block-size', type=int, default=5, help='Días por bloque del bootstrap')
+        parser.add_argument('--seed', type=int, default=None, help='Semilla (por defecto una nueva)')
+        parser.add_argument(
+            '--history-start',
+            type=date.fromisoformat,
+            default=None,
+            help='Primera fecha de los retornos históricos (AAAA-MM-DD)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Procesos (por defecto SCENARIO_WORKERS, 0 = uno por CPU)'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Archivo JSON de resultados (por defecto se escribe en stdout)'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['paths'], options['horizon'], options['block_size']) < 1:
+            raise CommandError("--paths, --horizon y --block-size deben ser mayores a 0")
+        try:
+            portfolio = Portfolio.objects.get(pk=options['portfolio_id'])
+        except Portfolio.DoesNotExist:
+            raise CommandError(f"No existe el portafolio {options['portfolio_id']}")
+
+        workers = scenario_workers(options['workers'])
+        started = time.perf_counter()
+        try:
+            result = compute_portfolio_scenarios(
+                portfolio,
+                n_paths=options['paths'],
+                horizon=options['horizon'],
+                method=options['method'],
+                block_size=options['block_size'],
+                seed=options['seed'],
+                history_start=options['history_start'],
+                workers=workers,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+        result["run"] = {
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "paths_per_second": round(options['paths'] / elapsed, 1),
+        }
+
+        # El resumen va a stderr; stdout queda solo con el JSON
+        var = result["risk"][0]
+        self.stderr.write(
+            f"{options['paths']} caminos en {elapsed:.2f} s con {workers} procesos "
+            f"({result['run']['paths_per_second']} caminos/s); "
+            f"VaR {var['confidence']:.0%} {var['var']:.2%}, CVaR {var['cvar']:.2%}"
+        )
+        data = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(data)
+        else:
+            self.stdout.write(data)
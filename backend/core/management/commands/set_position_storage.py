@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Portfolio
+from core.services import calculate_all_positions
+
+
+class Command(BaseCommand):
+    help = "Cambia el modo de guardado de posiciones (materializadas o virtuales) y recalcula"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'storage',
+            choices=[value for value, _ in Portfolio.STORAGE_CHOICES],
+            help='materialized: Position y PortfolioValue por fecha; virtual: solo c_{i,0}'
+        )
+        parser.add_argument(
+            '--portfolio',
+            type=int,
+            nargs='*',
+            dest='portfolio_ids',
+            help='IDs de portafolios (por defecto todos)'
+        )
+
+    def handle(self, *args, **options):
+        portfolios = Portfolio.objects.all()
+        if options['portfolio_ids']:
+            portfolios = portfolios.filter(pk__in=options['portfolio_ids'])
+        portfolios = list(portfolios)
+        if not portfolios:
+            raise CommandError("No hay portafolios para actualizar")
+
+        with transaction.atomic():
+            for portfolio in portfolios:
+                portfolio.position_storage = options['storage']
+            Portfolio.objects.bulk_update(portfolios, ["position_storage"])
+            positions = calculate_all_positions(portfolios)
+
+        skipped = [p.name for p in portfolios if p.rebalance_frequency != Portfolio.REBALANCE_NONE]
+        if options['storage'] == Portfolio.STORAGE_VIRTUAL and skipped:
+            self.stdout.write(f"Con rebalanceo, se siguen materializando: {', '.join(skipped)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(portfolios)} portafolios en modo {options['storage']} ({positions} posiciones guardadas)"
+        ))
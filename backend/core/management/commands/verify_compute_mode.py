@@ -0,0 +1,97 @@
+import contextlib
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Portfolio, PortfolioValue, Position
+from core.services import COMPUTE_DECIMAL, COMPUTE_FLOAT, calculate_all_positions
+
+DEFAULT_TOLERANCE = 1e-9  # desviación relativa máxima aceptada
+
+
+class Command(BaseCommand):
+    help = "Compara las posiciones calculadas en modo float contra el modo decimal"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--portfolio',
+            type=int,
+            nargs='*',
+            dest='portfolio_ids',
+            help='IDs de portafolios (por defecto todos los buy and hold)'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=DEFAULT_TOLERANCE,
+            help='Desviación relativa máxima aceptada'
+        )
+
+    def handle(self, *args, **options):
+        portfolios = Portfolio.objects.filter(rebalance_frequency=Portfolio.REBALANCE_NONE)
+        if options['portfolio_ids']:
+            portfolios = portfolios.filter(pk__in=options['portfolio_ids'])
+        portfolios = list(portfolios)
+
+        exact = self.compute(portfolios, COMPUTE_DECIMAL)
+        fast = self.compute(portfolios, COMPUTE_FLOAT)
+
+        worst = 0.0
+        for name in ("quantity", "value_at_date", "total_value", "weight"):
+            abs_dev, rel_dev, key = self.deviation(exact[name], fast[name])
+            worst = max(worst, rel_dev)
+            self.stdout.write(
+                f"{name:<14} {len(exact[name]):>10} celdas  "
+                f"máx. abs {abs_dev:.3e}  máx. rel {rel_dev:.3e}  en {key}"
+            )
+
+        if worst > options['tolerance']:
+            raise CommandError(
+                f"Desviación relativa {worst:.3e} mayor que la tolerancia {options['tolerance']:.1e}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Modo float dentro de la tolerancia ({worst:.3e} <= {options['tolerance']:.1e})"
+        ))
+
+    @staticmethod
+    def compute(portfolios, mode) -> dict:
+        """
+        Calcula las posiciones en el modo pedido dentro de una transacción que
+        se revierte y retorna los valores guardados (ya redondeados por la base).
+        """
+        with transaction.atomic(), contextlib.redirect_stdout(io.StringIO()):
+            calculate_all_positions(portfolios, mode=mode)
+            positions = Position.objects.filter(portfolio__in=portfolios).values_list(
+                "portfolio_id", "asset_id", "date", "quantity", "value_at_date"
+            )
+            values = PortfolioValue.objects.filter(portfolio__in=portfolios).values_list(
+                "portfolio_id", "date", "total_value", "weights"
+            )
+            result = {"quantity": {}, "value_at_date": {}, "total_value": {}, "weight": {}}
+            for portfolio_id, asset_id, date, quantity, value in positions.iterator():
+                result["quantity"][(portfolio_id, asset_id, date)] = float(quantity)
+                result["value_at_date"][(portfolio_id, asset_id, date)] = float(value)
+            for portfolio_id, date, total_value, weights in values.iterator():
+                result["total_value"][(portfolio_id, date)] = float(total_value)
+                for w in weights:
+                    result["weight"][(portfolio_id, w["asset"], date)] = w["weight"]
+            transaction.set_rollback(True)
+        return result
+
+    @staticmethod
+    def deviation(exact, fast):
+        """
+        Retorna (máx. desviación absoluta, máx. relativa, celda de la máx. relativa).
+        Una celda presente en un solo modo cuenta como desviación infinita.
+        """
+        max_abs, max_rel, worst_key = 0.0, 0.0, None
+        for key in exact.keys() | fast.keys():
+            if key not in exact or key not in fast:
+                return float("inf"), float("inf"), key
+            diff = abs(exact[key] - fast[key])
+            rel = diff / abs(exact[key]) if exact[key] else diff
+            max_abs = max(max_abs, diff)
+            if rel > max_rel or worst_key is None:
+                max_rel, worst_key = max(max_rel, rel), key
+        return max_abs, max_rel, worst_key
@@ -0,0 +1,188 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+# Métricas de rendimiento en memoria (por proceso)
+# Histogramas acumulados que se exponen en /metrics con el formato de texto
+# de Prometheus. Registrar una observación es un bisect y una suma bajo un
+# lock, así que se puede dejar activo en producción.
+
+# Límites superiores de los buckets, en segundos
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Cantidad de queries por request
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Tiempos de las funciones medidas durante el request actual (Server-Timing)
+_request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """
+    Histograma acumulado con etiquetas, como el de los clientes de Prometheus.
+    """
+
+    def __init__(self, name, help_text, label_names, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # etiquetas -> [conteos por bucket..., +Inf, suma]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        """
+        Retorna (etiquetas, conteos acumulados por bucket, total, suma).
+        """
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative, running = [], 0
+            for count in values[:-1]:
+                running += count
+                cumulative.append(running)
+            yield dict(zip(self.label_names, key)), cumulative, running, values[-1]
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_DURATION = Histogram(
+    "portfolio_http_request_duration_seconds",
+    "Latencia total del request por vista",
+    ("view", "method", "status"),
+)
+REQUEST_DB_DURATION = Histogram(
+    "portfolio_http_request_db_duration_seconds",
+    "Tiempo en la base de datos por request",
+    ("view",),
+)
+REQUEST_QUERIES = Histogram(
+    "portfolio_http_request_queries",
+    "Cantidad de queries SQL por request",
+    ("view",),
+    buckets=COUNT_BUCKETS,
+)
+FUNCTION_DURATION = Histogram(
+    "portfolio_function_duration_seconds",
+    "Duración de las funciones de core.services y core.selectors",
+    ("function",),
+)
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_DB_DURATION, REQUEST_QUERIES, FUNCTION_DURATION)
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def render_prometheus(histograms=HISTOGRAMS) -> str:
+    """
+    Texto para /metrics (formato de exposición de Prometheus 0.0.4).
+    """
+    lines = []
+    for histogram in histograms:
+        lines.append(f"# HELP {histogram.name} {histogram.help_text}")
+        lines.append(f"# TYPE {histogram.name} histogram")
+        for labels, cumulative, count, total in histogram.samples():
+            for bound, value in zip(histogram.buckets + (float("inf"),), cumulative):
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{histogram.name}_bucket{bucket_labels} {value}")
+            lines.append(f"{histogram.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{histogram.name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def start_request_timings():
+    """
+    Empieza a juntar los tiempos de las funciones medidas en este request.
+    Retorna el token para terminar con stop_request_timings.
+    """
+    return _request_timings.set({})
+
+
+def stop_request_timings(token) -> dict:
+    timings = _request_timings.get() or {}
+    _request_timings.reset(token)
+    return timings
+
+
+def _record(name, elapsed):
+    FUNCTION_DURATION.observe(elapsed, function=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def timed(func):
+    """
+    Decorador que registra la duración de func en FUNCTION_DURATION y en el
+    Server-Timing del request. En generadores se mide solo el tiempo dentro
+    del generador (no el del código que consume los elementos); en
+    corrutinas, el tiempo hasta que terminan (incluye las esperas).
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def coroutine_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - started)
+        return coroutine_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            iterator = func(*args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - started
+                    yield item
+            finally:
+                iterator.close()
+                _record(name, elapsed)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record(name, time.perf_counter() - started)
+    return wrapper
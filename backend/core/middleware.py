@@ -0,0 +1,126 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from core.metrics import (
+    REQUEST_DB_DURATION,
+    REQUEST_DURATION,
+    REQUEST_QUERIES,
+    start_request_timings,
+    stop_request_timings,
+)
+
+
+class QueryStats:
+    """
+    execute_wrapper de Django que cuenta las queries del request y suma el
+    tiempo que pasan en la base.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def _view_name(request) -> str:
+    # El patrón de la URL (sin los valores de pk) mantiene pocas series
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.route or match.view_name
+
+
+def _install_query_stats(stats):
+    connection.execute_wrappers.append(stats)
+
+
+def _remove_query_stats(stats):
+    connection.execute_wrappers.remove(stats)
+
+
+class InstrumentationMiddleware:
+    """
+    Mide cada request: cantidad de queries, tiempo en la base, tiempo de la
+    vista, del render y total. Los agrega a los histogramas de /metrics y los
+    devuelve en el header Server-Timing, junto con las funciones de
+    services/selectors marcadas con @timed.
+    En respuestas en streaming el total llega solo hasta los headers.
+    Funciona en WSGI y en ASGI: con vistas async no obliga a Django a
+    pasar el request a un hilo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        stats = QueryStats()
+        token = start_request_timings()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats):
+                response = self.get_response(request)
+        finally:
+            timings = stop_request_timings(token)
+        return self.finish(request, response, stats, timings, started)
+
+    async def __acall__(self, request):
+        # Las conexiones son por hilo: el wrapper se instala en el hilo donde
+        # sync_to_async corre las queries de este request
+        stats = QueryStats()
+        token = start_request_timings()
+        started = time.perf_counter()
+        await sync_to_async(_install_query_stats)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_query_stats)(stats)
+            timings = stop_request_timings(token)
+        return self.finish(request, response, stats, timings, started)
+
+    def finish(self, request, response, stats, timings, started):
+        total = time.perf_counter() - started
+
+        view = _view_name(request)
+        REQUEST_DURATION.observe(total, view=view, method=request.method, status=response.status_code)
+        REQUEST_DB_DURATION.observe(stats.duration, view=view)
+        REQUEST_QUERIES.observe(stats.count, view=view)
+
+        metrics = [f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"']
+        rendered_at = getattr(request, "_view_finished_at", None)
+        if rendered_at is not None:
+            metrics.append(f"view;dur={(rendered_at - started) * 1000:.2f}")
+            metrics.append(f"render;dur={(time.perf_counter() - rendered_at) * 1000:.2f}")
+        metrics += [
+            f"{name};dur={elapsed * 1000:.2f}"
+            for name, elapsed in timings.items()
+        ]
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        response["Server-Timing"] = ", ".join(metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        # Las respuestas de DRF y TemplateResponse se renderizan después de
+        # este punto: lo que sigue es tiempo de render
+        request._view_finished_at = time.perf_counter()
+        return response
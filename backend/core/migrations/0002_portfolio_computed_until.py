@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='computed_until',
+            field=models.DateField(blank=True, help_text='Última fecha con posiciones calculadas', null=True),
+        ),
+    ]
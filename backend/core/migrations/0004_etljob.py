@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_datasetversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ETLJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='etl/')),
+                ('input_format', models.CharField(default='xlsx', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Terminado'), ('failed', 'Fallido')], db_index=True, default='pending', max_length=10)),
+                ('rows_parsed', models.PositiveIntegerField(default=0)),
+                ('prices_written', models.PositiveIntegerField(default=0)),
+                ('positions_computed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Carga ETL',
+                'verbose_name_plural': 'Cargas ETL',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
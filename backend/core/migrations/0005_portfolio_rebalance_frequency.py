@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_etljob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='rebalance_frequency',
+            field=models.CharField(choices=[('none', 'Sin rebalanceo (buy and hold)'), ('daily', 'Diario'), ('monthly', 'Mensual'), ('quarterly', 'Trimestral'), ('weights', 'En cada fecha de Weight')], default='none', help_text='Cada cuánto se vuelve a los pesos objetivo w_{i,t}', max_length=10),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_portfolio_rebalance_frequency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_value', models.DecimalField(decimal_places=4, max_digits=25)),
+                ('weights', models.JSONField(default=list)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='core.portfolio')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('portfolio', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_portfoliovalue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='position',
+            index=models.Index(fields=['portfolio', 'date'], include=('asset', 'value_at_date'), name='position_portfolio_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['date'], include=('asset', 'price'), name='price_date_covering_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_price_position_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='position_storage',
+            field=models.CharField(choices=[('materialized', 'Materializadas (Position y PortfolioValue por fecha)'), ('virtual', 'Virtuales (solo c_{i,0}; x_{i,t} se calcula al leer)')], default='materialized', help_text='Virtual: solo se guardan las cantidades iniciales (solo buy and hold)', max_length=12),
+        ),
+    ]
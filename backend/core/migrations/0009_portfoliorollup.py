@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_portfolio_position_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('weekly', 'Semanal'), ('monthly', 'Mensual')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('date', models.DateField()),
+                ('total_value', models.DecimalField(decimal_places=4, max_digits=25)),
+                ('high_value', models.DecimalField(decimal_places=4, max_digits=25)),
+                ('low_value', models.DecimalField(decimal_places=4, max_digits=25)),
+                ('weights', models.JSONField(default=list)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.portfolio')),
+            ],
+            options={
+                'ordering': ['period_start'],
+                'unique_together': {('portfolio', 'resolution', 'period_start')},
+            },
+        ),
+    ]
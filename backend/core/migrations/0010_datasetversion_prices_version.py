@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_portfoliorollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetversion',
+            name='prices_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
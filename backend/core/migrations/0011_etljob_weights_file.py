@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_datasetversion_prices_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='etljob',
+            name='weights_file',
+            field=models.FileField(blank=True, upload_to='etl/'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+def backfill_portfolio_values(apps, schema_editor):
+    """
+    Llena PortfolioValue y PortfolioRollup desde Position en las bases que
+    ya tenían posiciones antes de 0006 y 0009; sin esto las lecturas de
+    evolución quedan vacías hasta correr rebuild_portfolio_values.
+    Usa los mismos servicios que ese comando, así las filas son idénticas.
+    """
+    from core.cache import bump_dataset_version
+    from core.models import Portfolio
+    from core.services import refresh_portfolio_rollups, refresh_portfolio_values
+
+    with_positions = Portfolio.objects.filter(positions__isnull=False).distinct()
+    missing_values = [
+        portfolio for portfolio in with_positions.filter(values__isnull=True)
+        if not portfolio.virtual_positions
+    ]
+    missing_rollups = [
+        portfolio for portfolio in with_positions.filter(values__isnull=False, rollups__isnull=True)
+        if not portfolio.virtual_positions
+    ]
+    if not missing_values and not missing_rollups:
+        return
+
+    # refresh_portfolio_values también arma los resúmenes de esas fechas
+    refresh_portfolio_values(missing_values)
+    refresh_portfolio_rollups(missing_rollups)
+    bump_dataset_version()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_etljob_weights_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_portfolio_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_backfill_portfolio_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='etljob',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
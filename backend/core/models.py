@@ -28,6 +28,26 @@ class Portfolio(models.Model):
     Representa un portafolio de inversión con su valor inicial V_0.
     Cada portafolio tiene un valor inicial y fecha de inicio.
     """
+    REBALANCE_NONE = "none"
+    REBALANCE_DAILY = "daily"
+    REBALANCE_MONTHLY = "monthly"
+    REBALANCE_QUARTERLY = "quarterly"
+    REBALANCE_WEIGHTS = "weights"
+    REBALANCE_CHOICES = [
+        (REBALANCE_NONE, "Sin rebalanceo (buy and hold)"),
+        (REBALANCE_DAILY, "Diario"),
+        (REBALANCE_MONTHLY, "Mensual"),
+        (REBALANCE_QUARTERLY, "Trimestral"),
+        (REBALANCE_WEIGHTS, "En cada fecha de Weight"),
+    ]
+    # Cómo se guardan las posiciones de un buy and hold
+    STORAGE_MATERIALIZED = "materialized"
+    STORAGE_VIRTUAL = "virtual"
+    STORAGE_CHOICES = [
+        (STORAGE_MATERIALIZED, "Materializadas (Position y PortfolioValue por fecha)"),
+        (STORAGE_VIRTUAL, "Virtuales (solo c_{i,0}; x_{i,t} se calcula al leer)"),
+    ]
+
     name = models.CharField(max_length=100, unique=True)
     initial_value = models.DecimalField(
         max_digits=20,
@@ -36,6 +56,23 @@ class Portfolio(models.Model):
         help_text="Valor inicial del portafolio (V_0)"
     )  # V_0 del requerimiento
     start_date = models.DateField(help_text="Fecha inicial (t=0)")  # t=0, en este caso 15/02/22
+    computed_until = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Última fecha con posiciones calculadas"
+    )  # Marca de agua para el recálculo incremental
+    rebalance_frequency = models.CharField(
+        max_length=10,
+        choices=REBALANCE_CHOICES,
+        default=REBALANCE_NONE,
+        help_text="Cada cuánto se vuelve a los pesos objetivo w_{i,t}"
+    )
+    position_storage = models.CharField(
+        max_length=12,
+        choices=STORAGE_CHOICES,
+        default=STORAGE_MATERIALIZED,
+        help_text="Virtual: solo se guardan las cantidades iniciales (solo buy and hold)"
+    )
     
     class Meta:
         verbose_name = 'Portafolio'
@@ -45,6 +82,14 @@ class Portfolio(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def virtual_positions(self) -> bool:
+        # Con rebalanceo las cantidades cambian, así que siempre se materializa
+        return (
+            self.position_storage == self.STORAGE_VIRTUAL
+            and self.rebalance_frequency == self.REBALANCE_NONE
+        )
+
 
 class Price(models.Model):
     """
@@ -66,6 +111,15 @@ class Price(models.Model):
     class Meta:
         unique_together = ("asset", "date")
         ordering = ["date"]
+        indexes = [
+            # Lecturas por fecha sin activo (lotes del ETL, fechas distintas).
+            # INCLUDE (solo PostgreSQL) permite responderlas sin leer la tabla.
+            models.Index(
+                fields=["date"],
+                include=["asset", "price"],
+                name="price_date_covering_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.asset.symbol} - {self.date}: {self.price}"
@@ -135,9 +189,149 @@ class Position(models.Model):
     class Meta:
         unique_together = ("portfolio", "asset", "date")
         ordering = ["date"]
+        indexes = [
+            # Rango de fechas de un portafolio (evolución, recálculo incremental).
+            # El unique (portfolio, asset, date) no sirve para filtrar por fecha.
+            models.Index(
+                fields=["portfolio", "date"],
+                include=["asset", "value_at_date"],
+                name="position_portfolio_date_idx",
+            ),
+        ]
 
     def __str__(self):
         return (
             f"{self.portfolio.name} - {self.asset.symbol} "
             f"@ {self.date}"
         )
+
+
+class PortfolioValue(models.Model):
+    """
+    Valor diario materializado del portafolio: V_t = sum(x_{i,t}) y los
+    pesos w_{i,t} = x_{i,t} / V_t ya calculados.
+    Lo mantienen los cálculos de posiciones en la misma transacción que
+    Position; las lecturas de V_t leen una fila por día.
+    """
+    portfolio = models.ForeignKey(
+        Portfolio,
+        on_delete=models.CASCADE,
+        related_name="values"
+    )
+    date = models.DateField()
+    total_value = models.DecimalField(
+        max_digits=25,
+        decimal_places=4
+    )  # V_t
+    weights = models.JSONField(default=list)  # [{"asset": símbolo, "weight": w_{i,t}}]
+
+    class Meta:
+        unique_together = ("portfolio", "date")
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"{self.portfolio.name} @ {self.date}: {self.total_value}"
+
+
+class PortfolioRollup(models.Model):
+    """
+    Resumen semanal o mensual de PortfolioValue: V_t y pesos de la última
+    fecha del período, y el máximo y mínimo de V_t dentro del período.
+    Lo actualiza refresh_portfolio_values en la misma transacción; los
+    gráficos de rangos largos leen una fila por período.
+    """
+    RESOLUTION_DAILY = "daily"
+    RESOLUTION_WEEKLY = "weekly"
+    RESOLUTION_MONTHLY = "monthly"
+    RESOLUTION_CHOICES = [
+        (RESOLUTION_WEEKLY, "Semanal"),
+        (RESOLUTION_MONTHLY, "Mensual"),
+    ]
+
+    portfolio = models.ForeignKey(
+        Portfolio,
+        on_delete=models.CASCADE,
+        related_name="rollups"
+    )
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    period_start = models.DateField()  # lunes de la semana o día 1 del mes
+    date = models.DateField()  # última fecha con valor del período (cierre)
+    total_value = models.DecimalField(
+        max_digits=25,
+        decimal_places=4
+    )  # V_t de cierre
+    high_value = models.DecimalField(max_digits=25, decimal_places=4)  # máx V_t
+    low_value = models.DecimalField(max_digits=25, decimal_places=4)  # mín V_t
+    weights = models.JSONField(default=list)  # w_{i,t} de cierre
+
+    class Meta:
+        unique_together = ("portfolio", "resolution", "period_start")
+        ordering = ["period_start"]
+
+    def __str__(self):
+        return f"{self.portfolio.name} {self.resolution} @ {self.period_start}: {self.total_value}"
+
+
+class DatasetVersion(models.Model):
+    """
+    Versión de los datos cargados (precios, pesos y posiciones).
+    El ETL y los cálculos de posiciones la incrementan; las claves de caché
+    la incluyen, así una carga nueva invalida los resultados anteriores.
+    prices_version es la versión en la que cambiaron los precios por última vez.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    prices_version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Versión de datos'
+        verbose_name_plural = 'Versiones de datos'
+
+    def __str__(self):
+        return f"v{self.version}"
+
+
+class ETLJob(models.Model):
+    """
+    Carga del ETL encolada para procesarse fuera del request web.
+    La tabla funciona como cola: el comando run_etl_worker toma el trabajo
+    pendiente más antiguo y va guardando el progreso de la carga.
+    updated_at es el latido del worker: un trabajo en proceso sin latido
+    reciente se considera abandonado y otro worker lo vuelve a tomar.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_RUNNING, "En proceso"),
+        (STATUS_DONE, "Terminado"),
+        (STATUS_FAILED, "Fallido"),
+    ]
+
+    file = models.FileField(upload_to="etl/")
+    weights_file = models.FileField(upload_to="etl/", blank=True)  # pesos de CSV/Parquet
+    input_format = models.CharField(max_length=10, default="xlsx")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True
+    )
+    rows_parsed = models.PositiveIntegerField(default=0)
+    prices_written = models.PositiveIntegerField(default=0)
+    positions_computed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)  # último latido del worker
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Carga ETL'
+        verbose_name_plural = 'Cargas ETL'
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"ETL #{self.pk} ({self.status})"
@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from core.models import Asset, DatasetVersion
+from core.selectors import get_price_matrix
+
+# Matriz de precios compartida entre procesos
+# Después de cada ETL se escribe en disco una matriz float64 contigua
+# (fechas × activos) junto con los índices de fechas y activos. Cada worker
+# la abre con np.load(mmap_mode="r"): las páginas las comparte el sistema
+# operativo, así la memoria residente no crece con la cantidad de workers.
+
+CURRENT_FILE = "CURRENT"
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _store_dir() -> Path:
+    return Path(settings.PRICE_STORE_DIR)
+
+
+class PriceStore:
+    """
+    Vista de solo lectura de una versión de la matriz de precios.
+    dates: datetime64[D] ordenadas, asset_ids: int64 ordenados,
+    prices[t, i]: p_{i,t} en float64 (NaN si no hay precio).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.dates = np.load(path / "dates.npy", mmap_mode="r")
+        self.asset_ids = np.load(path / "asset_ids.npy", mmap_mode="r")
+        self.prices = np.load(path / "prices.npy", mmap_mode="r")
+        self.meta = json.loads((path / "meta.json").read_text())
+
+    def date_range(self, date_from=None, date_to=None):
+        """
+        Índices [lo, hi) de las filas dentro del rango de fechas (búsqueda binaria).
+        """
+        lo = 0 if date_from is None else int(np.searchsorted(
+            self.dates, np.datetime64(date_from, "D"), side="left"
+        ))
+        hi = len(self.dates) if date_to is None else int(np.searchsorted(
+            self.dates, np.datetime64(date_to, "D"), side="right"
+        ))
+        return lo, hi
+
+    def columns(self, asset_ids):
+        """
+        Índice de columna de cada asset_id; -1 si el activo no está en la matriz.
+        """
+        asset_ids = np.asarray(asset_ids, dtype=np.int64)
+        if not len(self.asset_ids):
+            return np.full(len(asset_ids), -1)
+        idx = np.minimum(
+            np.searchsorted(self.asset_ids, asset_ids),
+            len(self.asset_ids) - 1
+        )
+        return np.where(self.asset_ids[idx] == asset_ids, idx, -1)
+
+    def slice(self, date_from=None, date_to=None, asset_ids=None):
+        """
+        Retorna (fechas, matriz) para el rango pedido.
+        Sin asset_ids la matriz es una vista del archivo (no copia memoria);
+        con asset_ids se copian solo las columnas pedidas del rango.
+        """
+        lo, hi = self.date_range(date_from, date_to)
+        dates = self.dates[lo:hi]
+        prices = self.prices[lo:hi]
+        if asset_ids is None:
+            return dates, prices
+
+        cols = self.columns(asset_ids)
+        matrix = np.full((hi - lo, len(cols)), np.nan)
+        present = cols >= 0
+        matrix[:, present] = prices[:, cols[present]]
+        return dates, matrix
+
+
+def write_price_store(version=None) -> Path:
+    """
+    Escribe la matriz de precios actual en un directorio nuevo y cambia el
+    puntero CURRENT de forma atómica; los lectores nunca ven archivos a medias.
+    """
+    root = _store_dir()
+    root.mkdir(parents=True, exist_ok=True)
+
+    asset_ids = sorted(Asset.objects.values_list("id", flat=True))
+    dates, prices = get_price_matrix(asset_ids, as_float=True)
+
+    name = f"v{version or 0}-{uuid.uuid4().hex[:8]}"
+    path = root / name
+    path.mkdir()
+    np.save(path / "dates.npy", np.asarray(dates, dtype="datetime64[D]"))
+    np.save(path / "asset_ids.npy", np.asarray(asset_ids, dtype=np.int64))
+    np.save(path / "prices.npy", np.ascontiguousarray(prices, dtype=np.float64))
+    (path / "meta.json").write_text(json.dumps({
+        "dataset_version": version,
+        "dates": len(dates),
+        "assets": len(asset_ids),
+    }))
+
+    pointer = root / f".{CURRENT_FILE}.{name}"
+    pointer.write_text(name)
+    os.replace(pointer, root / CURRENT_FILE)
+
+    # Las versiones viejas se borran; los procesos que aún las tengan
+    # mapeadas siguen leyendo hasta re-abrir (el inode no desaparece)
+    for old in root.iterdir():
+        if old.is_dir() and old.name != name:
+            shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def get_price_store():
+    """
+    Retorna el PriceStore vigente de este proceso, o None si no hay ninguno.
+    Se re-abre solo cuando el puntero CURRENT apunta a una versión nueva.
+    """
+    global _store
+    try:
+        name = (_store_dir() / CURRENT_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+    with _store_lock:
+        if _store is None or _store.path.name != name:
+            try:
+                _store = PriceStore(_store_dir() / name)
+            except FileNotFoundError:
+                return _store
+        return _store
+
+
+def is_current(store: PriceStore) -> bool:
+    """
+    True si la matriz se escribió después del último cambio de precios.
+    Entre el commit del ETL y la escritura en on_commit (o si esa escritura
+    falla) la matriz publicada tiene precios viejos.
+    """
+    prices_version = DatasetVersion.objects.values_list("prices_version", flat=True).first()
+    return (store.meta.get("dataset_version") or 0) >= (prices_version or 0)
+
+
+def refresh_price_store():
+    """
+    Reescribe la matriz compartida si no está al día con los precios.
+    Se registra con transaction.on_commit en cada cambio de precios; si
+    varios cambios caen en la misma transacción, solo el primero escribe.
+    """
+    store = get_price_store()
+    if store is not None and is_current(store):
+        return store.path
+    version = DatasetVersion.objects.values_list("version", flat=True).first()
+    return write_price_store(version or 0)
+
+
+def get_price_history(asset_ids, date_from=None, date_to=None):
+    """
+    Retorna (fechas datetime64[D], matriz float64) de los activos pedidos.
+    Lee de la matriz compartida si existe y está al día; si no, hace una
+    query a Price.
+    """
+    store = get_price_store()
+    if store is not None and is_current(store):
+        return store.slice(date_from, date_to, asset_ids)
+
+    dates, prices = get_price_matrix(
+        asset_ids, date_from=date_from, date_to=date_to, as_float=True
+    )
+    return np.asarray(dates, dtype="datetime64[D]"), prices
@@ -0,0 +1,209 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+
+from core.engine import SCENARIO_BOOTSTRAP, forward_fill, simulate_scenarios
+from core.metrics import timed
+from core.models import Portfolio
+from core.price_store import get_price_history
+from core.selectors import get_portfolio_value_matrix
+
+# Escenarios de estrés: miles de caminos de V_t remuestreando los retornos
+# diarios de Price (block bootstrap) o con una normal multivariada ajustada
+# a ellos, desde los pesos actuales del portafolio.
+# Los caminos se generan en bloques de igual tamaño repartidos en un
+# ProcessPoolExecutor; cada bloque tiene su semilla derivada con
+# SeedSequence.spawn, así el resultado no depende de la cantidad de procesos.
+# El pool es uno solo por proceso de Django: los requests concurrentes
+# comparten sus procesos en vez de arrancar un intérprete por CPU cada uno.
+
+CHUNK_ELEMENTS = 4_000_000  # caminos × horizonte × activos por bloque (~32 MB en float64)
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+CONFIDENCE_LEVELS = (0.95, 0.99)
+HISTOGRAM_BINS = 20
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def scenario_workers(workers=None) -> int:
+    workers = workers or settings.SCENARIO_WORKERS
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool compartido del módulo; se crea la primera vez y se reemplaza solo
+    si se piden más procesos de los que tiene.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or workers > _executor_workers:
+            if _executor is not None:
+                # Los bloques ya enviados al pool anterior terminan igual
+                _executor.shutdown(wait=False)
+            # spawn: los procesos no heredan conexiones ni hilos del proceso de Django
+            context = multiprocessing.get_context("spawn")
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _executor_workers = workers
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+
+def _chunk_sizes(n_paths: int, horizon: int, n_assets: int):
+    size = max(1, CHUNK_ELEMENTS // max(1, horizon * n_assets))
+    return [min(size, n_paths - start) for start in range(0, n_paths, size)]
+
+
+def run_scenarios(returns, weights, n_paths, horizon, method=SCENARIO_BOOTSTRAP,
+                  block_size=5, seed=None, workers=1):
+    """
+    Simula n_paths caminos en bloques, en paralelo si workers > 1.
+    Retorna (V_T / V_0, caída máxima) por camino, en el orden de los bloques.
+    """
+    sizes = _chunk_sizes(n_paths, horizon, returns.shape[1])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (returns, weights, size, horizon, method, block_size, chunk_seed)
+        for size, chunk_seed in zip(sizes, seeds)
+    ]
+
+    if min(workers, len(tasks)) <= 1:
+        results = [simulate_scenarios(*task) for task in tasks]
+    else:
+        executor = _get_executor(workers)
+        try:
+            results = list(executor.map(simulate_scenarios, *zip(*tasks)))
+        except BrokenProcessPool:
+            # Murió un proceso: la próxima llamada arma un pool nuevo
+            _discard_executor(executor)
+            raise
+
+    final = np.concatenate([final for final, _ in results])
+    drawdowns = np.concatenate([drawdowns for _, drawdowns in results])
+    return final, drawdowns
+
+
+def _percentiles(values: np.ndarray) -> dict:
+    return {
+        str(p): float(value)
+        for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+    }
+
+
+def _load_history(portfolio: Portfolio, history_start=None):
+    """
+    Pesos y V_t de la última fecha calculada, y los retornos diarios de
+    esos activos hasta esa fecha (solo días con precio de todos).
+    """
+    as_of = portfolio.computed_until
+    if as_of is None:
+        raise ValueError(f"{portfolio.name} no tiene posiciones calculadas")
+
+    dates, values, symbols, asset_ids, weights = get_portfolio_value_matrix(portfolio, as_of, as_of)
+    if not len(dates) or not symbols:
+        raise ValueError(f"{portfolio.name} no tiene valor en {as_of}")
+    current = weights[0]
+    held = current > 0
+    symbols = [symbol for symbol, keep in zip(symbols, held) if keep]
+    asset_ids = [asset_id for asset_id, keep in zip(asset_ids, held) if keep]
+
+    price_dates, prices = get_price_history(asset_ids, history_start, as_of)
+    prices = forward_fill(np.asarray(prices, dtype=np.float64))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = prices[1:] / prices[:-1] - 1  # r_{i,t}
+    complete = np.isfinite(returns).all(axis=1)
+    history = {
+        "start": str(price_dates[1:][complete][0]) if complete.any() else None,
+        "end": str(price_dates[-1]) if len(price_dates) else None,
+        "days": int(complete.sum()),
+    }
+    return as_of, float(values[0]), symbols, current[held], returns[complete], history
+
+
+@timed
+def compute_portfolio_scenarios(
+    portfolio: Portfolio,
+    n_paths=10_000,
+    horizon=252,
+    method=SCENARIO_BOOTSTRAP,
+    block_size=5,
+    seed=None,
+    history_start=None,
+    workers=None,
+) -> dict:
+    """
+    Distribución de V_T, VaR/CVaR del retorno a horizonte y caídas máximas
+    de n_paths caminos de horizon días hábiles, desde V_t y los pesos de la
+    última fecha calculada (buy and hold durante el horizonte).
+    Sin seed se usa entropía nueva; la respuesta trae la semilla usada.
+    """
+    as_of, initial_value, symbols, weights, returns, history = _load_history(
+        portfolio, history_start
+    )
+    if len(returns) < max(block_size, 2):
+        raise ValueError(
+            f"Historia insuficiente: {len(returns)} días de retornos para {portfolio.name}"
+        )
+    if seed is None:
+        # 32 bits: la entropía completa (128 bits) pierde precisión en un
+        # número de JavaScript (2**53) y la semilla devuelta no repetiría la corrida
+        seed = int(np.random.SeedSequence().generate_state(1, np.uint32)[0])
+
+    relative, drawdowns = run_scenarios(
+        returns, weights / weights.sum(), n_paths, horizon, method, block_size, seed,
+        workers=scenario_workers(workers),
+    )
+    final = initial_value * relative  # V_T
+    period_returns = relative - 1
+
+    risk = []
+    for confidence in CONFIDENCE_LEVELS:
+        cutoff = np.percentile(period_returns, (1 - confidence) * 100)
+        tail = period_returns[period_returns <= cutoff]
+        var, cvar = -float(cutoff), -float(tail.mean())  # pérdidas como números positivos
+        risk.append({
+            "confidence": confidence,
+            "var": var,
+            "cvar": cvar,
+            "var_value": var * initial_value,
+            "cvar_value": cvar * initial_value,
+        })
+
+    counts, edges = np.histogram(final, bins=HISTOGRAM_BINS)
+    return {
+        "portfolio": portfolio.name,
+        "as_of": as_of.isoformat(),
+        "initial_value": initial_value,
+        "assets": symbols,
+        "method": method,
+        "paths": n_paths,
+        "horizon": horizon,
+        "block_size": block_size if method == SCENARIO_BOOTSTRAP else None,
+        "seed": seed,
+        "history": history,
+        "final_value": {
+            "mean": float(final.mean()),
+            "std": float(final.std()),
+            "percentiles": _percentiles(final),
+            "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+        },
+        "return_percentiles": _percentiles(period_returns),
+        "risk": risk,
+        "max_drawdown": {
+            "mean": float(drawdowns.mean()),
+            "percentiles": _percentiles(drawdowns),
+        },
+    }
@@ -1,10 +1,22 @@
+import math
+from datetime import timedelta
 from decimal import Decimal
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.db.models import ExpressionWrapper, F, FloatField, Sum, Window
+from django.db.models.functions import Cast
+
+from core.metrics import timed
+from core.models import Asset, Portfolio, PortfolioRollup, PortfolioValue, Position, Price, Weight
+
+ITERATOR_CHUNK_SIZE = 2000  # filas por fetch del cursor al recorrer posiciones
 
-from core.models import Portfolio, Position
 
 # Requisito 4: Endpoint que retorna w_{i,t} y V_t
-# Esta función usa el ORM de Django para obtener los datos y calcular los valores
+# Esta función usa el ORM de Django para obtener los datos
+@timed
 def get_portfolio_weights_and_value(
     portfolio: Portfolio,
     start_date,
@@ -13,50 +25,639 @@ def get_portfolio_weights_and_value(
     """
     Retorna los pesos y el valor total del portafolio para un rango de fechas.
     Usa el ORM de Django como se pidió en el requerimiento.
+    Lee la tabla materializada PortfolioValue: una fila por fecha con V_t y
+    los pesos ya calculados, en una sola query. Los portafolios virtuales
+    se calculan desde Price × c_{i,0}, también en una query.
+    """
+    return list(iter_portfolio_weights_and_value(portfolio, start_date, end_date))
+
+
+@timed
+def iter_portfolio_weights_and_value(
+    portfolio: Portfolio,
+    start_date,
+    end_date,
+    values_only=False
+) -> Iterator[Dict]:
     """
-    # Primero obtengo todas las fechas en el rango usando el ORM
-    dates = (
-        Position.objects.filter(
+    Versión generadora de get_portfolio_weights_and_value: produce un
+    elemento por fecha a medida que llegan las filas, sin armar la lista.
+    Con values_only produce solo V_t, como get_portfolio_values.
+    """
+    for _, date, total_value, weights in _iter_values(
+        [portfolio], start_date, end_date, values_only=values_only
+    ):
+        item = {"date": date.isoformat(), "total_value": float(total_value)}  # V_t
+        if not values_only:
+            item["weights"] = weights  # w_{i,t} para cada activo
+        yield item
+
+
+# Versiones async para las vistas ASGI (ORM asíncrono de Django)
+@timed
+async def aget_portfolio_weights_and_value(
+    portfolio: Portfolio,
+    start_date,
+    end_date,
+    values_only=False
+) -> List[Dict]:
+    """
+    Igual que get_portfolio_weights_and_value (o get_portfolio_values con
+    values_only), leyendo PortfolioValue con async for. Los portafolios
+    virtuales usan la versión síncrona en un hilo.
+    """
+    if portfolio.virtual_positions:
+        read = get_portfolio_values if values_only else get_portfolio_weights_and_value
+        return await sync_to_async(read)(portfolio, start_date, end_date)
+
+    fields = ("date", "total_value") + (() if values_only else ("weights",))
+    values = (
+        PortfolioValue.objects.filter(
             portfolio=portfolio,
             date__range=[start_date, end_date]
         )
-        .values_list("date", flat=True)
-        .distinct()
         .order_by("date")
+        .values_list(*fields)
     )
+    data = []
+    async for date, total_value, *weights in values:
+        item = {"date": date.isoformat(), "total_value": float(total_value)}
+        if weights:
+            item["weights"] = weights[0]
+        data.append(item)
+    return data
 
-    result = []
 
-    # Para cada fecha, calcular V_t y w_{i,t}
-    for date in dates:
-        # Obtener todas las posiciones del portafolio en esta fecha
-        positions = Position.objects.filter(
-            portfolio=portfolio,
-            date=date
-        ).select_related("asset")  # Optimización: evita queries adicionales
+# Paginación por keyset sobre la fecha para rangos largos
+# Cada página es un scan del índice (portfolio, date) desde la fecha del
+# cursor con LIMIT, sin OFFSET: la página 400 cuesta lo mismo que la 1.
+@timed
+def get_portfolio_page(
+    portfolio: Portfolio,
+    start_date,
+    end_date,
+    page_size: int,
+    after=None,
+    values_only=False
+) -> Tuple[List[Dict], Optional[object]]:
+    """
+    Hasta page_size fechas del rango posteriores a after (None = desde
+    start_date). Retorna (elementos, última fecha de la página si quedan
+    más fechas en el rango, o None).
+    """
+    date_from = start_date if after is None else max(start_date, after + timedelta(days=1))
+
+    if portfolio.virtual_positions:
+        # Las filas son por activo: primero las fechas de la página, solo
+        # las que tienen precio de los activos del portafolio, y después
+        # los valores de ese tramo
+        dates = list(
+            _virtual_prices([portfolio], date_from, end_date)
+            .order_by("date")
+            .values_list("date", flat=True)
+            .distinct()[:page_size + 1]
+        )
+        rows = []
+        if dates:
+            rows = list(iter_virtual_weights_and_value(
+                [portfolio], date_from, dates[:page_size][-1], values_only
+            ))
+        has_more = len(dates) > page_size
+    else:
+        fields = ("date", "total_value") + (() if values_only else ("weights",))
+        values = (
+            PortfolioValue.objects.filter(
+                portfolio=portfolio,
+                date__range=[date_from, end_date]
+            )
+            .order_by("date")
+            .values_list(*fields)[:page_size + 1]
+        )
+        rows = [
+            (portfolio.pk, date, total_value, weights[0] if weights else None)
+            for date, total_value, *weights in values
+        ]
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+    data = []
+    for _, date, total_value, weights in rows:
+        item = {"date": date.isoformat(), "total_value": float(total_value)}
+        if not values_only:
+            item["weights"] = weights
+        data.append(item)
+    return data, rows[-1][1] if has_more and rows else None
+
+
+@timed
+def get_portfolio_values(portfolio: Portfolio, start_date, end_date) -> List[Dict]:
+    """
+    Solo V_t por fecha (por ejemplo, para el gráfico de línea del valor).
+    No lee la columna de pesos.
+    """
+    return list(iter_portfolio_weights_and_value(portfolio, start_date, end_date, values_only=True))
+
+
+@timed
+def count_portfolio_dates(portfolio: Portfolio, start_date, end_date) -> int:
+    """
+    Cantidad de fechas con valor en el rango (para calcular los buckets).
+    """
+    if portfolio.virtual_positions:
+        return _virtual_prices([portfolio], start_date, end_date).values("date").distinct().count()
+    return PortfolioValue.objects.filter(
+        portfolio=portfolio,
+        date__range=[start_date, end_date]
+    ).count()
+
+
+@timed
+def get_portfolios_weights_and_value(
+    portfolios,
+    start_date,
+    end_date,
+    values_only=False
+) -> Dict[int, List[Dict]]:
+    """
+    Versión de get_portfolio_weights_and_value para varios portafolios:
+    una sola query a PortfolioValue con portfolio__in, sin importar cuántos
+    sean. Retorna {portfolio_id: [elementos por fecha]} (lista vacía si el
+    portafolio no tiene valores en el rango).
+    """
+    result = {portfolio.pk: [] for portfolio in portfolios}
+    for portfolio_id, date, total_value, weights in _iter_values(
+        portfolios, start_date, end_date, values_only
+    ):
+        item = {"date": date.isoformat(), "total_value": float(total_value)}
+        if not values_only:
+            item["weights"] = weights
+        result[portfolio_id].append(item)
+    return result
+
+
+def _iter_values(portfolios, start_date, end_date, values_only=False):
+    """
+    Produce (portfolio_id, fecha, V_t, pesos o None) ordenado por portafolio
+    y fecha: de PortfolioValue para los portafolios materializados y desde
+    Price × c_{i,0} para los virtuales. Una query por cada tipo.
+    """
+    portfolios = list(portfolios)
+    stored = [p.pk for p in portfolios if not p.virtual_positions]
+    virtual = [p for p in portfolios if p.virtual_positions]
+
+    if stored:
+        fields = ("portfolio_id", "date", "total_value") + (() if values_only else ("weights",))
+        values = (
+            PortfolioValue.objects.filter(
+                portfolio__in=stored,
+                date__range=[start_date, end_date]
+            )
+            .order_by("portfolio_id", "date")
+            .values_list(*fields)
+        )
+        for portfolio_id, date, total_value, *weights in values.iterator(
+            chunk_size=ITERATOR_CHUNK_SIZE
+        ):
+            yield portfolio_id, date, total_value, weights[0] if weights else None
+
+    if virtual:
+        yield from iter_virtual_weights_and_value(virtual, start_date, end_date, values_only)
+
+
+# Posiciones virtuales: x_{i,t} = p_{i,t} * c_{i,0} calculado al leer
+# Los portafolios con position_storage="virtual" solo guardan la posición
+# de start_date; el resto sale de un join de Price con esas cantidades.
+# Se calcula en float: evita convertir cada fila a Decimal al leer y los
+# pesos se responden en float de todas formas.
+_VIRTUAL_VALUE = ExpressionWrapper(
+    Cast("price", FloatField()) * Cast("asset__position__quantity", FloatField()),
+    output_field=FloatField(),
+)  # x_{i,t}
+
+
+def _virtual_prices(portfolios, date_from=None, date_to=None):
+    # Un solo filter(): el join con Position se reutiliza en las anotaciones
+    prices = Price.objects.filter(
+        asset__position__portfolio__in=portfolios,
+        asset__position__date=F("asset__position__portfolio__start_date"),
+    )
+    if date_from is not None:
+        prices = prices.filter(date__gte=date_from)
+    if date_to is not None:
+        prices = prices.filter(date__lte=date_to)
+    return prices
+
+
+@timed
+def iter_virtual_weights_and_value(portfolios, date_from=None, date_to=None, values_only=False):
+    """
+    Igual que iter_position_weights_and_value, pero sin leer Position
+    histórica: produce (portfolio_id, fecha, V_t, pesos) con una query
+    sobre Price unida a las cantidades iniciales. V_t se suma en la base.
+    Con values_only se agrupa por fecha y los pesos son None.
+    """
+    prices = _virtual_prices(portfolios, date_from, date_to)
+
+    if values_only:
+        totals = (
+            prices.values("asset__position__portfolio_id", "date")
+            .annotate(total_value=Sum(_VIRTUAL_VALUE))
+            .order_by("asset__position__portfolio_id", "date")
+            .values_list("asset__position__portfolio_id", "date", "total_value")
+        )
+        for portfolio_id, date, total_value in totals.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            yield portfolio_id, date, total_value, None
+        return
 
-        # Calcular V_t = sum(x_{i,t}) - suma de todos los valores
-        total_value = sum(
-            (p.value_at_date for p in positions),
-            Decimal("0")
+    rows = (
+        prices
+        .annotate(
+            portfolio_id=F("asset__position__portfolio_id"),
+            value=_VIRTUAL_VALUE,
+            # V_t = sum(x_{i,t}) de la misma fecha
+            total_value=Window(
+                expression=Sum(_VIRTUAL_VALUE),
+                partition_by=[F("asset__position__portfolio_id"), F("date")],
+            ),
         )
+        .order_by("portfolio_id", "date", "asset_id")
+        .values_list("portfolio_id", "date", "asset__symbol", "value", "total_value")
+    )
+    yield from _group_weights(rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE), as_float=True)
+
+
+def _group_weights(rows, as_float=False):
+    """
+    Agrupa filas (portfolio_id, fecha, símbolo, x_{i,t}, V_t) ordenadas por
+    portafolio y fecha en (portfolio_id, fecha, V_t, pesos).
+    """
+    current = None
+
+    for portfolio_id, date, symbol, value, total_value in rows:
+        # Las filas vienen ordenadas: empieza un portafolio o una fecha nueva
+        if current is None or current[:2] != (portfolio_id, date):
+            if current is not None:
+                yield current
+            current = (portfolio_id, date, total_value, [])
 
         # Calcular w_{i,t} = x_{i,t} / V_t para cada activo
-        weights = []
-        for position in positions:
-            weight = (
-                position.value_at_date / total_value
-                if total_value > 0 else Decimal("0")
+        if as_float:
+            weight = float(value) / float(total_value) if total_value > 0 else 0.0
+        else:
+            weight = value / total_value if total_value > 0 else Decimal("0")
+        current[3].append({
+            "asset": symbol,
+            "weight": float(weight),  # Convertir para JSON
+        })
+
+    if current is not None:
+        yield current
+
+
+# V_t y w_{i,t} calculados directamente desde Position
+# Lo usan los cálculos de posiciones para llenar PortfolioValue y el comando
+# rebuild_portfolio_values para verificarla.
+@timed
+def iter_position_weights_and_value(
+    portfolios, date_from=None, date_to=None, as_float=False, dates=None
+):
+    """
+    Produce (portfolio_id, fecha, V_t, pesos) desde las posiciones, con una
+    sola query: V_t se calcula en la base con una ventana Sum(x_{i,t})
+    particionada por portafolio y fecha.
+    Con as_float=True los pesos se dividen en float en vez de Decimal.
+    dates limita el cálculo a esas fechas (además del rango).
+    """
+    positions = Position.objects.filter(portfolio__in=portfolios)
+    if dates is not None:
+        positions = positions.filter(date__in=list(dates))
+    if date_from is not None:
+        positions = positions.filter(date__gte=date_from)
+    if date_to is not None:
+        positions = positions.filter(date__lte=date_to)
+
+    positions = (
+        positions
+        .annotate(
+            # V_t = sum(x_{i,t}) de todas las posiciones de la misma fecha
+            total_value=Window(
+                expression=Sum("value_at_date"),
+                partition_by=[F("portfolio_id"), F("date")],
             )
-            weights.append({
-                "asset": position.asset.symbol,
-                "weight": float(weight),  # Convertir para JSON
-            })
+        )
+        .order_by("portfolio_id", "date", "asset_id")
+        .values_list("portfolio_id", "date", "asset__symbol", "value_at_date", "total_value")
+    )
 
-        result.append({
+    yield from _group_weights(
+        positions.iterator(chunk_size=ITERATOR_CHUNK_SIZE), as_float=as_float
+    )
+
+
+# x_{i,t} se guarda redondeado a los decimales de Position.value_at_date
+VALUE_DECIMALS = Position._meta.get_field("value_at_date").decimal_places
+VALUE_QUANTUM = Decimal(1).scaleb(-VALUE_DECIMALS)
+
+
+def iter_matrix_weights_and_value(matrices, as_float=False):
+    """
+    Igual que iter_position_weights_and_value, pero desde matrices que el
+    cálculo ya tiene en memoria, sin volver a leer Position.
+    matrices: tuplas (portfolio_id, fechas, símbolos, x_{i,t}, máscara), con
+    x_{i,t} de fechas × activos (activos en orden de asset_id) y la máscara
+    de las celdas que tienen posición. x_{i,t} se redondea como lo guarda la
+    base para que V_t coincida con el de Position.
+    """
+    for portfolio_id, dates, symbols, values, mask in matrices:
+        if values.dtype == object:
+            values = np.where(mask, values, Decimal("0"))
+            values = np.frompyfunc(lambda value: Decimal(value).quantize(VALUE_QUANTUM), 1, 1)(values)
+        else:
+            values = np.round(np.where(mask, values, 0.0), VALUE_DECIMALS)
+        totals = values.sum(axis=1)  # V_t = sum(x_{i,t})
+        yield from _group_weights(
+            (
+                (portfolio_id, dates[t], symbols[i], values[t, i], totals[t])
+                for t, i in zip(*np.nonzero(mask))
+            ),
+            as_float=as_float,
+        )
+
+
+# Resúmenes semanales y mensuales (PortfolioRollup)
+ROLLUP_RESOLUTIONS = (PortfolioRollup.RESOLUTION_WEEKLY, PortfolioRollup.RESOLUTION_MONTHLY)
+
+
+def period_start(date, resolution):
+    # Lunes de la semana o día 1 del mes
+    if resolution == PortfolioRollup.RESOLUTION_WEEKLY:
+        return date - timedelta(days=date.weekday())
+    return date.replace(day=1)
+
+
+def period_end(date, resolution):
+    # Domingo de la semana o último día del mes
+    if resolution == PortfolioRollup.RESOLUTION_WEEKLY:
+        return date + timedelta(days=6 - date.weekday())
+    return (date.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def iter_rollups(rows, resolution):
+    """
+    Agrupa filas (portfolio_id, fecha, V_t, pesos) ordenadas por portafolio
+    y fecha en (portfolio_id, inicio del período, fecha de cierre, V_t de
+    cierre, máx V_t, mín V_t, pesos de cierre).
+    """
+    current = None
+
+    for portfolio_id, date, total_value, weights in rows:
+        start = period_start(date, resolution)
+        if current is None or current[:2] != [portfolio_id, start]:
+            if current is not None:
+                yield tuple(current)
+            current = [portfolio_id, start, date, total_value, total_value, total_value, weights]
+            continue
+        current[2:4] = date, total_value
+        current[4] = max(current[4], total_value)
+        current[5] = min(current[5], total_value)
+        current[6] = weights
+
+    if current is not None:
+        yield tuple(current)
+
+
+@timed
+def get_portfolio_rollups(
+    portfolio: Portfolio,
+    start_date,
+    end_date,
+    resolution,
+    values_only=False
+) -> List[Dict]:
+    """
+    Un elemento por semana o mes con V_t y pesos de cierre y el máximo y
+    mínimo de V_t. Incluye los períodos que se cruzan con el rango, así
+    que el primero y el último pueden cubrir fechas fuera de él.
+    Los portafolios virtuales se agrupan al leer (no guardan resúmenes).
+    """
+    if portfolio.virtual_positions:
+        rows = iter_virtual_weights_and_value(
+            [portfolio],
+            period_start(start_date, resolution),
+            period_end(end_date, resolution),
+            values_only,
+        )
+        rollups = (
+            rollup for rollup in iter_rollups(rows, resolution)
+            if rollup[2] >= start_date
+        )
+    else:
+        fields = ("portfolio_id", "period_start", "date", "total_value", "high_value", "low_value")
+        rollups = (
+            PortfolioRollup.objects.filter(
+                portfolio=portfolio,
+                resolution=resolution,
+                period_start__lte=end_date,
+                date__gte=start_date,
+            )
+            .order_by("period_start")
+            .values_list(*fields + (() if values_only else ("weights",)))
+        )
+
+    data = []
+    for _, start, date, total_value, high_value, low_value, *weights in rollups:
+        item = {
             "date": date.isoformat(),
-            "total_value": float(total_value),  # V_t
-            "weights": weights,  # w_{i,t} para cada activo
+            "period_start": start.isoformat(),
+            "total_value": float(total_value),  # V_t de cierre
+            "high_value": float(high_value),
+            "low_value": float(low_value),
+        }
+        if not values_only:
+            item["weights"] = weights[0]
+        data.append(item)
+    return data
+
+
+# Reducción de puntos en el servidor para rangos largos
+def downsample_evolution(items, total_items: int, max_points: int) -> Iterator[Dict]:
+    """
+    Promedia V_t y cada w_{i,t} en buckets consecutivos de fechas para que
+    salgan como máximo max_points elementos. Cada bucket toma la última fecha.
+    Recorre items una sola vez, así funciona también con un generador.
+    """
+    bucket_size = max(1, math.ceil(total_items / max_points))
+    if bucket_size == 1:
+        yield from items
+        return
+
+    bucket = []
+    for item in items:
+        bucket.append(item)
+        if len(bucket) == bucket_size:
+            yield _average_bucket(bucket)
+            bucket = []
+    if bucket:
+        yield _average_bucket(bucket)
+
+
+def downsample_columns(dates, values, weights, max_points: int):
+    """
+    Igual que downsample_evolution pero sobre arreglos (fechas, V_t y la
+    matriz de pesos fechas × activos, o None): promedia cada bucket con
+    np.add.reduceat en vez de recorrer los elementos.
+    """
+    total_items = len(dates)
+    bucket_size = max(1, math.ceil(total_items / max_points))
+    if bucket_size == 1:
+        return dates, values, weights
+
+    starts = np.arange(0, total_items, bucket_size)
+    sizes = np.diff(np.append(starts, total_items))
+    last = starts + sizes - 1
+    values = np.add.reduceat(values, starts) / sizes
+    if weights is not None:
+        weights = np.add.reduceat(weights, starts, axis=0) / sizes[:, None]
+    return dates[last], values, weights
+
+
+def downsample_rollups(items: List[Dict], max_points: int) -> List[Dict]:
+    """
+    Junta períodos consecutivos de get_portfolio_rollups en como máximo
+    max_points elementos sin promediar: cada uno va desde el period_start
+    del primero hasta la fecha de cierre del último, con el V_t y los pesos
+    de cierre del último y el máximo y mínimo de todo el bucket.
+    """
+    bucket_size = max(1, math.ceil(len(items) / max_points))
+    if bucket_size == 1:
+        return items
+
+    merged = []
+    for start in range(0, len(items), bucket_size):
+        bucket = items[start:start + bucket_size]
+        merged.append({
+            **bucket[-1],
+            "period_start": bucket[0]["period_start"],
+            "high_value": max(item["high_value"] for item in bucket),
+            "low_value": min(item["low_value"] for item in bucket),
         })
+    return merged
 
-    return result
+
+def _average_bucket(bucket: List[Dict]) -> Dict:
+    size = len(bucket)
+    averaged = {
+        "date": bucket[-1]["date"],
+        "total_value": sum(item["total_value"] for item in bucket) / size,
+    }
+    if "weights" not in bucket[0]:
+        return averaged  # Serie de solo V_t
+
+    weights = {}
+    for item in bucket:
+        for weight in item["weights"]:
+            weights[weight["asset"]] = weights.get(weight["asset"], 0.0) + weight["weight"]
+
+    averaged["weights"] = [
+        {"asset": asset, "weight": total / size}
+        for asset, total in weights.items()
+    ]
+    return averaged
+
+
+# Carga el histórico de precios como matriz fechas × activos
+# La usan los cálculos vectorizados de services.py en vez de un Price.objects.get por celda
+@timed
+def get_price_matrix(asset_ids, date_from=None, date_to=None, as_float=False):
+    """
+    Retorna (fechas, matriz) donde matriz[t, i] = p_{i,t} del activo asset_ids[i].
+    Hace una sola query sin importar cuántas fechas haya.
+    Las celdas sin precio quedan en None; los precios se mantienen en Decimal.
+    Con as_float=True la matriz es float64 y las celdas vacías son NaN.
+    """
+    prices = Price.objects.filter(asset_id__in=asset_ids)
+    if date_from is not None:
+        prices = prices.filter(date__gte=date_from)
+    if date_to is not None:
+        prices = prices.filter(date__lte=date_to)
+
+    rows = list(prices.order_by().values_list("date", "asset_id", "price"))
+    matrix_assets = np.asarray(asset_ids, dtype=np.int64)
+    dtype = np.float64 if as_float else object
+    if not rows:
+        return [], np.empty((0, len(matrix_assets)), dtype=dtype)
+
+    row_dates, row_assets, row_prices = zip(*rows)
+
+    # Índices de fila (fecha) y columna (activo) de cada precio
+    dates, date_idx = np.unique(
+        np.asarray(row_dates, dtype="datetime64[D]"),
+        return_inverse=True
+    )
+    order = np.argsort(matrix_assets)
+    asset_idx = order[
+        np.searchsorted(matrix_assets, np.asarray(row_assets), sorter=order)
+    ]
+
+    matrix = np.full(
+        (len(dates), len(matrix_assets)),
+        np.nan if as_float else None,
+        dtype=dtype
+    )
+    matrix[date_idx, asset_idx] = np.asarray(row_prices, dtype=dtype)
+
+    return dates.astype(object).tolist(), matrix
+
+
+# Pesos objetivo w_{i,t} de un portafolio como matriz fechas × activos
+@timed
+def get_weight_matrix(portfolio: Portfolio, asset_ids=None):
+    """
+    Retorna (fechas de Weight, asset_ids, matriz float64) con una sola query.
+    Un activo sin fila en una fecha de pesos queda con peso 0 en esa fecha.
+    """
+    rows = list(
+        Weight.objects.filter(portfolio=portfolio)
+        .order_by()
+        .values_list("date", "asset_id", "weight")
+    )
+    if asset_ids is None:
+        asset_ids = sorted({asset_id for _, asset_id, _ in rows})
+    asset_index = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+
+    dates = sorted({date for date, _, _ in rows})
+    date_index = {date: t for t, date in enumerate(dates)}
+
+    matrix = np.zeros((len(dates), len(asset_ids)))
+    for date, asset_id, weight in rows:
+        if asset_id in asset_index:
+            matrix[date_index[date], asset_index[asset_id]] = float(weight)
+
+    return np.asarray(dates, dtype="datetime64[D]"), asset_ids, matrix
+
+
+# V_t y w_{i,t} materializados como arreglos, para los análisis con NumPy
+@timed
+def get_portfolio_value_matrix(portfolio: Portfolio, start_date, end_date):
+    """
+    Retorna (fechas datetime64[D], V_t float64, símbolos, asset_ids, matriz
+    de pesos fechas × activos) leyendo PortfolioValue (o Price × c_{i,0} si
+    es virtual) en una query, más una para los ids de los activos.
+    """
+    rows = [
+        (date, total_value, weights)
+        for _, date, total_value, weights in _iter_values([portfolio], start_date, end_date)
+    ]
+    symbols = sorted({w["asset"] for _, _, weights in rows for w in weights})
+    asset_index = {symbol: i for i, symbol in enumerate(symbols)}
+    ids = dict(Asset.objects.filter(symbol__in=symbols).values_list("symbol", "id"))
+
+    values = np.empty(len(rows))
+    matrix = np.zeros((len(rows), len(symbols)))
+    for t, (_, total_value, weights) in enumerate(rows):
+        values[t] = float(total_value)
+        for w in weights:
+            matrix[t, asset_index[w["asset"]]] = w["weight"]
+
+    dates = np.asarray([date for date, _, _ in rows], dtype="datetime64[D]")
+    return dates, values, symbols, [ids.get(symbol) for symbol in symbols], matrix
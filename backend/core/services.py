@@ -1,13 +1,67 @@
 from decimal import Decimal
+from django.conf import settings
 from django.db import transaction
-import pandas as pd
-from datetime import datetime
+from django.db.models import F, Max
+import numpy as np
+from datetime import datetime, timedelta
 
-from core.models import Portfolio, Price, Weight, Position, Asset
+from core.cache import bump_dataset_version
+from core.engine import forward_fill, rebalance_mask, simulate_rebalancing
+from core.ingestion import (
+    DATE_COLUMN,
+    DEFAULT_BATCH_SIZE,
+    PriceWriter,
+    iter_price_rows,
+    parse_date,
+    parse_price,
+    read_weights,
+)
+from core.metrics import timed
+from core.models import Portfolio, PortfolioRollup, PortfolioValue, Price, Weight, Position, Asset
+from core.price_store import refresh_price_store
+from core.selectors import (
+    ITERATOR_CHUNK_SIZE,
+    ROLLUP_RESOLUTIONS,
+    get_price_matrix,
+    get_weight_matrix,
+    iter_matrix_weights_and_value,
+    iter_position_weights_and_value,
+    iter_rollups,
+    period_end,
+    period_start,
+)
+
+WEIGHT_QUANTUM = Decimal("0.000001")
+
+# Modo de cálculo de las posiciones buy and hold
+# "decimal": aritmética exacta con Decimal (por defecto)
+# "float": matrices float64 de NumPy; se pasa a Decimal solo al guardar
+# (los DecimalField de Position redondean a sus decimales)
+COMPUTE_DECIMAL = "decimal"
+COMPUTE_FLOAT = "float"
+COMPUTE_MODES = (COMPUTE_DECIMAL, COMPUTE_FLOAT)
+
+
+def _compute_mode(mode=None) -> str:
+    mode = mode or settings.POSITION_COMPUTE_MODE
+    if mode not in COMPUTE_MODES:
+        raise ValueError(f"Modo de cálculo no soportado: {mode}")
+    return mode
+
+
+def mark_prices_changed():
+    """
+    Registra un cambio en Price: incrementa la versión de precios (la
+    matriz compartida deja de leerse) y la reescribe cuando la transacción
+    se confirma, así nunca publica precios sin confirmar.
+    """
+    bump_dataset_version(prices=True)
+    transaction.on_commit(refresh_price_store)
 
 
 # Requisito 3: Calcular cantidades iniciales c_{i,0}
 # Esta función implementa la fórmula: c_{i,0} = (w_{i,0} * V_0) / p_{i,0}
+@timed
 @transaction.atomic
 def calculate_initial_positions(portfolio: Portfolio):
     """
@@ -41,72 +95,586 @@ def calculate_initial_positions(portfolio: Portfolio):
             },
         )
 
+    refresh_portfolio_values([portfolio], start_date, start_date)
+
+    # Las cantidades cambiaron: el histórico calculado ya no sirve
+    _set_computed_until(portfolio, None)
+    bump_dataset_version()
+    return len(weights)
+
+
+def _set_computed_until(portfolio: Portfolio, date):
+    """
+    Actualiza la marca de agua del recálculo incremental.
+    """
+    portfolio.computed_until = date
+    Portfolio.objects.filter(pk=portfolio.pk).update(computed_until=date)
+
 
 # Requisito 4: Calcular evolución histórica
+@timed
 @transaction.atomic
-def calculate_historical_positions(portfolio: Portfolio):
+def calculate_historical_positions(portfolio: Portfolio, incremental=False, mode=None):
     """
     Calcula las posiciones para todas las fechas históricas.
     Como las cantidades se mantienen constantes, solo actualizo los valores
     según los nuevos precios: x_{i,t} = p_{i,t} * c_{i,0}
+    Se hace de forma vectorizada: matriz de precios (fechas × activos) por el
+    vector de cantidades iniciales, y un solo bulk upsert de Position.
+    Con incremental=True solo se calculan las fechas posteriores a
+    portfolio.computed_until; sin marca de agua se reconstruye todo.
+    mode: "decimal" o "float" (por defecto settings.POSITION_COMPUTE_MODE).
     """
+    mode = _compute_mode(mode)
+
+    # Los portafolios con rebalanceo no mantienen cantidades fijas
+    if portfolio.rebalance_frequency != Portfolio.REBALANCE_NONE:
+        return calculate_rebalanced_positions(portfolio)
+    if portfolio.virtual_positions:
+        return _clear_virtual_history(portfolio)
+
     # Primero obtengo las cantidades iniciales que ya calculé
-    initial_positions = Position.objects.filter(portfolio=portfolio,date=portfolio.start_date).select_related("asset")
+    initial_positions = list(
+        Position.objects
+        .filter(portfolio=portfolio, date=portfolio.start_date)
+        .order_by("asset_id")
+        .values_list("asset_id", "quantity")
+    )
+
+    if not initial_positions:
+        return 0
 
-    if not initial_positions.exists():
-        return
+    asset_ids = [asset_id for asset_id, _ in initial_positions]
+    stored_quantities = [quantity for _, quantity in initial_positions]  # c_{i,0}
+    as_float = mode == COMPUTE_FLOAT
+    quantities = np.array(stored_quantities, dtype=np.float64 if as_float else object)
 
-    # Obtener todas las fechas para las que tengo precios, todas las fechas únicas de precios
-    assets = [pos.asset for pos in initial_positions]
-    all_dates = (
-        Price.objects
-        .values_list("date", flat=True)
-        .distinct()
-        .order_by("date")
+    date_from = None
+    if incremental and portfolio.computed_until is not None:
+        # Solo las fechas nuevas desde el último cálculo
+        date_from = portfolio.computed_until + timedelta(days=1)
+    else:
+        # Reconstrucción completa: borro el histórico anterior
+        Position.objects.filter(portfolio=portfolio).exclude(
+            date=portfolio.start_date
+        ).delete()
+
+    # Todas las fechas con precio en una sola query
+    dates, prices = get_price_matrix(asset_ids, date_from=date_from, as_float=as_float)
+    if as_float:
+        has_price = ~np.isnan(prices)
+        values = np.where(has_price, prices, 0.0) * quantities
+    else:
+        has_price = np.not_equal(prices, None)
+        # x_{i,t} = p_{i,t} * c_{i,0} para toda la matriz de una vez
+        values = np.where(has_price, prices, Decimal("0")) * quantities
+
+    positions = [
+        Position(
+            portfolio=portfolio,
+            asset_id=asset_ids[i],
+            date=dates[t],
+            quantity=stored_quantities[i],  # c_{i,t} = c_{i,0}
+            value_at_date=values[t, i],  # x_{i,t} = p_{i,t} * c_{i,0}
+        )
+        for t, i in zip(*np.nonzero(has_price))
+        if dates[t] != portfolio.start_date  # Ya está calculado
+    ]
+
+    # Un solo INSERT ... ON CONFLICT en vez de un update_or_create por celda
+    Position.objects.bulk_create(
+        positions,
+        update_conflicts=True,
+        unique_fields=["portfolio", "asset", "date"],
+        update_fields=["quantity", "value_at_date"],
     )
-    positions_created = 0
-    # Para cada fecha, recalcular el valor usando los precios actuales
-    for date in all_dates:
-        if date == portfolio.start_date:
-            continue  # Ya está calculado
-
-        for initial_pos in initial_positions:
-            try:
-                # Obtener el precio del activo en esta fecha
-                price = Price.objects.get(
-                    asset=initial_pos.asset,
-                    date=date
-                )
-                # El valor cambia porque el precio cambió, pero la cantidad no
-                value = initial_pos.quantity * price.price
-
-                Position.objects.update_or_create(
-                    portfolio=portfolio,
-                    asset=initial_pos.asset,
-                    date=date,
-                    defaults={
-                        "quantity": initial_pos.quantity,  # c_{i,t} = c_{i,0}
-                        "value_at_date": value,  # x_{i,t} = p_{i,t} * c_{i,0}
-                    },
-                )
-                positions_created += 1
-            except Price.DoesNotExist:
-                continue
+    refresh_portfolio_values(
+        [portfolio], date_from, mode=mode,
+        matrices=[(portfolio.pk, dates, _asset_symbols(asset_ids), values, has_price)],
+    )
+    if dates:
+        _set_computed_until(portfolio, dates[-1])
+    elif date_from is None:
+        _set_computed_until(portfolio, None)
+    bump_dataset_version()
+    positions_created = len(positions)
     print(f" {positions_created} posiciones históricas creadas para {portfolio.name}")
+    return positions_created
+
+
+def _clear_virtual_history(portfolio: Portfolio):
+    """
+    Portafolio con posiciones virtuales: solo se conserva la posición de
+    start_date (c_{i,0}); el histórico y PortfolioValue se calculan al leer.
+    """
+    Position.objects.filter(portfolio=portfolio).exclude(date=portfolio.start_date).delete()
+    refresh_portfolio_values([portfolio])  # borra las filas materializadas
+    _set_computed_until(portfolio, _last_price_date(portfolio))
+    bump_dataset_version()
+    return 0
+
+
+def _last_price_date(portfolio: Portfolio):
+    # Última fecha con precio de algún activo con posición inicial
+    return Price.objects.filter(
+        asset__position__portfolio=portfolio,
+        asset__position__date=portfolio.start_date,
+    ).aggregate(last=Max("date"))["last"]
+
+
+# Recálculo limitado a las celdas de precio que cambió el ETL
+@timed
+@transaction.atomic
+def recalculate_price_cells(portfolio: Portfolio, cells, mode=None):
+    """
+    Recalcula x_{i,t} = p_{i,t} * c_{i,0} solo en las celdas (asset_id, fecha)
+    cuyo precio se insertó, cambió o se borró, y PortfolioValue solo en esas
+    fechas. Las celdas borradas eliminan la posición.
+    Si el portafolio se rebalancea o cambió un precio de start_date (cambia
+    c_{i,0}), lo reconstruye completo con calculate_all_positions.
+    """
+    mode = _compute_mode(mode)
+    as_float = mode == COMPUTE_FLOAT
+    # Las fechas anteriores a start_date también tienen Position y PortfolioValue
+    cells = set(cells)
+    if not cells:
+        return 0
+    if (
+        portfolio.rebalance_frequency != Portfolio.REBALANCE_NONE
+        or any(date == portfolio.start_date for _, date in cells)
+    ):
+        return calculate_all_positions([portfolio], mode=mode)
+    if portfolio.virtual_positions:
+        # Nada que escribir: x_{i,t} se calcula al leer con el precio nuevo
+        _set_computed_until(portfolio, _last_price_date(portfolio))
+        return 0
+
+    quantities = dict(
+        Position.objects
+        .filter(portfolio=portfolio, date=portfolio.start_date)
+        .values_list("asset_id", "quantity")
+    )  # c_{i,0}; los activos sin posición inicial no afectan al portafolio
+    cells = {(asset_id, date) for asset_id, date in cells if asset_id in quantities}
+    if not cells:
+        return 0
+
+    asset_ids = {asset_id for asset_id, _ in cells}
+    dates = {date for _, date in cells}
+    prices = {
+        (asset_id, date): price
+        for asset_id, date, price in Price.objects
+        .filter(asset_id__in=asset_ids, date__in=dates)
+        .order_by()
+        .values_list("asset_id", "date", "price")
+        if (asset_id, date) in cells
+    }
+
+    # Celdas que ya no tienen precio: se borra la posición
+    removed = [
+        pk
+        for pk, asset_id, date in Position.objects
+        .filter(portfolio=portfolio, asset_id__in=asset_ids, date__in=dates)
+        .order_by()
+        .values_list("id", "asset_id", "date")
+        if (asset_id, date) in cells and (asset_id, date) not in prices
+    ]
+    if removed:
+        Position.objects.filter(id__in=removed).delete()
+
+    positions = [
+        Position(
+            portfolio=portfolio,
+            asset_id=asset_id,
+            date=date,
+            quantity=quantities[asset_id],  # c_{i,t} = c_{i,0}
+            # x_{i,t} = p_{i,t} * c_{i,0}
+            value_at_date=(
+                float(price) * float(quantities[asset_id]) if as_float
+                else price * quantities[asset_id]
+            ),
+        )
+        for (asset_id, date), price in prices.items()
+    ]
+    Position.objects.bulk_create(
+        positions,
+        update_conflicts=True,
+        unique_fields=["portfolio", "asset", "date"],
+        update_fields=["quantity", "value_at_date"],
+    )
+    refresh_portfolio_values([portfolio], mode=mode, dates=dates)
+    _set_computed_until(
+        portfolio,
+        Position.objects.filter(portfolio=portfolio).aggregate(last=Max("date"))["last"],
+    )
+    bump_dataset_version()
+    print(
+        f" {len(positions)} posiciones recalculadas y {len(removed)} borradas "
+        f"en {len(dates)} fechas para {portfolio.name}"
+    )
+    return len(positions)
+
+
+# Rebalanceo periódico hacia los pesos objetivo de Weight
+@timed
+@transaction.atomic
+def calculate_rebalanced_positions(portfolio: Portfolio):
+    """
+    Calcula las posiciones de un portafolio que se rebalancea según
+    portfolio.rebalance_frequency. En cada rebalanceo:
+    c_{i,t} = (w_{i,t} * V_t) / p_{i,t}, con w_{i,t} el último Weight vigente;
+    entre rebalanceos las cantidades se mantienen.
+    Se calcula con operaciones de matrices (core.engine), en float64, y se
+    convierte a Decimal solo al guardar.
+    """
+    weight_dates, asset_ids, weight_matrix = get_weight_matrix(portfolio)
+    Position.objects.filter(portfolio=portfolio).delete()
+    if not asset_ids:
+        refresh_portfolio_values([portfolio])
+        _set_computed_until(portfolio, None)
+        bump_dataset_version()
+        return 0
+
+    dates, prices = get_price_matrix(
+        asset_ids, date_from=portfolio.start_date, as_float=True
+    )
+    dates = np.asarray(dates, dtype="datetime64[D]")
+
+    # Fila de Weight vigente en cada fecha; antes del primer peso no hay posición
+    target_rows = np.searchsorted(weight_dates, dates, side="right") - 1
+    first = int(np.searchsorted(target_rows, 0))
+    dates, prices, target_rows = dates[first:], prices[first:], target_rows[first:]
+    if not len(dates):
+        refresh_portfolio_values([portfolio])
+        _set_computed_until(portfolio, None)
+        bump_dataset_version()
+        return 0
+
+    has_price = ~np.isnan(prices)
+    rebalance = rebalance_mask(dates, portfolio.rebalance_frequency, target_rows)
+    quantities = simulate_rebalancing(
+        forward_fill(prices),
+        weight_matrix[target_rows],
+        rebalance,
+        float(portfolio.initial_value),  # V_0
+    )
+    values = np.where(has_price, quantities * np.nan_to_num(prices), 0.0)  # x_{i,t}
+
+    day_list = dates.astype(object)
+    positions = [
+        Position(
+            portfolio=portfolio,
+            asset_id=asset_ids[i],
+            date=day_list[t],
+            quantity=quantities[t, i],  # c_{i,t}
+            value_at_date=values[t, i],  # x_{i,t} = p_{i,t} * c_{i,t}
+        )
+        for t, i in zip(*np.nonzero(has_price))
+    ]
+    Position.objects.bulk_create(positions)
+    refresh_portfolio_values(
+        [portfolio],
+        matrices=[(portfolio.pk, day_list, _asset_symbols(asset_ids), values, has_price)],
+    )
+
+    _set_computed_until(portfolio, day_list[-1])
+    bump_dataset_version()
+    print(
+        f" {len(positions)} posiciones con rebalanceo {portfolio.rebalance_frequency} "
+        f"({int(rebalance.sum())} rebalanceos) para {portfolio.name}"
+    )
+    return len(positions)
+
+
+# Cálculo en lote: todos los portafolios buy and hold con una sola lectura de precios
+@timed
+@transaction.atomic
+def calculate_all_positions(portfolios=None, mode=None):
+    """
+    Calcula c_{i,0} y x_{i,t} de varios portafolios a la vez.
+    Arma la matriz de cantidades iniciales (portafolios × activos) y la
+    matriz de precios (fechas × activos) con una query cada una:
+    c_{i,0} = (w_{i,0} * V_0) / p_{i,0} y x_{i,t} = p_{i,t} * c_{i,0}
+    salen de operaciones entre esas matrices, y todas las posiciones se
+    escriben con un solo bulk_create.
+    Los portafolios con rebalanceo se delegan a calculate_rebalanced_positions.
+    mode: "decimal" o "float" (por defecto settings.POSITION_COMPUTE_MODE).
+    """
+    mode = _compute_mode(mode)
+    as_float = mode == COMPUTE_FLOAT
+    zero = 0.0 if as_float else Decimal("0")
+    dtype = np.float64 if as_float else object
+
+    if portfolios is None:
+        portfolios = Portfolio.objects.all()
+    portfolios = list(portfolios)
+
+    positions_created = 0
+    for portfolio in portfolios:
+        if portfolio.rebalance_frequency != Portfolio.REBALANCE_NONE:
+            positions_created += calculate_rebalanced_positions(portfolio)
+    portfolios = [
+        portfolio for portfolio in portfolios
+        if portfolio.rebalance_frequency == Portfolio.REBALANCE_NONE
+    ]
+    if not portfolios:
+        return positions_created
+
+    # Pesos iniciales w_{i,0} de cada portafolio en su start_date
+    weights = list(
+        Weight.objects
+        .filter(portfolio__in=portfolios, date=F("portfolio__start_date"))
+        .order_by()
+        .values_list("portfolio_id", "asset_id", "weight")
+    )
+    asset_ids = sorted({asset_id for _, asset_id, _ in weights})
+    portfolio_index = {portfolio.pk: k for k, portfolio in enumerate(portfolios)}
+    asset_index = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+
+    weight_matrix = np.full((len(portfolios), len(asset_ids)), zero, dtype=dtype)
+    held = np.zeros((len(portfolios), len(asset_ids)), dtype=bool)
+    for portfolio_id, asset_id, weight in weights:
+        k, i = portfolio_index[portfolio_id], asset_index[asset_id]
+        weight_matrix[k, i] = weight
+        held[k, i] = True
+
+    # Una sola lectura de precios para todos los portafolios
+    dates, prices = get_price_matrix(asset_ids, as_float=as_float)
+    if not len(dates):
+        # Sin precios no hay posiciones: se borra lo calculado antes
+        Position.objects.filter(portfolio__in=portfolios).delete()
+        refresh_portfolio_values(portfolios, mode=mode)
+        for portfolio in portfolios:
+            portfolio.computed_until = None
+        Portfolio.objects.bulk_update(portfolios, ["computed_until"])
+        bump_dataset_version()
+        return positions_created
+    has_price = ~np.isnan(prices) if as_float else np.not_equal(prices, None)
+    filled = np.where(has_price, prices, zero)
+
+    # p_{i,0} de cada portafolio según su fecha inicial
+    date_index = {date: t for t, date in enumerate(dates)}
+    start_rows = np.array(
+        [date_index.get(portfolio.start_date, -1) for portfolio in portfolios],
+        dtype=np.int64
+    )
+    held &= (start_rows >= 0)[:, None]
+    held &= has_price[start_rows]  # sin precio inicial no se puede comprar
+    start_prices = np.where(held, filled[start_rows], 1.0 if as_float else Decimal("1"))
+    initial_values = np.array(
+        [portfolio.initial_value for portfolio in portfolios], dtype=dtype
+    )  # V_0
+
+    # c_{i,0} = (w_{i,0} * V_0) / p_{i,0} para todos los portafolios
+    quantities = np.where(
+        held,
+        weight_matrix * initial_values[:, None] / start_prices,
+        zero
+    )
+
+    Position.objects.filter(portfolio__in=portfolios).delete()
+
+    positions = []
+    matrices = []  # x_{i,t} en memoria para PortfolioValue
+    symbols = _asset_symbols(asset_ids)
+    for k, portfolio in enumerate(portfolios):
+        # x_{i,t} = p_{i,t} * c_{i,0}
+        values = filled * quantities[k]
+        matrices.append((portfolio.pk, dates, symbols, values, has_price & held[k]))
+        positions.extend(
+            Position(
+                portfolio=portfolio,
+                asset_id=asset_ids[i],
+                date=dates[t],
+                quantity=quantities[k, i],  # c_{i,t} = c_{i,0}
+                value_at_date=values[t, i],
+            )
+            for t, i in zip(*np.nonzero(has_price & held[k]))
+            # Las posiciones virtuales solo guardan c_{i,0}
+            if not portfolio.virtual_positions or dates[t] == portfolio.start_date
+        )
+        held_dates = np.flatnonzero((has_price & held[k]).any(axis=1))
+        portfolio.computed_until = dates[held_dates[-1]] if len(held_dates) else None
+
+    Position.objects.bulk_create(positions)
+    refresh_portfolio_values(portfolios, mode=mode, matrices=matrices)
+    Portfolio.objects.bulk_update(portfolios, ["computed_until"])
+    bump_dataset_version()
+
+    positions_created += len(positions)
+    print(f" {len(positions)} posiciones calculadas para {len(portfolios)} portafolios")
+    return positions_created
+
+
+def _asset_symbols(asset_ids):
+    # Símbolos en el orden de asset_ids, para los pesos de PortfolioValue
+    symbols = dict(Asset.objects.filter(id__in=asset_ids).values_list("id", "symbol"))
+    return [symbols[asset_id] for asset_id in asset_ids]
+
+
+# Tabla materializada de V_t y w_{i,t} (PortfolioValue)
+@timed
+def refresh_portfolio_values(
+    portfolios, date_from=None, date_to=None, mode=None, dates=None, matrices=None
+):
+    """
+    Recalcula PortfolioValue desde Position para el rango de fechas dado
+    (todo el histórico si no se indica) o solo para las fechas de dates.
+    Una query de lectura, un borrado y un bulk_create; se llama dentro de
+    la transacción de cada cálculo. En los portafolios virtuales solo borra.
+    matrices: tuplas (portfolio_id, fechas, símbolos, x_{i,t}, máscara) con
+    los x_{i,t} que el cálculo ya tiene en memoria; si se pasan, V_t y
+    w_{i,t} salen de ahí y no se vuelve a leer Position.
+    Después actualiza los resúmenes semanales y mensuales de esas fechas.
+    """
+    as_float = _compute_mode(mode) == COMPUTE_FLOAT
+    portfolios = list(portfolios)
+    if dates is not None:
+        dates = sorted(set(dates))
+    stale = PortfolioValue.objects.filter(portfolio__in=portfolios)
+    if dates is not None:
+        stale = stale.filter(date__in=dates)
+    if date_from is not None:
+        stale = stale.filter(date__gte=date_from)
+    if date_to is not None:
+        stale = stale.filter(date__lte=date_to)
+    stale.delete()
+    # Los portafolios virtuales no materializan V_t
+    materialized = [portfolio for portfolio in portfolios if not portfolio.virtual_positions]
+
+    if matrices is not None:
+        materialized_ids = {portfolio.pk for portfolio in materialized}
+        rows = iter_matrix_weights_and_value(
+            [matrix for matrix in matrices if matrix[0] in materialized_ids],
+            as_float=as_float,
+        )
+    else:
+        rows = iter_position_weights_and_value(
+            materialized, date_from, date_to, as_float=as_float, dates=dates
+        )
+
+    values = [
+        PortfolioValue(
+            portfolio_id=portfolio_id,
+            date=date,
+            total_value=total_value,  # V_t
+            weights=weights,  # w_{i,t}
+        )
+        for portfolio_id, date, total_value, weights in rows
+    ]
+    PortfolioValue.objects.bulk_create(values)
+    refresh_portfolio_rollups(portfolios, date_from, date_to, dates)
+    return len(values)
+
+
+# Resúmenes semanales y mensuales de PortfolioValue (PortfolioRollup)
+def refresh_portfolio_rollups(portfolios, date_from=None, date_to=None, dates=None):
+    """
+    Recalcula los períodos que contienen el rango (o las fechas de dates)
+    desde PortfolioValue: una lectura para las dos resoluciones y un borrado
+    y un bulk_create por resolución. Los portafolios virtuales solo se
+    borran (se agrupan al leer).
+    """
+    portfolios = list(portfolios)
+    if dates is not None:
+        if not dates:
+            return 0
+        date_from, date_to = min(dates), max(dates)
+    materialized = [portfolio for portfolio in portfolios if not portfolio.virtual_positions]
+
+    # Períodos completos: el primero y el último pueden tener fechas fuera del rango
+    bounds = {
+        resolution: (
+            period_start(date_from, resolution) if date_from is not None else None,
+            period_end(date_to, resolution) if date_to is not None else None,
+        )
+        for resolution in ROLLUP_RESOLUTIONS
+    }
+    for resolution, (period_from, period_to) in bounds.items():
+        stale = PortfolioRollup.objects.filter(portfolio__in=portfolios, resolution=resolution)
+        if period_from is not None:
+            stale = stale.filter(period_start__gte=period_from)
+        if period_to is not None:
+            stale = stale.filter(period_start__lte=period_to)
+        stale.delete()
+    if not materialized:
+        return 0
+
+    values = PortfolioValue.objects.filter(portfolio__in=materialized)
+    if date_from is not None:
+        values = values.filter(date__gte=min(start for start, _ in bounds.values()))
+    if date_to is not None:
+        values = values.filter(date__lte=max(end for _, end in bounds.values()))
+    rows = list(
+        values.order_by("portfolio_id", "date")
+        .values_list("portfolio_id", "date", "total_value", "weights")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+
+    created = 0
+    for resolution, (period_from, period_to) in bounds.items():
+        rollups = [
+            PortfolioRollup(
+                portfolio_id=portfolio_id,
+                resolution=resolution,
+                period_start=start,
+                date=date,
+                total_value=total_value,
+                high_value=high_value,
+                low_value=low_value,
+                weights=weights,
+            )
+            for portfolio_id, start, date, total_value, high_value, low_value, weights
+            in iter_rollups(
+                (
+                    row for row in rows
+                    if (period_from is None or row[1] >= period_from)
+                    and (period_to is None or row[1] <= period_to)
+                ),
+                resolution,
+            )
+        ]
+        PortfolioRollup.objects.bulk_create(rollups)
+        created += len(rollups)
+    return created
+
+
+def _ignore_progress(**counts):
+    pass
+
 
 # Requisito 2: Función ETL para cargar datos del Excel
 # Esta función lee el Excel y carga todo a la base de datos
+@timed
 @transaction.atomic
-def load_excel_data(excel_file):
+def load_excel_data(
+    excel_file,
+    input_format="xlsx",
+    batch_size=DEFAULT_BATCH_SIZE,
+    weights_file=None,
+    progress=None,
+):
     """
     ETL
     Procesa el archivo Excel y carga todos los datos.
     Se puede llamar desde la web (upload) o desde un comando de management.
+    Los precios se leen por streaming y se escriben en lotes de batch_size.
+    Para CSV/Parquet, excel_file contiene los precios y weights_file los pesos.
+    Si se pasa progress, se llama con los contadores rows_parsed,
+    prices_written y positions_computed a medida que avanza la carga.
+    Precios y pesos se comparan con la base y solo se escriben las
+    diferencias; retorna el resumen con las celdas (asset_id, fecha) afectadas.
     """
+    if progress is None:
+        progress = _ignore_progress
+
     print("INICIANDO CARGA DE DATOS")
-    # Leer las dos hojas del Excel
-    weights_df = pd.read_excel(excel_file, sheet_name="weights")
-    prices_df = pd.read_excel(excel_file, sheet_name="Precios")
+    # Leer la hoja de pesos (pequeña); los precios se leen más abajo por streaming
+    if input_format != "xlsx" and weights_file is None:
+        raise ValueError("Para CSV/Parquet se necesita el archivo de pesos")
+    weights_df = read_weights(
+        weights_file if weights_file is not None else excel_file,
+        input_format
+    )
     
     # Valores fijos según el requerimiento
     start_date = datetime(2022, 2, 15).date()  # t=0
@@ -148,88 +716,102 @@ def load_excel_data(excel_file):
 
     # Paso 3: Cargar los weights iniciales
     # Columna C = Portfolio 1, Columna D = Portfolio 2
-    Weight.objects.filter(portfolio__in=[portfolio1, portfolio2], date=start_date).delete()
-    weights_created = 0
-    
-    
-    for _, row in weights_df.iterrows():
-        asset_name = str(row['activos']).strip()
-        asset = assets[asset_name]
-        
-        weight1 = Decimal(str(row['portafolio 1']))
-        weight2 = Decimal(str(row['portafolio 2']))
-        
-        
+    # Solo se reescriben los pesos del portafolio si cambiaron
+    incoming_weights = {portfolio1: {}, portfolio2: {}}
+    for row in weights_df.to_dict("records"):
+        asset = assets.get(str(row['activos']).strip())
+        if asset is None:
+            continue
+
         # Leer weights de cada columna
-        Weight.objects.update_or_create(
-            portfolio=portfolio1,
-            asset=asset,
-            date=start_date,
-            weight=weight1
+        # Weight.weight guarda 6 decimales, se redondea igual para comparar
+        incoming_weights[portfolio1][asset.id] = Decimal(str(row['portafolio 1'])).quantize(WEIGHT_QUANTUM)
+        incoming_weights[portfolio2][asset.id] = Decimal(str(row['portafolio 2'])).quantize(WEIGHT_QUANTUM)
+
+    # Solo se escriben las celdas (portafolio, activo) que cambiaron:
+    # un INSERT ... ON CONFLICT para nuevas o distintas y un DELETE para las que ya no están
+    weights_changed = {}  # portfolio_id -> activos con peso distinto
+    for portfolio, new_weights in incoming_weights.items():
+        current_weights = dict(
+            Weight.objects
+            .filter(portfolio=portfolio, date=start_date)
+            .values_list("asset_id", "weight")
         )
-        
-        Weight.objects.update_or_create(
-            portfolio=portfolio2,
-            asset=asset,
-            date=start_date,
-            weight=weight2
+        upserts = [
+            Weight(portfolio=portfolio, asset_id=asset_id, date=start_date, weight=weight)
+            for asset_id, weight in new_weights.items()
+            if current_weights.get(asset_id) != weight
+        ]
+        removed = current_weights.keys() - new_weights.keys()
+        if not upserts and not removed:
+            continue
+
+        weights_changed[portfolio.pk] = {w.asset_id for w in upserts} | removed
+        Weight.objects.bulk_create(
+            upserts,
+            update_conflicts=True,
+            unique_fields=["portfolio", "asset", "date"],
+            update_fields=["weight"],
         )
-        weights_created += 2
-        print(f" {weights_created} pesos creados")
+        if removed:
+            Weight.objects.filter(
+                portfolio=portfolio, date=start_date, asset_id__in=removed
+            ).delete()
+        print(f" {len(upserts)} pesos escritos y {len(removed)} borrados para {portfolio.name}")
 
     # Paso 4: Cargar todos los precios históricos
     # Primera columna son fechas, columnas 1-17 son precios de cada activo
-    Price.objects.all().delete()
-    
-    prices_created = 0
+    # Se recorren fila a fila y solo se escribe lo que cambió respecto a la base
+    writer = PriceWriter(batch_size=batch_size)
     dates_processed = 0
-        
-    for idx, row in prices_df.iterrows():
-        date_val = row['Dates']
-        
-        if pd.isna(date_val):
+
+    for row in iter_price_rows(excel_file, input_format, chunk_size=batch_size):
+        date = parse_date(row.get(DATE_COLUMN))
+        if date is None:
             continue
         
-        # Convertir fecha
-        if isinstance(date_val, (datetime, pd.Timestamp)):
-            date = date_val.date()
-        else:
-            try:
-                date = pd.to_datetime(date_val).date()
-            except:
-                continue
-        
         dates_processed += 1
         
         # Para cada activo (columna)
+        prices = {}
         for asset_name, asset in assets.items():
-            # Buscar el precio en la columna correspondiente
-            if asset_name not in row.index:
-                continue
-            
-            price_val = row[asset_name]
-            
-            if pd.isna(price_val):
+            price = parse_price(row.get(asset_name))
+            if price is None:
                 continue
-            
-            Price.objects.create(
-                asset=asset,
-                date=date,
-                price=Decimal(str(price_val))
-            )
-            prices_created += 1
+            prices[asset.id] = price
+        writer.add_row(date, prices)
+        progress(rows_parsed=dates_processed, prices_written=writer.written)
+
+    writer.finish()
+    progress(rows_parsed=dates_processed, prices_written=writer.written)
     
-    print(f" {prices_created} precios creados")
+    print(f" {writer.inserted} precios creados")
+    print(f" {writer.updated} precios actualizados, {writer.deleted} borrados")
     print(f" {dates_processed} fechas procesadas")
+    mark_prices_changed()
+
+    positions_computed = 0
+    rebuild = []
+    for portfolio in (portfolio1, portfolio2):
+        # Si cambiaron los pesos o nunca se calculó, se reconstruye todo;
+        # si no, solo se recalculan las celdas de precio que cambiaron
+        if portfolio.pk in weights_changed or portfolio.computed_until is None:
+            rebuild.append(portfolio)
+        else:
+            positions_computed += recalculate_price_cells(portfolio, writer.changed_cells)
 
-    # Paso 5: Calcular cantidades iniciales (Requisito 3)
-    # Esto calcula c_{i,0} para cada activo en cada portafolio
-    calculate_initial_positions(portfolio1)
-    calculate_initial_positions(portfolio2)
+    # Paso 5 y 6: Cantidades iniciales c_{i,0} (Requisito 3) y posiciones
+    # históricas x_{i,t} (Requisito 4) de todos los portafolios a reconstruir,
+    # con una sola lectura de precios
+    positions_computed += calculate_all_positions(rebuild)
+    progress(positions_computed=positions_computed)
 
-    # Paso 6: Calcular posiciones históricas (Requisito 4)
-    # Esto calcula x_{i,t} y w_{i,t} para todas las fechas
-    calculate_historical_positions(portfolio1)
-    calculate_historical_positions(portfolio2)
-    
-    return True
+    # Resumen de la carga: qué celdas cambiaron respecto a la base
+    return {
+        "prices_inserted": writer.inserted,
+        "prices_updated": writer.updated,
+        "prices_deleted": writer.deleted,
+        "changed_cells": writer.changed_cells,  # {(asset_id, fecha)}
+        "weights_changed": weights_changed,  # {portfolio_id: {asset_id}}
+        "positions_computed": positions_computed,
+    }
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Asset, Price
+from core.services import mark_prices_changed
+
+# Cambios de precios fuera del ETL (admin, shell, borrado de activos)
+# El ETL y los datos sintéticos llaman a mark_prices_changed directamente;
+# bulk_create y los borrados por queryset no disparan señales.
+# Price no tiene receptor de post_delete a propósito: con uno, Django ya no
+# puede borrar por queryset en una sola query y el ETL leería cada fila
+# antes de borrarla. Los precios se borran por el ETL o en cascada con su
+# activo, que sí se registra aquí.
+
+
+@receiver(post_save, sender=Price)
+def price_saved(sender, **kwargs):
+    mark_prices_changed()
+
+
+@receiver(post_delete, sender=Asset)
+def asset_deleted(sender, **kwargs):
+    mark_prices_changed()
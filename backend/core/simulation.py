@@ -0,0 +1,77 @@
+from typing import Dict
+
+import numpy as np
+
+from core.engine import forward_fill, rebalance_mask, simulate_rebalancing
+from core.metrics import timed
+from core.models import Asset, Portfolio
+from core.price_store import get_price_history
+
+# Simulación "qué pasaría si" para pesos y V_0 a elección, sin guardar nada
+# Usa las mismas fórmulas que calculate_initial_positions y
+# calculate_historical_positions (o el rebalanceo de core.engine) sobre la
+# matriz de precios compartida, en float64 y en memoria.
+
+SIMULATION_FREQUENCIES = (
+    Portfolio.REBALANCE_NONE,
+    Portfolio.REBALANCE_DAILY,
+    Portfolio.REBALANCE_MONTHLY,
+    Portfolio.REBALANCE_QUARTERLY,
+)
+
+
+@timed
+def simulate_portfolio(
+    weights: Dict[str, float],
+    initial_value: float,
+    start_date,
+    end_date,
+    rebalance_frequency=Portfolio.REBALANCE_NONE,
+):
+    """
+    Evolución de un portafolio que compra en start_date con V_0 =
+    initial_value y los pesos {símbolo: w_{i,0}}.
+    Retorna (fechas datetime64[D], V_t float64, símbolos, matriz de pesos
+    fechas × activos con NaN donde el activo no tiene precio).
+    Lanza ValueError si algún símbolo no existe o no tiene precio en start_date.
+    """
+    ids = dict(Asset.objects.filter(symbol__in=list(weights)).values_list("symbol", "id"))
+    unknown = sorted(set(weights) - set(ids))
+    if unknown:
+        raise ValueError(f"Activos desconocidos: {', '.join(unknown)}")
+
+    # Mismo orden que la evolución guardada (por asset_id)
+    symbols = sorted(weights, key=ids.get)
+    targets = np.array([float(weights[symbol]) for symbol in symbols])
+    dates, prices = get_price_history([ids[symbol] for symbol in symbols], start_date, end_date)
+    prices = np.asarray(prices, dtype=np.float64)
+
+    # Solo las fechas con algún precio de estos activos, como en Position
+    has_price = ~np.isnan(prices)
+    rows = has_price.any(axis=1)
+    dates, prices, has_price = dates[rows], prices[rows], has_price[rows]
+    if not len(dates) or dates[0] != np.datetime64(start_date, "D"):
+        raise ValueError(f"No hay precios en la fecha inicial {start_date}")
+    missing = [symbol for symbol, present in zip(symbols, has_price[0]) if not present]
+    if missing:
+        raise ValueError(f"Sin precio en {start_date} para: {', '.join(missing)}")
+
+    if rebalance_frequency == Portfolio.REBALANCE_NONE:
+        # c_{i,0} = (w_{i,0} * V_0) / p_{i,0}, constante en el tiempo
+        quantities = targets * initial_value / prices[0]
+    else:
+        quantities = simulate_rebalancing(
+            forward_fill(prices),
+            np.broadcast_to(targets, prices.shape),
+            rebalance_mask(dates, rebalance_frequency),
+            initial_value,
+        )  # c_{i,t}
+
+    values = np.where(has_price, quantities * np.nan_to_num(prices), 0.0)  # x_{i,t}
+    total_value = values.sum(axis=1)  # V_t
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight_matrix = np.where(
+            has_price, values / total_value[:, None], np.nan
+        )  # w_{i,t} = x_{i,t} / V_t
+    weight_matrix[has_price & (total_value[:, None] <= 0)] = 0.0
+    return dates, total_value, symbols, weight_matrix
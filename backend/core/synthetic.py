@@ -0,0 +1,134 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+
+from core.ingestion import DATE_COLUMN, PRICES_SHEET, WEIGHTS_SHEET
+from core.models import Asset, Portfolio, Price, Weight
+from core.services import WEIGHT_QUANTUM, calculate_all_positions, mark_prices_changed
+
+# Datos sintéticos para medir consultas a escala
+# Precios con caminata aleatoria log-normal y pesos aleatorios que suman 1.
+# Los nombres llevan un prefijo para no chocar con los datos reales.
+
+SYNTHETIC_PREFIX = "SYN"
+SYNTHETIC_START = date(2000, 1, 3)
+ETL_START_DATE = date(2022, 2, 15)  # t=0 fijo de load_excel_data
+INSERT_BATCH_SIZE = 10000
+
+
+def random_walk_prices(rng, n_assets, n_dates, start_date=SYNTHETIC_START):
+    """
+    Retorna (fechas, matriz fechas × activos) con
+    p_{i,t} = p_{i,0} * exp(suma de retornos diarios normales).
+    """
+    returns = rng.normal(0.0002, 0.01, size=(n_dates, n_assets))
+    returns[0] = 0.0
+    prices = rng.uniform(10, 500, size=n_assets) * np.exp(np.cumsum(returns, axis=0))
+    dates = [start_date + timedelta(days=t) for t in range(n_dates)]
+    return dates, prices
+
+
+def create_synthetic_dataset(
+    n_assets=17,
+    n_dates=2500,
+    n_portfolios=2,
+    seed=0,
+    start_date=SYNTHETIC_START,
+    prefix=SYNTHETIC_PREFIX,
+):
+    """
+    Crea activos, precios diarios, pesos y posiciones sintéticas.
+    Retorna la lista de portafolios creados.
+    """
+    rng = np.random.default_rng(seed)
+
+    with transaction.atomic():
+        assets = Asset.objects.bulk_create([
+            Asset(name=f"{prefix} Activo {i}", symbol=f"{prefix}{i}")
+            for i in range(n_assets)
+        ])
+        portfolios = Portfolio.objects.bulk_create([
+            Portfolio(
+                name=f"{prefix} Portafolio {k}",
+                initial_value=Decimal("1000000000"),
+                start_date=start_date,
+            )
+            for k in range(n_portfolios)
+        ])
+
+        dates, prices = random_walk_prices(rng, n_assets, n_dates, start_date)
+
+        batch = []
+        for t, day in enumerate(dates):
+            for i, asset in enumerate(assets):
+                batch.append(Price(
+                    asset=asset,
+                    date=day,
+                    price=Decimal(f"{prices[t, i]:.6f}"),
+                ))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                Price.objects.bulk_create(batch)
+                batch = []
+        Price.objects.bulk_create(batch)
+        mark_prices_changed()
+
+        weights = rng.dirichlet(np.ones(n_assets), size=n_portfolios)
+        Weight.objects.bulk_create([
+            Weight(
+                portfolio=portfolio,
+                asset=asset,
+                date=start_date,
+                weight=Decimal(f"{weights[k, i]:.6f}").quantize(WEIGHT_QUANTUM),
+            )
+            for k, portfolio in enumerate(portfolios)
+            for i, asset in enumerate(assets)
+        ])
+
+        calculate_all_positions(portfolios)
+
+    return portfolios
+
+
+def delete_synthetic_dataset(prefix=SYNTHETIC_PREFIX):
+    """
+    Borra los activos y portafolios sintéticos con ese prefijo (en cascada
+    se borran sus precios, pesos y posiciones).
+    """
+    with transaction.atomic():
+        portfolios, _ = Portfolio.objects.filter(name__startswith=f"{prefix} ").delete()
+        # El borrado de activos se lleva sus precios (ver core.signals)
+        assets, _ = Asset.objects.filter(name__startswith=f"{prefix} ").delete()
+    return portfolios + assets
+
+
+def build_synthetic_workbook(n_assets=17, n_dates=2500, seed=0, start_date=ETL_START_DATE):
+    """
+    Arma en memoria un archivo con el formato de datos.xlsx (hojas "weights"
+    y "Precios") para correr load_excel_data sobre datos sintéticos.
+    """
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(seed)
+    dates, prices = random_walk_prices(rng, n_assets, n_dates, start_date)
+    weights = rng.dirichlet(np.ones(n_assets), size=2)
+    names = [f"{SYNTHETIC_PREFIX} Activo {i}" for i in range(n_assets)]
+
+    # write_only escribe fila por fila sin armar la hoja en memoria
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(WEIGHTS_SHEET)
+    sheet.append(["activos", "portafolio 1", "portafolio 2"])
+    for i, name in enumerate(names):
+        sheet.append([name, round(weights[0, i], 6), round(weights[1, i], 6)])
+
+    sheet = workbook.create_sheet(PRICES_SHEET)
+    sheet.append([DATE_COLUMN] + names)
+    for t, day in enumerate(dates):
+        sheet.append([day] + [round(p, 6) for p in prices[t]])
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
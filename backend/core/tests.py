@@ -1,3 +1,1548 @@
-from django.test import TestCase
+import importlib
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.analytics import max_drawdown, rolling_volatility
+from core.api.renderers import HAS_PYARROW
+from core.cache import (
+    EVOLUTION_CACHE, bump_dataset_version, get_cached_portfolio_weights_and_value, get_dataset_version,
+)
+from core.engine import (
+    bootstrap_returns, parametric_returns, rebalance_mask, simulate_rebalancing, simulate_scenarios,
+)
+from core.jobs import claim_next_job, run_etl_job
+from core.metrics import HISTOGRAMS, Histogram, render_prometheus
+from core.models import (
+    Asset, ETLJob, Portfolio, PortfolioRollup, PortfolioValue, Price, Weight, Position,
+)
+from core.price_store import get_price_history, get_price_store, is_current, write_price_store
+from core import scenarios
+from core.scenarios import run_scenarios
+from core.selectors import (
+    count_portfolio_dates,
+    get_portfolio_values,
+    get_portfolio_weights_and_value,
+)
+from core.services import (
+    calculate_all_positions,
+    calculate_initial_positions,
+    calculate_historical_positions,
+    load_excel_data,
+    recalculate_price_cells,
+)
+from core.synthetic import create_synthetic_dataset, delete_synthetic_dataset
+
+
+def create_dataset(n_assets=3, n_dates=5, start_date=date(2022, 2, 15)):
+    """
+    Crea un universo pequeño de activos, precios y un portafolio con pesos iguales.
+    """
+    assets = [
+        Asset.objects.create(name=f"Activo {i}", symbol=f"A{i}")
+        for i in range(n_assets)
+    ]
+    portfolio = Portfolio.objects.create(
+        name="Portfolio Test",
+        initial_value=Decimal("1000000"),
+        start_date=start_date,
+    )
+    Price.objects.bulk_create([
+        Price(
+            asset=asset,
+            date=start_date + timedelta(days=t),
+            price=Decimal(10 + i) + Decimal(t) / Decimal(10),
+        )
+        for t in range(n_dates)
+        for i, asset in enumerate(assets)
+    ])
+    Weight.objects.bulk_create([
+        Weight(
+            portfolio=portfolio,
+            asset=asset,
+            date=start_date,
+            weight=(Decimal(1) / Decimal(n_assets)).quantize(Decimal("0.000001")),
+        )
+        for asset in assets
+    ])
+    return assets, portfolio
+
+
+class HistoricalPositionsTests(TestCase):
+
+    def test_values_follow_prices_with_constant_quantities(self):
+        assets, portfolio = create_dataset()
+        calculate_initial_positions(portfolio)
+        calculate_historical_positions(portfolio)
+
+        self.assertEqual(Position.objects.filter(portfolio=portfolio).count(), 15)
+        for position in Position.objects.filter(portfolio=portfolio):
+            initial = Position.objects.get(
+                portfolio=portfolio,
+                asset=position.asset,
+                date=portfolio.start_date,
+            )
+            price = Price.objects.get(asset=position.asset, date=position.date)
+            self.assertEqual(position.quantity, initial.quantity)
+            self.assertAlmostEqual(
+                position.value_at_date,
+                initial.quantity * price.price,
+                places=3,
+            )
+
+    def test_query_count_does_not_grow_with_dates(self):
+        counts = []
+        for n_dates in (5, 60):
+            Portfolio.objects.all().delete()
+            Asset.objects.all().delete()
+            _, portfolio = create_dataset(n_dates=n_dates)
+            calculate_initial_positions(portfolio)
+            with CaptureQueriesContext(connection) as queries:
+                calculate_historical_positions(portfolio)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+def build_workbook(n_dates=4, start_date=date(2022, 2, 15), aaa_prices=None):
+    """
+    Arma en memoria un datos.xlsx mínimo con las hojas "weights" y "Precios".
+    """
+    from io import BytesIO
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    weights = workbook.active
+    weights.title = "weights"
+    weights.append(["activos", "portafolio 1", "portafolio 2"])
+    weights.append(["AAA", 0.6, 0.3])
+    weights.append(["BBB", 0.4, 0.7])
+
+    prices = workbook.create_sheet("Precios")
+    prices.append(["Dates", "AAA", "BBB"])
+    for t in range(n_dates):
+        day = start_date + timedelta(days=t)
+        aaa = (aaa_prices or {}).get(t, 100 + t)
+        prices.append([day, aaa, 50 - t if t != 2 else None])
+
+    buffer = BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class LoadExcelDataTests(TestCase):
+
+    def test_loads_prices_in_batches(self):
+        load_excel_data(build_workbook(), batch_size=2)
+
+        self.assertEqual(Asset.objects.count(), 2)
+        self.assertEqual(Weight.objects.count(), 4)
+        # 4 fechas × 2 activos menos la celda vacía
+        self.assertEqual(Price.objects.count(), 7)
+        self.assertEqual(
+            Price.objects.get(asset__name="AAA", date=date(2022, 2, 18)).price,
+            Decimal("103"),
+        )
+        self.assertEqual(
+            Position.objects.filter(portfolio__name="Portfolio 1").count(),
+            7,
+        )
+
+
+class IncrementalRecomputeTests(TestCase):
+
+    def test_appended_dates_only_compute_new_positions(self):
+        load_excel_data(build_workbook(n_dates=4))
+        portfolio = Portfolio.objects.get(name="Portfolio 1")
+        self.assertEqual(portfolio.computed_until, date(2022, 2, 18))
+        existing_ids = set(
+            Position.objects.filter(portfolio=portfolio).values_list("id", flat=True)
+        )
+
+        load_excel_data(build_workbook(n_dates=5))
+
+        portfolio.refresh_from_db()
+        self.assertEqual(portfolio.computed_until, date(2022, 2, 19))
+        positions = Position.objects.filter(portfolio=portfolio)
+        self.assertEqual(positions.count(), 9)
+        # Las posiciones anteriores no se reescribieron
+        self.assertTrue(existing_ids <= set(positions.values_list("id", flat=True)))
+
+    def test_changed_prices_only_recompute_affected_cells(self):
+        load_excel_data(build_workbook(n_dates=4))
+        aaa = Asset.objects.get(name="AAA")
+        before = {
+            (p.portfolio_id, p.asset_id, p.date): (p.id, p.value_at_date)
+            for p in Position.objects.all()
+        }
+
+        report = load_excel_data(build_workbook(n_dates=4, aaa_prices={1: 120, 3: None}))
+
+        changed = {(aaa.id, date(2022, 2, 16)), (aaa.id, date(2022, 2, 18))}
+        self.assertEqual(report["changed_cells"], changed)
+        self.assertEqual((report["prices_updated"], report["prices_deleted"]), (1, 1))
+        self.assertEqual(report["weights_changed"], {})
+        after = {
+            (p.portfolio_id, p.asset_id, p.date): (p.id, p.value_at_date)
+            for p in Position.objects.all()
+        }
+        # Solo cambian las celdas afectadas; el resto conserva fila y valor
+        self.assertEqual(
+            {key for key in before if before[key] != after.get(key)},
+            {key for key in before if key[1:] in changed},
+        )
+        for portfolio in Portfolio.objects.all():
+            position = Position.objects.get(portfolio=portfolio, asset=aaa, date=date(2022, 2, 16))
+            self.assertAlmostEqual(position.value_at_date, position.quantity * Decimal("120"), places=3)
+            self.assertFalse(
+                Position.objects.filter(portfolio=portfolio, asset=aaa, date=date(2022, 2, 18)).exists()
+            )
+            value = PortfolioValue.objects.get(portfolio=portfolio, date=date(2022, 2, 16))
+            self.assertAlmostEqual(
+                value.total_value,
+                sum(Position.objects.filter(portfolio=portfolio, date=date(2022, 2, 16))
+                    .values_list("value_at_date", flat=True)),
+                places=3,
+            )
+
+    def test_changed_price_before_start_date_is_recomputed(self):
+        # t=0 es el 14/02, un día antes de start_date
+        load_excel_data(build_workbook(n_dates=4, start_date=date(2022, 2, 14)))
+        aaa = Asset.objects.get(name="AAA")
+
+        report = load_excel_data(
+            build_workbook(n_dates=4, start_date=date(2022, 2, 14), aaa_prices={0: 10})
+        )
+
+        self.assertEqual(report["changed_cells"], {(aaa.id, date(2022, 2, 14))})
+        for portfolio in Portfolio.objects.all():
+            position = Position.objects.get(portfolio=portfolio, asset=aaa, date=date(2022, 2, 14))
+            self.assertAlmostEqual(position.value_at_date, position.quantity * Decimal("10"), places=3)
+            value = PortfolioValue.objects.get(portfolio=portfolio, date=date(2022, 2, 14))
+            self.assertAlmostEqual(
+                value.total_value,
+                sum(Position.objects.filter(portfolio=portfolio, date=date(2022, 2, 14))
+                    .values_list("value_at_date", flat=True)),
+                places=3,
+            )
+
+    def test_unchanged_file_writes_nothing(self):
+        load_excel_data(build_workbook(n_dates=4))
+
+        report = load_excel_data(build_workbook(n_dates=4))
+
+        self.assertEqual(report["changed_cells"], set())
+        self.assertEqual(report["positions_computed"], 0)
+
+
+class PortfolioWeightsAndValueTests(TestCase):
+
+    def setUp(self):
+        self.assets, self.portfolio = create_dataset(n_dates=40)
+        calculate_initial_positions(self.portfolio)
+        calculate_historical_positions(self.portfolio)
+
+    def test_output_shape(self):
+        start = self.portfolio.start_date
+        data = get_portfolio_weights_and_value(
+            self.portfolio, start, start + timedelta(days=1)
+        )
+
+        self.assertEqual([item["date"] for item in data], ["2022-02-15", "2022-02-16"])
+        self.assertAlmostEqual(data[0]["total_value"], 1000000, delta=10)
+        self.assertEqual([w["asset"] for w in data[0]["weights"]], ["A0", "A1", "A2"])
+        for item in data:
+            self.assertAlmostEqual(sum(w["weight"] for w in item["weights"]), 1.0)
+
+    def test_query_count_is_constant_for_any_range(self):
+        start = self.portfolio.start_date
+        for days in (1, 10, 39):
+            with self.assertNumQueries(1):
+                data = get_portfolio_weights_and_value(
+                    self.portfolio, start, start + timedelta(days=days)
+                )
+            self.assertEqual(len(data), days + 1)
+
+
+class EvolutionCacheTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, self.portfolio = create_dataset(n_dates=5)
+        calculate_initial_positions(self.portfolio)
+        calculate_historical_positions(self.portfolio)
+        self.start = self.portfolio.start_date
+        self.end = self.start + timedelta(days=4)
+
+    def test_repeated_range_is_served_from_cache(self):
+        first = get_cached_portfolio_weights_and_value(self.portfolio, self.start, self.end)
+        with self.assertNumQueries(1):  # solo la versión de datos
+            second = get_cached_portfolio_weights_and_value(self.portfolio, self.start, self.end)
+        self.assertEqual(first, second)
+
+    def test_recompute_invalidates_cached_results(self):
+        get_cached_portfolio_weights_and_value(self.portfolio, self.start, self.end)
+        Price.objects.filter(date=self.end).update(price=Decimal("1000"))
+        calculate_historical_positions(self.portfolio)
+
+        data = get_cached_portfolio_weights_and_value(self.portfolio, self.start, self.end)
+        self.assertEqual(data, get_portfolio_weights_and_value(self.portfolio, self.start, self.end))
+        self.assertGreater(data[-1]["total_value"], data[0]["total_value"] * 10)
+
+
+class PriceStoreTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(PRICE_STORE_DIR=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_slice_matches_price_table(self):
+        assets, portfolio = create_dataset(n_dates=10)
+        Price.objects.filter(asset=assets[1], date=portfolio.start_date).delete()
+        write_price_store(version=1)
+
+        start = portfolio.start_date + timedelta(days=2)
+        dates, matrix = get_price_history(
+            [assets[2].id, assets[0].id], start, start + timedelta(days=3)
+        )
+
+        self.assertEqual(matrix.shape, (4, 2))
+        self.assertEqual(str(dates[0]), start.isoformat())
+        self.assertEqual(
+            matrix[1, 0],
+            float(Price.objects.get(asset=assets[2], date=start + timedelta(days=1)).price),
+        )
+        store = get_price_store()
+        self.assertTrue(np.isnan(store.prices[0, store.columns([assets[1].id])[0]]))
+
+    def test_stale_store_falls_back_to_price_table(self):
+        assets, portfolio = create_dataset(n_dates=5)
+        bump_dataset_version(prices=True)
+        write_price_store(get_dataset_version())
+        # Un recálculo de posiciones no deja vieja la matriz
+        bump_dataset_version()
+        with self.assertNumQueries(1):  # solo la versión de precios
+            get_price_history([assets[0].id])
+
+        # ETL confirmado pero la matriz todavía no se reescribió
+        Price.objects.filter(asset=assets[0]).update(price=Decimal("7"))
+        bump_dataset_version(prices=True)
+        _, matrix = get_price_history([assets[0].id])
+        self.assertTrue((matrix == 7).all())
+
+        write_price_store(get_dataset_version())
+        with self.assertNumQueries(1):
+            _, matrix = get_price_history([assets[0].id])
+        self.assertTrue((matrix == 7).all())
+
+    def test_price_changes_outside_the_etl_refresh_the_store(self):
+        assets, portfolio = create_dataset(n_dates=5)
+        write_price_store(get_dataset_version())
+
+        # save() de un precio (admin, shell)
+        with self.captureOnCommitCallbacks(execute=True):
+            Price.objects.create(asset=assets[0], date=date(2022, 3, 1), price=Decimal("9"))
+        dates, _ = get_price_history([assets[0].id])
+        self.assertEqual(str(dates[-1]), "2022-03-01")
+
+        # Datos sintéticos: se crean y se borran con sus precios
+        with self.captureOnCommitCallbacks(execute=True):
+            create_synthetic_dataset(n_assets=2, n_dates=3, n_portfolios=1)
+        synthetic = list(Asset.objects.filter(name__startswith="SYN ").values_list("id", flat=True))
+        _, matrix = get_price_history(synthetic, date(2000, 1, 3), date(2000, 1, 5))
+        self.assertEqual(matrix.shape, (3, 2))
+        self.assertFalse(np.isnan(matrix).any())
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            delete_synthetic_dataset()
+        self.assertEqual(len(callbacks), 2)  # uno por activo; solo el primero escribe
+        store = get_price_store()
+        self.assertTrue(is_current(store))
+        self.assertTrue((store.columns(synthetic) == -1).all())
+
+
+class EvolutionStreamingTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, self.portfolio = create_dataset(n_dates=30)
+        calculate_initial_positions(self.portfolio)
+        calculate_historical_positions(self.portfolio)
+        self.url = f"/api/portfolios/{self.portfolio.pk}/evolution/"
+        self.payload = {"start_date": "2022-02-15", "end_date": "2022-03-31"}
+
+    def test_stream_returns_one_json_line_per_date(self):
+        response = self.client.post(
+            self.url, {**self.payload, "stream": True}, content_type="application/json"
+        )
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            get_portfolio_weights_and_value(
+                self.portfolio, date(2022, 2, 15), date(2022, 3, 31)
+            ),
+        )
+
+    def test_stream_honors_values_only(self):
+        for extra in ({}, {"max_points": 10}):
+            response = self.client.post(
+                self.url, {**self.payload, "stream": True, "values_only": True, **extra},
+                content_type="application/json",
+            )
+            lines = b"".join(response.streaming_content).decode().splitlines()
+            plain = self.client.post(
+                self.url, {**self.payload, "values_only": True, **extra},
+                content_type="application/json",
+            ).json()["data"]
+            self.assertEqual([json.loads(line) for line in lines], plain)
+            self.assertEqual(set(plain[0]), {"date", "total_value"})
+
+    def test_max_points_averages_buckets(self):
+        response = self.client.post(
+            self.url, {**self.payload, "max_points": 10}, content_type="application/json"
+        )
+        data = response.json()["data"]
+        full = get_portfolio_weights_and_value(
+            self.portfolio, date(2022, 2, 15), date(2022, 3, 31)
+        )
+
+        self.assertEqual(len(data), 10)
+        self.assertEqual(data[0]["date"], full[2]["date"])
+        self.assertAlmostEqual(
+            data[0]["total_value"],
+            sum(item["total_value"] for item in full[:3]) / 3,
+        )
+        self.assertAlmostEqual(sum(w["weight"] for w in data[0]["weights"]), 1.0)
+
+
+class ETLJobTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_upload_is_queued_and_processed_by_worker(self):
+        upload = SimpleUploadedFile("datos.xlsx", build_workbook().read())
+        response = self.client.post("/api/etl-jobs/", {"file": upload})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], ETLJob.STATUS_PENDING)
+        self.assertFalse(Price.objects.exists())
+
+        job = claim_next_job()
+        self.assertEqual(job.status, ETLJob.STATUS_RUNNING)
+        self.assertIsNone(claim_next_job())
+        run_etl_job(job)
+
+        data = self.client.get(f"/api/etl-jobs/{job.pk}/").json()
+        self.assertEqual(data["status"], ETLJob.STATUS_DONE)
+        self.assertEqual(data["rows_parsed"], 4)
+        self.assertEqual(data["prices_written"], 7)
+        self.assertEqual(data["positions_computed"], 14)
+
+    def test_job_of_a_dead_worker_is_reclaimed(self):
+        job = ETLJob.objects.create(file=SimpleUploadedFile("datos.xlsx", build_workbook().read()))
+        self.assertEqual(claim_next_job().pk, job.pk)
+        # El worker sigue latiendo: nadie más lo toma
+        self.assertIsNone(claim_next_job())
+
+        # El worker murió: sin latido desde hace más que el lease
+        ETLJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        self.assertIsNone(claim_next_job(lease=timedelta(minutes=10)))
+        reclaimed = claim_next_job(lease=timedelta(minutes=1))
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertIsNone(claim_next_job(lease=timedelta(minutes=1)))
+
+        self.assertEqual(run_etl_job(reclaimed).status, ETLJob.STATUS_DONE)
+        self.assertEqual(Price.objects.count(), 7)
+
+    def test_csv_upload_needs_weights_file(self):
+        prices = "Dates,AAA,BBB\n2022-02-15,100,50\n2022-02-16,101,49\n"
+        weights = "activos,portafolio 1,portafolio 2\nAAA,0.6,0.3\nBBB,0.4,0.7\n"
+
+        response = self.client.post(
+            "/api/etl-jobs/", {"file": SimpleUploadedFile("precios.csv", prices.encode())}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("weights", response.json())
+        self.assertFalse(ETLJob.objects.exists())
+
+        response = self.client.post("/api/etl-jobs/", {
+            "file": SimpleUploadedFile("precios.csv", prices.encode()),
+            "weights": SimpleUploadedFile("pesos.csv", weights.encode()),
+        })
+        self.assertEqual(response.status_code, 202)
+        job = run_etl_job(claim_next_job())
+
+        self.assertEqual(job.status, ETLJob.STATUS_DONE, job.error)
+        self.assertEqual(Price.objects.count(), 4)
+        self.assertEqual(Weight.objects.count(), 4)
+
+
+class RebalancingTests(TestCase):
+
+    def test_engine_matches_day_by_day_simulation(self):
+        rng = np.random.default_rng(7)
+        dates = np.arange("2022-01-03", "2022-07-01", dtype="datetime64[D]")
+        prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, (len(dates), 4)), axis=0)
+        targets = np.tile([0.1, 0.2, 0.3, 0.4], (len(dates), 1))
+        rebalance = rebalance_mask(dates, "monthly")
+
+        quantities = simulate_rebalancing(prices, targets, rebalance, 1000.0)
+
+        expected = targets[0] * 1000.0 / prices[0]
+        for t in range(len(dates)):
+            if rebalance[t]:
+                value = expected @ prices[t]
+                expected = targets[t] * value / prices[t]
+            np.testing.assert_allclose(quantities[t], expected)
+        self.assertEqual(int(rebalance.sum()), 6)
+
+    def test_rebalances_on_each_dated_weight(self):
+        assets, portfolio = create_dataset(n_assets=2, n_dates=10)
+        portfolio.rebalance_frequency = Portfolio.REBALANCE_WEIGHTS
+        portfolio.save()
+        switch_date = portfolio.start_date + timedelta(days=5)
+        Weight.objects.bulk_create([
+            Weight(portfolio=portfolio, asset=assets[0], date=switch_date, weight=Decimal("1")),
+            Weight(portfolio=portfolio, asset=assets[1], date=switch_date, weight=Decimal("0")),
+        ])
+
+        calculate_historical_positions(portfolio)
+
+        data = get_portfolio_weights_and_value(
+            portfolio, portfolio.start_date, portfolio.start_date + timedelta(days=9)
+        )
+        self.assertEqual(len(data), 10)
+        self.assertAlmostEqual(data[0]["weights"][0]["weight"], 0.5, places=5)
+        self.assertAlmostEqual(data[5]["weights"][0]["weight"], 1.0, places=5)
+        # Rebalancear no cambia V_t: el día del cambio vale lo mismo que con las cantidades previas
+        before = Position.objects.filter(
+            portfolio=portfolio, date=switch_date - timedelta(days=1)
+        )
+        value_before = sum(
+            p.quantity * Price.objects.get(asset=p.asset, date=switch_date).price
+            for p in before
+        )
+        self.assertAlmostEqual(data[5]["total_value"], float(value_before), places=2)
+
+
+class BatchPositionsTests(TestCase):
+
+    def create_portfolios(self, assets, n_portfolios, prefix="Batch"):
+        portfolios = []
+        for k in range(n_portfolios):
+            portfolio = Portfolio.objects.create(
+                name=f"{prefix} {k}",
+                initial_value=Decimal("500000"),
+                start_date=date(2022, 2, 15) + timedelta(days=k % 3),
+            )
+            Weight.objects.bulk_create([
+                Weight(
+                    portfolio=portfolio,
+                    asset=asset,
+                    date=portfolio.start_date,
+                    weight=Decimal("0.2") if i else Decimal("0.6"),
+                )
+                for i, asset in enumerate(assets)
+            ])
+            portfolios.append(portfolio)
+        return portfolios
+
+    def test_matches_per_portfolio_calculation(self):
+        assets, reference = create_dataset(n_dates=8)
+        portfolios = self.create_portfolios(assets, 3)
+
+        calculate_all_positions([reference, *portfolios])
+        batch = {
+            (p.portfolio_id, p.asset_id, p.date): (p.quantity, p.value_at_date)
+            for p in Position.objects.all()
+        }
+
+        Position.objects.all().delete()
+        for portfolio in [reference, *portfolios]:
+            calculate_initial_positions(portfolio)
+            calculate_historical_positions(portfolio)
+        single = {
+            (p.portfolio_id, p.asset_id, p.date): (p.quantity, p.value_at_date)
+            for p in Position.objects.all()
+        }
+
+        self.assertEqual(batch, single)
+        self.assertEqual(
+            Portfolio.objects.get(pk=portfolios[2].pk).computed_until,
+            date(2022, 2, 22),
+        )
+
+    def test_price_reads_do_not_grow_with_portfolio_count(self):
+        assets, _ = create_dataset(n_dates=8)
+        few = self.create_portfolios(assets, 2)
+        with CaptureQueriesContext(connection) as queries:
+            calculate_all_positions(few)
+        price_reads = [q for q in queries if "core_price" in q["sql"]]
+
+        many = self.create_portfolios(assets, 8, prefix="Extra")
+        with CaptureQueriesContext(connection) as queries:
+            calculate_all_positions(few + many)
+
+        self.assertEqual(len(price_reads), 1)
+        self.assertEqual(len([q for q in queries if "core_price" in q["sql"]]), 1)
+
+    def test_weights_without_prices(self):
+        _, portfolio = create_dataset(n_dates=3)
+        calculate_all_positions([portfolio])
+        Price.objects.all().delete()
+
+        self.assertEqual(calculate_all_positions([portfolio]), 0)
+
+        portfolio.refresh_from_db()
+        self.assertIsNone(portfolio.computed_until)
+        self.assertFalse(Position.objects.filter(portfolio=portfolio).exists())
+        self.assertFalse(PortfolioValue.objects.filter(portfolio=portfolio).exists())
+
+
+class PortfolioValueTests(TestCase):
+
+    def setUp(self):
+        self.assets, self.portfolio = create_dataset(n_dates=6)
+        calculate_initial_positions(self.portfolio)
+        calculate_historical_positions(self.portfolio)
+
+    def test_values_match_positions(self):
+        for value in PortfolioValue.objects.filter(portfolio=self.portfolio):
+            total = sum(
+                p.value_at_date
+                for p in Position.objects.filter(portfolio=self.portfolio, date=value.date)
+            )
+            self.assertAlmostEqual(value.total_value, total, places=3)
+        self.assertEqual(PortfolioValue.objects.filter(portfolio=self.portfolio).count(), 6)
+        call_command("rebuild_portfolio_values", "--verify", stdout=StringIO())
+
+    def test_values_only_reads_one_row_per_day(self):
+        start = self.portfolio.start_date
+        with self.assertNumQueries(1):
+            values = get_portfolio_values(self.portfolio, start, start + timedelta(days=5))
+        self.assertEqual(len(values), 6)
+        self.assertEqual(set(values[0]), {"date", "total_value"})
+
+    def test_verify_reports_drift(self):
+        PortfolioValue.objects.filter(portfolio=self.portfolio).first().delete()
+        with self.assertRaises(CommandError):
+            call_command("rebuild_portfolio_values", "--verify", stdout=StringIO())
+
+        call_command("rebuild_portfolio_values", stdout=StringIO())
+        call_command("rebuild_portfolio_values", "--verify", stdout=StringIO())
+
+    def test_calculations_build_values_without_reading_positions(self):
+        # V_t y w_{i,t} salen de la matriz en memoria, sin la ventana sobre Position
+        for mode in ("decimal", "float"):
+            with CaptureQueriesContext(connection) as queries:
+                calculate_all_positions([self.portfolio], mode=mode)
+                calculate_historical_positions(self.portfolio, mode=mode)
+            self.assertFalse([q["sql"] for q in queries if "OVER" in q["sql"].upper()])
+            call_command("rebuild_portfolio_values", "--verify", stdout=StringIO())
+
+        Portfolio.objects.filter(pk=self.portfolio.pk).update(
+            rebalance_frequency=Portfolio.REBALANCE_MONTHLY
+        )
+        self.portfolio.refresh_from_db()
+        with CaptureQueriesContext(connection) as queries:
+            calculate_all_positions([self.portfolio])
+        self.assertFalse([q["sql"] for q in queries if "OVER" in q["sql"].upper()])
+        self.assertEqual(PortfolioValue.objects.filter(portfolio=self.portfolio).count(), 6)
+        call_command("rebuild_portfolio_values", "--verify", stdout=StringIO())
+
+    def test_migration_backfills_existing_positions(self):
+        # Base que ya tenía Position antes de PortfolioValue y PortfolioRollup
+        PortfolioValue.objects.all().delete()
+        PortfolioRollup.objects.all().delete()
+        migration = importlib.import_module("core.migrations.0012_backfill_portfolio_values")
+
+        migration.backfill_portfolio_values(None, None)
+
+        self.assertEqual(PortfolioValue.objects.filter(portfolio=self.portfolio).count(), 6)
+        self.assertTrue(PortfolioRollup.objects.filter(portfolio=self.portfolio).exists())
+        call_command("rebuild_portfolio_values", "--verify", stdout=StringIO())
+
+
+class ExplainQueriesTests(TestCase):
+
+    def test_runs_on_synthetic_data_and_rolls_back(self):
+        out = StringIO()
+        call_command(
+            "explain_queries", assets=3, dates=40, portfolios=1, repeat=1, stdout=out
+        )
+        self.assertIn("position_portfolio_date_idx", out.getvalue())
+        self.assertFalse(Price.objects.exists())
+        self.assertFalse(Portfolio.objects.exists())
+        # Los índices quedan como estaban después del rollback
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Position._meta.db_table)
+        self.assertIn("position_portfolio_date_idx", indexes)
+
+    def test_refuses_database_with_data(self):
+        create_dataset(n_dates=3)
+
+        with self.assertRaises(CommandError):
+            call_command("explain_queries", assets=3, dates=40, repeat=1, stdout=StringIO())
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Position._meta.db_table)
+        self.assertIn("position_portfolio_date_idx", indexes)
+
+
+class BenchmarkCommandsTests(TestCase):
+
+    def test_generate_synthetic_data(self):
+        call_command(
+            "generate_synthetic_data", assets=4, dates=10, portfolios=3, stdout=StringIO()
+        )
+        self.assertEqual(Price.objects.count(), 40)
+        self.assertEqual(Portfolio.objects.count(), 3)
+        self.assertEqual(PortfolioValue.objects.count(), 30)
+
+        call_command(
+            "generate_synthetic_data", "--replace", assets=2, dates=5, portfolios=1,
+            stdout=StringIO()
+        )
+        self.assertEqual(Price.objects.count(), 10)
+
+    def test_benchmark_emits_json_and_rolls_back(self):
+        out, err = StringIO(), StringIO()
+        call_command("benchmark", sizes=["3x20x2"], repeat=1, stdout=out, stderr=err)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            [result["step"] for result in report["results"]],
+            [
+                "load_excel_data",
+                "calculate_historical_positions",
+                "calculate_all_positions",
+                "get_portfolio_weights_and_value",
+            ],
+        )
+        for result in report["results"]:
+            self.assertGreater(result["queries"], 0)
+            self.assertGreater(result["peak_mb"], 0)
+        self.assertFalse(Price.objects.exists())
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, self.portfolio = create_dataset()
+        calculate_initial_positions(self.portfolio)
+        calculate_historical_positions(self.portfolio)
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.post(
+            f"/api/portfolios/{self.portfolio.pk}/evolution/",
+            {"start_date": "2022-02-15", "end_date": "2022-02-19"},
+            content_type="application/json",
+        )
+        timing = response["Server-Timing"]
+        self.assertIn("queries", timing)
+        self.assertIn("selectors.get_portfolio_weights_and_value;dur=", timing)
+        self.assertIn("render;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+        text = self.client.get("/metrics").content.decode()
+        self.assertIn(
+            'portfolio_http_request_duration_seconds_count'
+            '{view="api/portfolios/<int:pk>/evolution/",method="POST",status="200"} 1',
+            text,
+        )
+        self.assertIn('portfolio_function_duration_seconds_count{function="services.calculate_historical_positions"} 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("h", "test", ("view",), buckets=(1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value, view="v")
+        text = render_prometheus([histogram])
+        self.assertIn('h_bucket{view="v",le="1"} 2', text)
+        self.assertIn('h_bucket{view="v",le="5"} 3', text)
+        self.assertIn('h_bucket{view="v",le="+Inf"} 4', text)
+        self.assertIn('h_sum{view="v"} 14.5', text)
+
+
+class PortfolioAnalyticsTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(PRICE_STORE_DIR=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.assets, self.portfolio = create_dataset(n_dates=30)
+        calculate_initial_positions(self.portfolio)
+        calculate_historical_positions(self.portfolio)
+        self.url = f"/api/portfolios/{self.portfolio.pk}/analytics/"
+        self.payload = {"start_date": "2022-02-15", "end_date": "2022-03-31", "volatility_window": 5}
+
+    def test_metrics_match_value_series(self):
+        data = self.client.post(self.url, self.payload, content_type="application/json").json()
+        values = np.array([
+            item["total_value"]
+            for item in get_portfolio_weights_and_value(
+                self.portfolio, date(2022, 2, 15), date(2022, 3, 31)
+            )
+        ])
+        returns = values[1:] / values[:-1] - 1
+
+        self.assertEqual(data["observations"], 30)
+        self.assertAlmostEqual(data["cumulative_return"], values[-1] / values[0] - 1)
+        self.assertEqual(data["max_drawdown"]["value"], 0.0)  # precios siempre suben
+        self.assertEqual(len(data["rolling_volatility"]["data"]), 29 - 5 + 1)
+        # En buy and hold, sum_i w_{i,t-1} r_{i,t} es el retorno diario del portafolio
+        self.assertAlmostEqual(
+            sum(item["contribution"] for item in data["contributions"]),
+            returns.sum(),
+            places=6,
+        )
+
+    def test_results_are_cached_per_dataset_version(self):
+        self.client.post(self.url, self.payload, content_type="application/json")
+        with self.assertNumQueries(2):  # el portafolio y la versión de datos
+            self.client.post(self.url, self.payload, content_type="application/json")
+
+    def test_drawdown_and_rolling_volatility(self):
+        drawdown, peak, trough = max_drawdown(np.array([100.0, 120.0, 90.0, 130.0, 117.0]))
+        self.assertAlmostEqual(drawdown, -0.25)
+        self.assertEqual((peak, trough), (1, 2))
+
+        returns = np.array([0.01, -0.02, 0.03, 0.0])
+        rolling = rolling_volatility(returns, 3)
+        self.assertEqual(len(rolling), 2)
+        self.assertAlmostEqual(rolling[0], returns[:3].std(ddof=1) * np.sqrt(252))
+
+
+class ComputeModeTests(TestCase):
+
+    def test_float_mode_matches_decimal_within_tolerance(self):
+        assets, portfolio = create_dataset(n_dates=10)
+        calculate_all_positions([portfolio], mode="decimal")
+        exact = {
+            (asset_id, day): value
+            for asset_id, day, value in Position.objects.filter(portfolio=portfolio)
+            .values_list("asset_id", "date", "value_at_date")
+        }
+
+        calculate_all_positions([portfolio], mode="float")
+        for position in Position.objects.filter(portfolio=portfolio):
+            self.assertAlmostEqual(
+                float(position.value_at_date),
+                float(exact[(position.asset_id, position.date)]),
+                places=3,
+            )
+
+        out = StringIO()
+        call_command("verify_compute_mode", stdout=out)
+        self.assertIn("dentro de la tolerancia", out.getvalue())
+
+    @override_settings(POSITION_COMPUTE_MODE="float")
+    def test_historical_positions_in_float_mode(self):
+        assets, portfolio = create_dataset()
+        calculate_initial_positions(portfolio)
+        calculate_historical_positions(portfolio)
+
+        self.assertEqual(Position.objects.filter(portfolio=portfolio).count(), 15)
+        value = PortfolioValue.objects.get(portfolio=portfolio, date=date(2022, 2, 19))
+        expected = sum(
+            p.quantity * Price.objects.get(asset=p.asset, date=p.date).price
+            for p in Position.objects.filter(portfolio=portfolio, date=date(2022, 2, 19))
+        )
+        self.assertAlmostEqual(float(value.total_value), float(expected), places=3)
+
+    def test_unknown_mode_is_rejected(self):
+        assets, portfolio = create_dataset()
+        with self.assertRaises(ValueError):
+            calculate_all_positions([portfolio], mode="half")
+
+
+class ColumnarEvolutionTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, self.portfolio = create_dataset(n_assets=5, n_dates=60)
+        calculate_initial_positions(self.portfolio)
+        calculate_historical_positions(self.portfolio)
+        self.url = f"/api/portfolios/{self.portfolio.pk}/evolution/"
+        self.payload = {"start_date": "2022-02-15", "end_date": "2022-04-30"}
+
+    def post(self, accept, **extra):
+        return self.client.post(
+            self.url, {**self.payload, **extra},
+            content_type="application/json", HTTP_ACCEPT=accept,
+        )
+
+    def test_columnar_json_matches_nested_json(self):
+        nested = self.post("application/json")
+        columnar = self.post("application/vnd.portfolio.columnar+json")
+
+        self.assertEqual(columnar["Content-Type"], "application/vnd.portfolio.columnar+json")
+        data = json.loads(columnar.content)
+        self.assertLess(len(columnar.content), len(nested.content) / 2)
+        self.assertEqual(len(data["dates"]), 60)
+        for t, item in enumerate(nested.json()["data"]):
+            self.assertEqual(data["dates"][t], item["date"])
+            self.assertAlmostEqual(data["total_value"][t], item["total_value"])
+            for weight in item["weights"]:
+                i = data["assets"].index(weight["asset"])
+                self.assertAlmostEqual(data["weights"][t][i], weight["weight"])
+
+    def test_columnar_downsampling_matches_nested(self):
+        nested = self.post("application/json", max_points=7).json()["data"]
+        data = json.loads(self.post("application/vnd.portfolio.columnar+json", max_points=7).content)
+
+        self.assertEqual(data["dates"], [item["date"] for item in nested])
+        for t, item in enumerate(nested):
+            self.assertAlmostEqual(data["total_value"][t], item["total_value"])
+
+    def test_errors_are_json(self):
+        response = self.client.post(
+            self.url, {"start_date": "x"},
+            content_type="application/json",
+            HTTP_ACCEPT="application/vnd.portfolio.columnar+json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("start_date", response.json())
+
+    @skipUnless(HAS_PYARROW, "pyarrow no está instalado")
+    def test_arrow_and_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow = self.post("application/vnd.apache.arrow.stream")
+        table = pa.ipc.open_stream(arrow.content).read_all()
+        self.assertEqual(table.num_rows, 60)
+        self.assertEqual(table.column_names[:2], ["date", "total_value"])
+
+        parquet = self.post("application/vnd.apache.parquet")
+        self.assertEqual(pq.read_table(BytesIO(parquet.content)).num_rows, 60)
+
+
+class BatchEvolutionTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, reference = create_dataset(n_dates=20)
+        self.portfolios = [reference]
+        for k in range(5):
+            portfolio = Portfolio.objects.create(
+                name=f"Batch {k}", initial_value=Decimal("500000"), start_date=reference.start_date,
+            )
+            Weight.objects.bulk_create([
+                Weight(portfolio=portfolio, asset=asset, date=portfolio.start_date,
+                       weight=Decimal("0.5") if i == k % 3 else Decimal("0.25"))
+                for i, asset in enumerate(self.assets)
+            ])
+            self.portfolios.append(portfolio)
+        calculate_all_positions(self.portfolios)
+        self.payload = {"start_date": "2022-02-15", "end_date": "2022-03-15"}
+
+    def post(self, ids, **extra):
+        return self.client.post(
+            "/api/portfolios/evolution/", {"portfolios": ids, **self.payload, **extra},
+            content_type="application/json",
+        )
+
+    def test_matches_single_portfolio_endpoint(self):
+        ids = [p.pk for p in reversed(self.portfolios)]
+        response = self.post(ids)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["portfolios"]
+        self.assertEqual([item["id"] for item in results], ids)
+        for item in results:
+            single = self.client.post(
+                f"/api/portfolios/{item['id']}/evolution/", self.payload,
+                content_type="application/json",
+            ).json()
+            self.assertEqual(item["portfolio"], single["portfolio"])
+            self.assertEqual(item["data"], single["data"])
+
+    def test_query_count_does_not_grow_with_portfolio_count(self):
+        for ids in ([self.portfolios[0].pk], [p.pk for p in self.portfolios]):
+            with self.assertNumQueries(2):  # los portafolios y sus valores
+                response = self.post(ids, max_points=5, values_only=True)
+            for item in response.json()["portfolios"]:
+                self.assertEqual(len(item["data"]), 5)
+                self.assertNotIn("weights", item["data"][0])
+
+    def test_unknown_portfolios_are_reported(self):
+        response = self.post([self.portfolios[0].pk, 9999])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["missing"], [9999])
+
+
+class VirtualPositionsTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, self.materialized = create_dataset(n_assets=4, n_dates=30)
+        self.virtual = Portfolio.objects.create(
+            name="Portfolio Virtual",
+            initial_value=self.materialized.initial_value,
+            start_date=self.materialized.start_date,
+            position_storage=Portfolio.STORAGE_VIRTUAL,
+        )
+        Weight.objects.bulk_create([
+            Weight(portfolio=self.virtual, asset=w.asset, date=w.date, weight=w.weight)
+            for w in Weight.objects.filter(portfolio=self.materialized)
+        ])
+        calculate_all_positions([self.materialized, self.virtual])
+        self.start = self.materialized.start_date
+        self.end = self.start + timedelta(days=29)
+
+    def assertSameSeries(self, virtual, materialized):
+        self.assertEqual([item["date"] for item in virtual], [item["date"] for item in materialized])
+        for v, m in zip(virtual, materialized):
+            self.assertAlmostEqual(v["total_value"], m["total_value"], places=2)
+            self.assertEqual(len(v.get("weights", [])), len(m.get("weights", [])))
+            for vw, mw in zip(v.get("weights", []), m.get("weights", [])):
+                self.assertEqual(vw["asset"], mw["asset"])
+                self.assertAlmostEqual(vw["weight"], mw["weight"], places=9)
+
+    def test_only_initial_quantities_are_stored(self):
+        self.assertEqual(Position.objects.filter(portfolio=self.virtual).count(), 4)
+        self.assertFalse(PortfolioValue.objects.filter(portfolio=self.virtual).exists())
+        self.assertEqual(Position.objects.filter(portfolio=self.materialized).count(), 120)
+        self.assertEqual(self.virtual.computed_until, self.end)
+
+    def test_reads_match_materialized_portfolio(self):
+        with self.assertNumQueries(1):
+            virtual = get_portfolio_weights_and_value(self.virtual, self.start, self.end)
+        self.assertSameSeries(
+            virtual, get_portfolio_weights_and_value(self.materialized, self.start, self.end)
+        )
+        self.assertSameSeries(
+            get_portfolio_values(self.virtual, self.start, self.end),
+            get_portfolio_values(self.materialized, self.start, self.end),
+        )
+        self.assertEqual(count_portfolio_dates(self.virtual, self.start, self.end), 30)
+
+        # Misma respuesta en el endpoint por lotes y en el de análisis
+        batch = self.client.post(
+            "/api/portfolios/evolution/",
+            {"portfolios": [self.virtual.pk, self.materialized.pk],
+             "start_date": "2022-02-15", "end_date": "2022-03-16"},
+            content_type="application/json",
+        ).json()["portfolios"]
+        self.assertSameSeries(batch[0]["data"], batch[1]["data"])
+        analytics = [
+            self.client.post(
+                f"/api/portfolios/{pk}/analytics/",
+                {"start_date": "2022-02-15", "end_date": "2022-03-16"},
+                content_type="application/json",
+            ).json()
+            for pk in (self.virtual.pk, self.materialized.pk)
+        ]
+        self.assertAlmostEqual(analytics[0]["cumulative_return"], analytics[1]["cumulative_return"])
+
+    def test_switching_storage_mode(self):
+        call_command("set_position_storage", "materialized", "--portfolio", str(self.virtual.pk), stdout=StringIO())
+        self.virtual.refresh_from_db()
+        self.assertEqual(Position.objects.filter(portfolio=self.virtual).count(), 120)
+        self.assertEqual(PortfolioValue.objects.filter(portfolio=self.virtual).count(), 30)
+
+        call_command("set_position_storage", "virtual", "--portfolio", str(self.virtual.pk), stdout=StringIO())
+        self.assertEqual(Position.objects.filter(portfolio=self.virtual).count(), 4)
+        self.assertFalse(PortfolioValue.objects.filter(portfolio=self.virtual).exists())
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, self.portfolio = create_dataset(n_assets=3, n_dates=25)
+        calculate_all_positions([self.portfolio])
+        self.url = f"/api/portfolios/{self.portfolio.pk}/evolution/"
+        self.payload = {"start_date": "2022-02-15", "end_date": "2022-03-31"}
+
+    def post(self, url=None, **extra):
+        return self.client.post(
+            url or self.url, {**self.payload, **extra}, content_type="application/json"
+        )
+
+    def pages(self, url=None, **extra):
+        pages, cursor = [], None
+        while True:
+            body = self.post(url, **extra, **({"cursor": cursor} if cursor else {})).json()
+            pages.append(body["data"])
+            cursor = body["next"]
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_the_full_range(self):
+        full = self.post().json()["data"]
+        pages = self.pages(page_size=7)
+
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 4])
+        self.assertEqual([item for page in pages for item in page], full)
+        values = self.pages(page_size=10, values_only=True)
+        self.assertEqual(
+            [item["total_value"] for page in values for item in page],
+            [item["total_value"] for item in full],
+        )
+
+    def test_each_page_is_one_query_without_offset(self):
+        first = self.post(page_size=5).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.post(page_size=5, cursor=first["next"])
+        pages = [q["sql"] for q in queries if "core_portfoliovalue" in q["sql"]]
+        self.assertEqual(len(pages), 1)
+        self.assertNotIn("OFFSET", pages[0].upper())
+        self.assertIn("LIMIT 6", pages[0].upper())
+
+    def test_virtual_portfolio_pages(self):
+        virtual = Portfolio.objects.create(
+            name="Portfolio Virtual", initial_value=self.portfolio.initial_value,
+            start_date=self.portfolio.start_date, position_storage=Portfolio.STORAGE_VIRTUAL,
+        )
+        Weight.objects.bulk_create([
+            Weight(portfolio=virtual, asset=w.asset, date=w.date, weight=w.weight)
+            for w in Weight.objects.filter(portfolio=self.portfolio)
+        ])
+        calculate_all_positions([virtual])
+        url = f"/api/portfolios/{virtual.pk}/evolution/"
+
+        pages = self.pages(url, page_size=6)
+        self.assertEqual([len(page) for page in pages], [6, 6, 6, 6, 1])
+        full = self.post(url).json()["data"]
+        self.assertEqual([item["date"] for page in pages for item in page], [item["date"] for item in full])
+
+    def test_virtual_pages_ignore_prices_of_other_assets(self):
+        virtual = Portfolio.objects.create(
+            name="Portfolio Virtual", initial_value=self.portfolio.initial_value,
+            start_date=self.portfolio.start_date, position_storage=Portfolio.STORAGE_VIRTUAL,
+        )
+        Weight.objects.create(
+            portfolio=virtual, asset=self.assets[0], date=virtual.start_date, weight=Decimal("1")
+        )
+        calculate_all_positions([virtual])
+        # Otro activo con precios después del último precio del portafolio
+        other = Asset.objects.create(name="Otro", symbol="OT")
+        Price.objects.bulk_create([
+            Price(asset=other, date=date(2022, 3, 12) + timedelta(days=t), price=Decimal("5"))
+            for t in range(14)
+        ])
+
+        pages = self.pages(f"/api/portfolios/{virtual.pk}/evolution/", page_size=10)
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(pages[-1][-1]["date"], "2022-03-11")
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.post(page_size=5, cursor="???").status_code, 400)
+        self.assertIn("cursor", self.post(cursor=self.post(page_size=5).json()["next"]).json())
+        self.assertIn("page_size", self.post(page_size=5, stream=True).json())
+        self.assertEqual(self.post(page_size=0).status_code, 400)
+        self.assertNotIn("next", self.post().json())
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, self.portfolio = create_dataset(n_assets=3, n_dates=90)
+        calculate_all_positions([self.portfolio])
+        self.url = f"/api/portfolios/{self.portfolio.pk}/evolution/"
+        self.payload = {"start_date": "2022-02-15", "end_date": "2022-05-31"}
+
+    def post(self, url=None, **extra):
+        return self.client.post(
+            url or self.url, {**self.payload, **extra}, content_type="application/json"
+        )
+
+    def expected(self, key):
+        # Agrupa la serie diaria de la API en períodos
+        periods = {}
+        for item in self.post().json()["data"]:
+            periods.setdefault(key(date.fromisoformat(item["date"])), []).append(item)
+        return [
+            (items[-1]["date"], items[-1]["total_value"],
+             max(i["total_value"] for i in items), min(i["total_value"] for i in items),
+             items[-1]["weights"])
+            for _, items in sorted(periods.items())
+        ]
+
+    def assertRollups(self, resolution, key, url=None):
+        data = self.post(url, resolution=resolution).json()["data"]
+        expected = self.expected(key)
+        self.assertEqual([item["date"] for item in data], [e[0] for e in expected])
+        for item, (_, close, high, low, weights) in zip(data, expected):
+            self.assertAlmostEqual(item["total_value"], close, places=2)
+            self.assertAlmostEqual(item["high_value"], high, places=2)
+            self.assertAlmostEqual(item["low_value"], low, places=2)
+            for w, e in zip(item["weights"], weights):
+                self.assertAlmostEqual(w["weight"], e["weight"], places=6)
+
+    def test_rollups_match_daily_series(self):
+        self.assertEqual(PortfolioRollup.objects.filter(resolution="monthly").count(), 4)
+        self.assertRollups("monthly", lambda d: (d.year, d.month))
+        self.assertRollups("weekly", lambda d: d.isocalendar()[:2])
+        with self.assertNumQueries(2):
+            self.post(resolution="monthly", values_only=True)
+
+    def test_price_change_refreshes_affected_periods(self):
+        asset = self.assets[0]
+        day = date(2022, 3, 16)
+        Price.objects.filter(asset=asset, date=day).update(price=Decimal("500"))
+        untouched = list(PortfolioRollup.objects.filter(date__lt=date(2022, 3, 1)).values_list(
+            "id", "total_value"
+        ))
+        recalculate_price_cells(self.portfolio, {(asset.pk, day)})
+        caches[EVOLUTION_CACHE].clear()
+
+        self.assertRollups("monthly", lambda d: (d.year, d.month))
+        self.assertRollups("weekly", lambda d: d.isocalendar()[:2])
+        march = PortfolioRollup.objects.get(resolution="monthly", period_start=date(2022, 3, 1))
+        self.assertEqual(march.high_value, PortfolioValue.objects.get(date=day).total_value)
+        self.assertEqual(
+            list(PortfolioRollup.objects.filter(date__lt=date(2022, 3, 1)).values_list("id", "total_value")),
+            untouched,
+        )
+
+    def test_virtual_portfolio_rollups_are_computed_on_read(self):
+        call_command("set_position_storage", "virtual", "--portfolio", str(self.portfolio.pk), stdout=StringIO())
+        self.assertFalse(PortfolioRollup.objects.exists())
+        self.assertRollups("monthly", lambda d: (d.year, d.month))
+
+    def test_invalid_combinations(self):
+        self.assertIn("resolution", self.post(resolution="monthly", page_size=5).json())
+        self.assertEqual(self.post(resolution="yearly").status_code, 400)
+        response = self.client.get("/", {
+            "portfolio_id": self.portfolio.pk, "resolution": "weekly", **self.payload,
+        })
+        self.assertEqual(len(response.context["data"]), 13)
+
+    def test_chart_downsampling_keeps_period_range_and_extremes(self):
+        weekly = self.post(resolution="weekly").json()["data"]
+        response = self.client.get("/", {
+            "portfolio_id": self.portfolio.pk, "resolution": "weekly", "max_points": 5, **self.payload,
+        })
+        data = response.context["data"]
+        self.assertEqual(len(data), 5)  # buckets de 3 semanas
+        for item, bucket in zip(data, [weekly[i:i + 3] for i in range(0, len(weekly), 3)]):
+            self.assertEqual(item["period_start"], bucket[0]["period_start"])
+            self.assertEqual(item["date"], bucket[-1]["date"])
+            self.assertEqual(item["total_value"], bucket[-1]["total_value"])
+            self.assertEqual(item["high_value"], max(i["high_value"] for i in bucket))
+            self.assertEqual(item["low_value"], min(i["low_value"] for i in bucket))
+            self.assertEqual(item["weights"], bucket[-1]["weights"])
+
+
+class SimulationTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(PRICE_STORE_DIR=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.assets, self.portfolio = create_dataset(n_assets=3, n_dates=80)
+        # Un hueco de precio: el activo no aparece ese día
+        Price.objects.filter(asset=self.assets[2], date=date(2022, 3, 10)).delete()
+        write_price_store(version=1)
+        self.payload = {
+            "weights": {"A0": 0.333333, "A1": 0.333333, "A2": 0.333334},
+            "initial_value": 1000000,
+            "start_date": "2022-02-15",
+            "end_date": "2022-05-05",
+        }
+
+    def simulate(self, **extra):
+        return self.client.post("/api/simulate/", {**self.payload, **extra}, content_type="application/json")
+
+    def stored(self, frequency):
+        Weight.objects.filter(portfolio=self.portfolio, asset=self.assets[2]).update(weight=Decimal("0.333334"))
+        Portfolio.objects.filter(pk=self.portfolio.pk).update(rebalance_frequency=frequency)
+        self.portfolio.refresh_from_db()
+        calculate_all_positions([self.portfolio])
+        return self.client.post(
+            f"/api/portfolios/{self.portfolio.pk}/evolution/",
+            {"start_date": "2022-02-15", "end_date": "2022-05-05"},
+            content_type="application/json",
+        ).json()["data"]
+
+    def assertSameEvolution(self, simulated, stored):
+        self.assertEqual([item["date"] for item in simulated], [item["date"] for item in stored])
+        for s_item, m_item in zip(simulated, stored):
+            self.assertAlmostEqual(s_item["total_value"], m_item["total_value"], places=2)
+            self.assertEqual(
+                [w["asset"] for w in s_item["weights"]], [w["asset"] for w in m_item["weights"]]
+            )
+            for s_weight, m_weight in zip(s_item["weights"], m_item["weights"]):
+                self.assertAlmostEqual(s_weight["weight"], m_weight["weight"], places=6)
+
+    def test_matches_stored_buy_and_hold(self):
+        with self.assertNumQueries(2):  # símbolos y versión de precios; los precios salen de la matriz
+            simulated = self.simulate().json()["data"]
+        self.assertSameEvolution(simulated, self.stored(Portfolio.REBALANCE_NONE))
+
+    def test_matches_stored_monthly_rebalancing(self):
+        simulated = self.simulate(rebalance_frequency="monthly").json()["data"]
+        self.assertSameEvolution(simulated, self.stored(Portfolio.REBALANCE_MONTHLY))
+
+    def test_persists_nothing(self):
+        counts = [Portfolio.objects.count(), Position.objects.count(), PortfolioValue.objects.count()]
+        response = self.simulate(max_points=10, values_only=True)
+        self.assertEqual(len(response.json()["data"]), 10)
+        self.assertEqual(
+            [Portfolio.objects.count(), Position.objects.count(), PortfolioValue.objects.count()],
+            counts,
+        )
+        columnar = json.loads(self.client.post(
+            "/api/simulate/", self.payload, content_type="application/json",
+            HTTP_ACCEPT="application/vnd.portfolio.columnar+json",
+        ).content)
+        self.assertEqual(columnar["assets"], ["A0", "A1", "A2"])
+        self.assertEqual(len(columnar["dates"]), 80)
+
+    def test_invalid_simulations(self):
+        self.assertIn("weights", self.simulate(weights={"A0": 0.5}).json())
+        self.assertIn("XX", self.simulate(weights={"A0": 0.5, "XX": 0.5}).json()["detail"])
+        self.assertIn("A2", self.simulate(start_date="2022-03-10").json()["detail"])
+        self.assertEqual(self.simulate(start_date="2021-01-01").status_code, 400)
+        self.assertEqual(self.simulate(rebalance_frequency="weights").status_code, 400)
+
+
+class ScenarioTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(PRICE_STORE_DIR=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_bootstrap_uses_consecutive_blocks(self):
+        returns = np.arange(100, dtype=float)[:, None]
+        paths = bootstrap_returns(np.random.default_rng(0), returns, 50, 12, 5)[:, :, 0]
+
+        self.assertEqual(paths.shape, (50, 12))
+        for block in (paths[:, :5], paths[:, 5:10]):
+            np.testing.assert_array_equal(np.diff(block, axis=1), 1)
+
+    def test_parametric_matches_log_return_moments(self):
+        rng = np.random.default_rng(0)
+        returns = rng.multivariate_normal([0.001, 0.0005], [[1e-4, 5e-5], [5e-5, 2e-4]], size=2000)
+        samples = np.log1p(parametric_returns(np.random.default_rng(1), returns, 400, 50).reshape(-1, 2))
+        expected = np.log1p(returns)
+
+        np.testing.assert_allclose(samples.mean(axis=0), expected.mean(axis=0), atol=2e-4)
+        np.testing.assert_allclose(np.cov(samples, rowvar=False), np.cov(expected, rowvar=False), rtol=0.05)
+
+    def test_constant_returns_give_exact_paths(self):
+        returns = np.full((30, 2), 0.01)
+        final, drawdowns = simulate_scenarios(returns, np.array([0.5, 0.5]), 20, 10, seed=1)
+        np.testing.assert_allclose(final, 1.01 ** 10)
+        np.testing.assert_allclose(drawdowns, 0.0)
+
+        # Un solo bloque posible: +10%, -50%, +10%, -50%
+        final, drawdowns = simulate_scenarios(np.array([[0.1], [-0.5]]), np.array([1.0]), 3, 4, block_size=2)
+        np.testing.assert_allclose(final, 1.1 * 0.5 * 1.1 * 0.5)
+        np.testing.assert_allclose(drawdowns, 0.3025 / 1.1 - 1)
+
+    def test_results_do_not_depend_on_workers(self):
+        rng = np.random.default_rng(3)
+        returns = rng.normal(0.0003, 0.01, (300, 3))
+        weights = np.array([0.2, 0.3, 0.5])
+        with mock.patch("core.scenarios.CHUNK_ELEMENTS", 20 * 3 * 25):  # 25 caminos por bloque
+            for method in ("bootstrap", "parametric"):
+                one = run_scenarios(returns, weights, 200, 20, method, seed=11, workers=1)
+                two = run_scenarios(returns, weights, 200, 20, method, seed=11, workers=2)
+                np.testing.assert_array_equal(one[0], two[0])
+                np.testing.assert_array_equal(one[1], two[1])
+                self.assertFalse(np.array_equal(
+                    one[0], run_scenarios(returns, weights, 200, 20, method, seed=12)[0]
+                ))
+
+    def test_parallel_runs_share_one_pool(self):
+        executor = scenarios._get_executor(2)
+        self.assertIs(scenarios._get_executor(2), executor)
+        self.assertIs(scenarios._get_executor(1), executor)
+
+    def test_api_and_command(self):
+        assets, portfolio = create_dataset(n_assets=3, n_dates=60)
+        calculate_all_positions([portfolio])
+        url = f"/api/portfolios/{portfolio.pk}/scenarios/"
+
+        response = self.client.post(url, {"paths": 500, "horizon": 20, "seed": 5}, content_type="application/json")
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((data["as_of"], data["history"]["days"]), ("2022-04-15", 59))
+        self.assertEqual(sum(data["final_value"]["histogram"]["counts"]), 500)
+        percentiles = list(data["final_value"]["percentiles"].values())
+        self.assertEqual(percentiles, sorted(percentiles))
+        for risk in data["risk"]:
+            self.assertGreaterEqual(risk["cvar"], risk["var"])
+        # Caída máxima negativa, como en el análisis
+        self.assertLessEqual(data["max_drawdown"]["percentiles"]["99"], 0)
+
+        out = StringIO()
+        call_command(
+            "run_scenarios", str(portfolio.pk), "--paths", "500", "--horizon", "20",
+            "--seed", "5", "--workers", "1", stdout=out, stderr=StringIO(),
+        )
+        result = json.loads(out.getvalue())
+        self.assertEqual(result.pop("run")["workers"], 1)
+        self.assertEqual(result, data)
+
+        # Sin semilla: la respuesta trae la usada y sirve para repetir la corrida
+        first = self.client.post(url, {"paths": 100, "horizon": 5}, content_type="application/json").json()
+        self.assertLess(first["seed"], 2 ** 53)
+        # Un cliente JavaScript la lee como float64 y la devuelve igual
+        seed = int(float(first["seed"]))
+        again = self.client.post(
+            url, {"paths": 100, "horizon": 5, "seed": seed}, content_type="application/json"
+        ).json()
+        self.assertEqual(first, again)
+
+    def test_invalid_requests(self):
+        assets, portfolio = create_dataset(n_assets=2, n_dates=3)
+        url = f"/api/portfolios/{portfolio.pk}/scenarios/"
+        response = self.client.post(url, {"paths": 10}, content_type="application/json")
+        self.assertIn("no tiene posiciones", response.json()["detail"])
+        calculate_all_positions([portfolio])
+        response = self.client.post(url, {"paths": 10, "block_size": 5}, content_type="application/json")
+        self.assertIn("Historia insuficiente", response.json()["detail"])
+        response = self.client.post(url, {"paths": 10**6}, content_type="application/json")
+        self.assertIn("paths", response.json())
+        response = self.client.post(url, {"paths": 20_000, "horizon": 252}, content_type="application/json")
+        self.assertIn("paths", response.json())
+
+
+class AsyncViewsTests(TestCase):
+
+    def setUp(self):
+        caches[EVOLUTION_CACHE].clear()
+        self.assets, self.portfolio = create_dataset(n_dates=20)
+        calculate_initial_positions(self.portfolio)
+        calculate_historical_positions(self.portfolio)
+        self.payload = {"start_date": "2022-02-15", "end_date": "2022-03-15", "max_points": 7}
+
+    async def test_async_endpoints_match_sync_ones(self):
+        evolution = await self.async_client.post(
+            f"/api/async/portfolios/{self.portfolio.pk}/evolution/", self.payload,
+            content_type="application/json",
+        )
+        expected = await sync_to_async(self.client.post)(
+            f"/api/portfolios/{self.portfolio.pk}/evolution/", self.payload,
+            content_type="application/json",
+        )
+        self.assertEqual(evolution.status_code, 200)
+        self.assertEqual(evolution.json(), expected.json())
+        # El middleware cuenta las queries también en el camino async
+        self.assertRegex(evolution["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+        listing = await self.async_client.get("/api/async/portfolios/")
+        expected = await sync_to_async(self.client.get)("/api/portfolios/")
+        self.assertEqual(listing.json(), expected.json())
+
+    async def test_async_errors(self):
+        url = f"/api/async/portfolios/{self.portfolio.pk}/evolution/"
+        response = await self.async_client.post(url, {"start_date": "x"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("start_date", response.json())
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 405)
+        response = await self.async_client.post(
+            "/api/async/portfolios/9999/evolution/", self.payload, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_evolution_checks_csrf_like_drf(self):
+        from django.contrib.auth.models import User
+        from django.test import AsyncClient, Client
+
+        url = f"/api/async/portfolios/{self.portfolio.pk}/evolution/"
+        client = AsyncClient(enforce_csrf_checks=True)
+        # Sin sesión (cliente de la API) no se pide token
+        response = await client.post(url, self.payload, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+        # Con sesión iniciada el token es obligatorio, como en la vista DRF
+        user = await User.objects.acreate(username="analista")
+        await sync_to_async(client.force_login)(user)
+        response = await client.post(url, self.payload, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+        self.assertIn("CSRF", response.json()["detail"])
+        drf_client = Client(enforce_csrf_checks=True)
+        await sync_to_async(drf_client.force_login)(user)
+        expected = await sync_to_async(drf_client.post)(
+            f"/api/portfolios/{self.portfolio.pk}/evolution/", self.payload,
+            content_type="application/json",
+        )
+        self.assertEqual(expected.status_code, 403)
+
+        client.cookies["csrftoken"] = "a" * 32
+        response = await client.post(
+            url, self.payload, content_type="application/json", headers={"X-CSRFToken": "a" * 32},
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class LoadTestTests(TestCase):
+
+    def test_reports_throughput_and_latency(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        import threading
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            out = StringIO()
+            call_command(
+                "load_test", f"http://127.0.0.1:{server.server_port}/api/",
+                "--body", '{"a": 1}', "--concurrency", "4", "--requests", "40",
+                stdout=out, stderr=StringIO(),
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        result = json.loads(out.getvalue())
+        self.assertEqual((result["requests"], result["errors"], result["method"]), (40, 0, "POST"))
+        self.assertEqual(result["statuses"], {"200": 40})
+        self.assertGreater(result["requests_per_second"], 0)
@@ -1,12 +1,26 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
 import json
 from datetime import datetime
 
-from core.models import Portfolio
-from core.selectors import get_portfolio_weights_and_value
-from core.services import load_excel_data
+from core.models import Portfolio, PortfolioRollup
+from core.cache import get_cached_portfolio_weights_and_value
+from core.selectors import (
+    ROLLUP_RESOLUTIONS,
+    downsample_evolution,
+    downsample_rollups,
+    get_portfolio_rollups,
+)
+from core.jobs import enqueue_etl_job
+from core.metrics import render_prometheus
+
+# Puntos máximos que se envían a Chart.js; más no se distinguen en el gráfico
+CHART_MAX_POINTS = 500
+CHART_RESOLUTIONS = [
+    (PortfolioRollup.RESOLUTION_DAILY, "Diaria"),
+] + PortfolioRollup.RESOLUTION_CHOICES
+
 
 # Bonus 1: Vista con gráficos comparativos
 # Muestra gráficos de w_{i,t} (stacked area) y V_t (línea)
@@ -25,17 +39,19 @@ def portfolio_charts(request):
         if not excel_file.name.endswith(('.xlsx', '.xls')):
             messages.error(request, 'Por favor sube un archivo Excel (.xlsx o .xls)')
         else:
-            try:
-                # Llamar a la función ETL para procesar el archivo
-                load_excel_data(excel_file)
-                messages.success(request, '✓ Excel cargado exitosamente. Datos procesados.')
-            except Exception as e:
-                messages.error(request, f'Error al procesar el Excel: {str(e)}')
+            # Encolar el ETL; lo procesa el comando run_etl_worker
+            job = enqueue_etl_job(excel_file)
+            messages.success(
+                request,
+                f'✓ Excel recibido. Carga #{job.pk} en proceso '
+                f'(progreso en /api/etl-jobs/{job.pk}/).'
+            )
     
     # Si viene un GET con parámetros, mostrar los gráficos
     portfolio_id = request.GET.get('portfolio_id')
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
+    resolution = request.GET.get('resolution') or PortfolioRollup.RESOLUTION_DAILY
     
     data = None
     data_json = None
@@ -48,12 +64,23 @@ def portfolio_charts(request):
             start = datetime.strptime(start_date, '%Y-%m-%d').date()
             end = datetime.strptime(end_date, '%Y-%m-%d').date()
             
-            # Obtener los datos usando la misma función del API
-            data = get_portfolio_weights_and_value(
-                selected_portfolio,
-                start,
-                end
-            )
+            if resolution in ROLLUP_RESOLUTIONS:
+                # Rangos largos: una fila por semana o mes
+                data = get_portfolio_rollups(selected_portfolio, start, end, resolution)
+            else:
+                # Obtener los datos usando la misma función del API
+                data = get_cached_portfolio_weights_and_value(
+                    selected_portfolio,
+                    start,
+                    end
+                )
+            # Reducir la serie en el servidor antes de incrustarla en el HTML
+            max_points = max(int(request.GET.get('max_points') or CHART_MAX_POINTS), 2)
+            if resolution in ROLLUP_RESOLUTIONS:
+                # Los períodos se juntan, no se promedian: se conservan máx. y mín.
+                data = downsample_rollups(data, max_points)
+            else:
+                data = list(downsample_evolution(data, len(data), max_points))
             data_json = json.dumps(data)  # Convertir a JSON para Chart.js
         except (ValueError, Exception) as e:
             data = None
@@ -66,6 +93,19 @@ def portfolio_charts(request):
         'data_json': data_json,
         'start_date': start_date,
         'end_date': end_date,
+        'resolution': resolution,
+        'resolutions': CHART_RESOLUTIONS,
     }
     
     return render(request, 'core/portfolio_charts.html', context)
+
+
+# Histogramas de latencia, queries y funciones para Prometheus
+def metrics(request):
+    """
+    Expone las métricas de este proceso en formato de texto de Prometheus.
+    """
+    return HttpResponse(
+        render_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )